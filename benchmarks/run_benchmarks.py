@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Time each stage of a Pyan run on synthetic projects of increasing size.
+
+Usage:
+    python -m benchmarks.run_benchmarks --sizes 100,1000,10000
+    python -m benchmarks.run_benchmarks --sizes 100 --json results.json
+    python -m benchmarks.run_benchmarks --sizes 100 --golden golden.json [--update-golden]
+
+The golden file of the tests (tests/golden/synthetic.json, see tests/test_synthetic.py)
+is checked, or regenerated with --update-golden, by:
+    python -m benchmarks.run_benchmarks --sizes 12 --modules-per-package 4 --classes 2 \\
+        --functions 2 --methods 2 --collisions 0.2 --golden tests/golden/synthetic.json
+
+The stages are the phases reported to a pyan.profiling.Profiler by the
+analyzer and the writers (per-file read, symtable, parse and visit within
+each pass, resolve_base_classes, each postprocess step, and each writer's
+output phases), plus project generation, VisualGraph.from_visitor() and
+the writers as a whole. Nested stages are named by their path, e.g.
+"analysis / pass 1 / parse".
+"""
+
+from argparse import ArgumentParser
+import io
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+from pyan.analyzer import CallGraphVisitor
+from pyan.profiling import Profiler
+from pyan.visgraph import VisualGraph
+from pyan.writers import DotWriter, HTMLWriter, SVGWriter, TgfWriter, YedWriter
+
+from .synthetic import SyntheticProject
+
+
+def graph_digest(visitor):
+    """Return the analysis result as a JSON-serializable dict of sorted node and edge lists."""
+
+    def edges(edge_dict):
+        return sorted(
+            "%s -> %s" % (n.get_name(), n2.get_name())
+            for n, targets in edge_dict.items()
+            if n.defined
+            for n2 in targets
+            if n2.defined
+        )
+
+    nodes = sorted(
+        "%s (%s)" % (n.get_name(), n.flavor.value) for items in visitor.nodes.values() for n in items if n.defined
+    )
+    return {"nodes": nodes, "defines": edges(visitor.defines_edges), "uses": edges(visitor.uses_edges)}
+
+
+def run_one(project, workdir, writers, analysis_options):
+    """Generate the project in workdir, and time a full Pyan run over it. Return (times, total, visitor).
+
+    times maps each stage to its wall time in seconds; total is the time of the run, excluding generation."""
+    profiler = Profiler(trace_memory=False)
+    with profiler.phase("generate"):
+        filenames = project.write(workdir)
+    logger = logging.getLogger("benchmarks")
+    with profiler.phase("analysis"):
+        visitor = CallGraphVisitor(filenames, logger=logger, profiler=profiler, **analysis_options)
+
+    graph_options = {"draw_defines": True, "draw_uses": True, "colored": True, "grouped": True, "nested_groups": True}
+    with profiler.phase("VisualGraph.from_visitor"):
+        graph = VisualGraph.from_visitor(visitor, options=graph_options, logger=logger)
+
+    for writer_class in writers:
+        stream = io.StringIO()
+        with profiler.phase("writer: %s" % writer_class.__name__):
+            writer_class(graph, output=stream, logger=logger, profiler=profiler).run()
+
+    times = {" / ".join(path): stats["wall"] for path, stats in profiler.phases.items()}
+    total = sum(stats["wall"] for path, stats in profiler.phases.items() if len(path) == 1 and path != ("generate",))
+    return times, total, visitor
+
+
+def format_table(results):
+    """Format {size: {stage: seconds}} as a plain text table, stages as rows."""
+    sizes = list(results)
+    stages = []
+    for times in results.values():
+        stages.extend(stage for stage in times if stage not in stages)
+    width = max(len(stage) for stage in stages)
+    lines = ["%-*s" % (width, "stage") + "".join("%12s" % ("%d mod" % size) for size in sizes)]
+    for stage in stages:
+        cells = "".join("%12.3f" % results[size][stage] if stage in results[size] else "%12s" % "-" for size in sizes)
+        lines.append("%-*s%s" % (width, stage, cells))
+    return "\n".join(lines)
+
+
+def main(cli_args=None):
+    parser = ArgumentParser(description="Benchmark Pyan on synthetic projects.")
+    parser.add_argument("--sizes", default="100,1000", help="comma-separated numbers of modules [default: 100,1000]")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the project generator")
+    parser.add_argument("--modules-per-package", type=int, default=10, help="modules per subpackage")
+    parser.add_argument("--classes", type=int, default=3, help="classes per module")
+    parser.add_argument("--functions", type=int, default=3, help="module-level functions per module")
+    parser.add_argument("--methods", type=int, default=3, help="methods per class")
+    parser.add_argument("--depth", type=int, default=3, help="maximum inheritance depth")
+    parser.add_argument("--fanout", type=int, default=3, help="imports per module, calls per function")
+    parser.add_argument("--collisions", type=float, default=0.1, help="probability of a colliding function name")
+    parser.add_argument("--relative", type=float, default=0.3, help="probability of a relative import")
+    parser.add_argument("--level", default="full", help="analysis level")
+    parser.add_argument("--strict", action="store_true", default=False, help="re-visit all files in pass 2")
+    parser.add_argument("--json", dest="json_file", default=None, help="also write the timings to FILE as JSON")
+    parser.add_argument(
+        "--golden", default=None, help="compare the graph of the smallest project against this golden file"
+    )
+    parser.add_argument(
+        "--update-golden", action="store_true", default=False, help="write the golden file instead of comparing"
+    )
+    args = parser.parse_args(cli_args)
+
+    writers = [DotWriter, TgfWriter, YedWriter]
+    if shutil.which("dot"):
+        writers.extend([SVGWriter, HTMLWriter])
+
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    results = {}
+    golden_ok = True
+    for size in sizes:
+        project = SyntheticProject(
+            modules=size,
+            modules_per_package=args.modules_per_package,
+            classes_per_module=args.classes,
+            functions_per_module=args.functions,
+            methods_per_class=args.methods,
+            inheritance_depth=args.depth,
+            fanout=args.fanout,
+            name_collisions=args.collisions,
+            relative_imports=args.relative,
+            seed=args.seed,
+        )
+        workdir = tempfile.mkdtemp(prefix="pyan-bench-")
+        try:
+            times, total, visitor = run_one(
+                project, workdir, writers, {"analysis_level": args.level, "strict": args.strict}
+            )
+        finally:
+            shutil.rmtree(workdir)
+        results[size] = times
+        print("%d modules: %.3f s total (excluding generation)" % (size, total))
+
+        if args.golden and size == sizes[0]:
+            digest = graph_digest(visitor)
+            if args.update_golden:
+                with open(args.golden, "wt", encoding="utf-8") as f:
+                    json.dump(digest, f, indent=1)
+                print("Golden file %s written" % args.golden)
+            else:
+                with open(args.golden, "rt", encoding="utf-8") as f:
+                    golden_ok = json.load(f) == digest
+                print("Golden check: %s" % ("OK" if golden_ok else "FAILED"))
+
+    print()
+    print(format_table(results))
+
+    if args.json_file:
+        with open(args.json_file, "wt", encoding="utf-8") as f:
+            json.dump({str(size): times for size, times in results.items()}, f, indent=1)
+
+    if not golden_ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Seeded generator for synthetic Python projects, for benchmarking Pyan.
+
+The generated project is a package named ``synth``, with subpackages
+``pkg0``, ``pkg1``, ... each holding a number of modules. Every module
+defines some classes (possibly inheriting from classes in other modules)
+and module-level functions, imports names from other modules, and calls
+them from function and method bodies.
+
+The same parameters and seed always produce the same project.
+"""
+
+import os
+import random
+
+# Function names shared between modules, to create name collisions
+# (and hence wildcard expansions in the analysis).
+COMMON_NAMES = ("run", "process", "handle", "update", "build", "get", "reset", "close")
+
+
+class SyntheticProject:
+    """Parameters and generator for a synthetic project.
+
+    modules:             total number of modules
+    modules_per_package: number of modules in each subpackage
+    classes_per_module:  number of classes defined in each module
+    functions_per_module: number of module-level functions in each module
+    methods_per_class:   number of methods in each class
+    inheritance_depth:   maximum length of a chain of base classes
+    fanout:              number of other modules each module imports from,
+                         and number of calls in each function body
+    name_collisions:     probability of a function or method taking a name
+                         from COMMON_NAMES instead of a unique name
+    relative_imports:    probability of an import being relative
+    seed:                random seed
+    """
+
+    def __init__(
+        self,
+        modules=100,
+        modules_per_package=10,
+        classes_per_module=3,
+        functions_per_module=3,
+        methods_per_class=3,
+        inheritance_depth=3,
+        fanout=3,
+        name_collisions=0.1,
+        relative_imports=0.3,
+        seed=0,
+    ):
+        self.modules = modules
+        self.modules_per_package = modules_per_package
+        self.classes_per_module = classes_per_module
+        self.functions_per_module = functions_per_module
+        self.methods_per_class = methods_per_class
+        self.inheritance_depth = inheritance_depth
+        self.fanout = fanout
+        self.name_collisions = name_collisions
+        self.relative_imports = relative_imports
+        self.seed = seed
+
+    def package_of(self, m):
+        return m // self.modules_per_package
+
+    def module_name(self, m):
+        return "synth.pkg%d.mod%d" % (self.package_of(m), m)
+
+    def write(self, basedir):
+        """Generate the project under basedir. Return the list of generated filenames."""
+        rng = random.Random(self.seed)
+        filenames = []
+
+        def write_file(path, text):
+            with open(path, "wt", encoding="utf-8") as f:
+                f.write(text)
+            filenames.append(path)
+
+        root = os.path.join(basedir, "synth")
+        os.makedirs(root, exist_ok=True)
+        write_file(os.path.join(root, "__init__.py"), "")
+
+        # Decide the names first, so that modules can refer to names in modules generated later.
+        function_names = []  # module index: list of names
+        class_names = []  # module index: list of names
+        method_names = []  # module index: list of lists of names
+        class_depths = {}  # (module index, class name): length of base class chain
+        for m in range(self.modules):
+            function_names.append([self._name(rng, "f%d_%d" % (m, k)) for k in range(self.functions_per_module)])
+            class_names.append(["C%d_%d" % (m, k) for k in range(self.classes_per_module)])
+            method_names.append(
+                [
+                    [self._name(rng, "m%d_%d_%d" % (m, k, j)) for j in range(self.methods_per_class)]
+                    for k in range(self.classes_per_module)
+                ]
+            )
+
+        for m in range(self.modules):
+            pkg_dir = os.path.join(root, "pkg%d" % self.package_of(m))
+            if not os.path.isdir(pkg_dir):
+                os.makedirs(pkg_dir)
+                write_file(os.path.join(pkg_dir, "__init__.py"), "")
+            text = self._module_source(rng, m, function_names, class_names, method_names, class_depths)
+            write_file(os.path.join(pkg_dir, "mod%d.py" % m), text)
+
+        return filenames
+
+    def _name(self, rng, unique_name):
+        if rng.random() < self.name_collisions:
+            return rng.choice(COMMON_NAMES)
+        return unique_name
+
+    def _import_line(self, rng, m, target, names):
+        """Return an import statement importing names from module number target into module number m."""
+        if rng.random() < self.relative_imports:
+            if self.package_of(target) == self.package_of(m):
+                source = ".mod%d" % target
+            else:
+                source = "..pkg%d.mod%d" % (self.package_of(target), target)
+        else:
+            source = self.module_name(target)
+        return "from %s import %s" % (source, ", ".join(names))
+
+    def _module_source(self, rng, m, function_names, class_names, method_names, class_depths):
+        lines = ['"""Synthetic module %d."""' % m, ""]
+        others = [k for k in range(self.modules) if k != m]
+        targets = sorted(rng.sample(others, min(self.fanout, len(others))))
+
+        # Names available for calls: imported functions and classes, plus our own functions.
+        callables = list(function_names[m])
+        bases = []  # (module index, class name) of base class candidates
+        for target in targets:
+            names = [function_names[target][0]] if function_names[target] else []
+            names.extend(class_names[target][:1])
+            if not names:
+                continue
+            names = sorted(set(names))
+            lines.append(self._import_line(rng, m, target, names))
+            callables.extend(names)
+            if target < m:  # only inherit from earlier modules, so that the hierarchy is acyclic
+                bases.extend((target, name) for name in names if name in class_names[target])
+        lines.append("")
+
+        for k, fname in enumerate(function_names[m]):
+            lines.append("")
+            lines.append("def %s(x):" % fname)
+            for call in self._calls(rng, callables):
+                lines.append("    x = %s(x)" % call)
+            lines.append("    return x")
+            lines.append("")
+
+        for k, cname in enumerate(class_names[m]):
+            candidates = [(t, b) for t, b in bases if class_depths.get((t, b), 0) < self.inheritance_depth]
+            if candidates and rng.random() < 0.7:
+                base_module, base = rng.choice(candidates)
+                class_depths[(m, cname)] = class_depths.get((base_module, base), 0) + 1
+                lines.append("")
+                lines.append("class %s(%s):" % (cname, base))
+                base_methods = method_names[base_module][class_names[base_module].index(base)]
+            else:
+                class_depths[(m, cname)] = 0
+                lines.append("")
+                lines.append("class %s:" % cname)
+                base_methods = []
+            lines.append("    def __init__(self, x):")
+            if base_methods:
+                lines.append("        super().__init__(x)")
+            lines.append("        self.x = x")
+            lines.append("")
+            own_methods = method_names[m][k]
+            for mname in own_methods:
+                lines.append("    def %s(self):" % mname)
+                lines.append("        x = self.x")
+                for call in self._calls(rng, callables):
+                    lines.append("        x = %s(x)" % call)
+                if base_methods:
+                    lines.append("        x = self.%s()" % rng.choice(base_methods))
+                lines.append("        return self.%s" % rng.choice(own_methods))
+                lines.append("")
+
+        return "\n".join(lines).rstrip() + "\n"
+
+    def _calls(self, rng, callables):
+        return [rng.choice(callables) for _ in range(self.fanout)] if callables else []
@@ -7,8 +7,11 @@ from glob import glob
 import logging
 from optparse import OptionParser  # TODO: migrate to argparse
 import os
+import sys
+import time
 
 import pyan.node
+import pyan.profiling
 import pyan.visgraph
 import pyan.writers
 
@@ -81,20 +84,28 @@ def resolve(current_module, target_module, level):
 
 
 class ImportVisitor(ast.NodeVisitor):
-    def __init__(self, filenames, logger):
+    def __init__(self, filenames, logger, profiler=None):
         self.modules = {}  # modname: {dep0, dep1, ...}
         self.fullpaths = {}  # modname: fullpath
         self.logger = logger
+        self.profiler = profiler or pyan.profiling.NullProfiler()
         self.analyze(filenames)
 
     def analyze(self, filenames):
+        profiler = self.profiler
         for fullpath in filenames:
-            with open(fullpath, "rt", encoding="utf-8") as f:
-                content = f.read()
+            t0 = time.perf_counter()
+            with profiler.phase("read"):
+                with open(fullpath, "rt", encoding="utf-8") as f:
+                    content = f.read()
             m = filename_to_module_name(fullpath)
             self.current_module = m
             self.fullpaths[m] = fullpath
-            self.visit(ast.parse(content, fullpath))
+            with profiler.phase("parse"):
+                tree = ast.parse(content, fullpath)
+            with profiler.phase("visit"):
+                self.visit(tree)
+            profiler.record_file(fullpath, time.perf_counter() - t0)
 
     def add_dependency(self, target_module):  # source module is always self.current_module
         m = self.current_module
@@ -118,12 +129,10 @@ class ImportVisitor(ast.NodeVisitor):
             possible_init = base + ".__init__"
             if possible_init != m:  # will happen when current_module is somepackage.__init__ itself
                 self.modules[m].add(possible_init)
-                self.logger.debug("    added possible implicit use of '{}'".format(possible_init))
+                self.logger.debug("    added possible implicit use of '%s'", possible_init)
 
     def visit_Import(self, node):
-        self.logger.debug(
-            "{}:{}: Import {}".format(self.current_module, node.lineno, [alias.name for alias in node.names])
-        )
+        self.logger.debug("%s:%s: Import %s", self.current_module, node.lineno, [alias.name for alias in node.names])
         for alias in node.names:
             self.add_dependency(alias.name)  # alias.asname not relevant for our purposes
 
@@ -131,26 +140,31 @@ class ImportVisitor(ast.NodeVisitor):
         # from foo import some_symbol
         if node.module:
             self.logger.debug(
-                "{}:{}: ImportFrom '{}', relative import level {}".format(
-                    self.current_module, node.lineno, node.module, node.level
-                )
+                "%s:%s: ImportFrom '%s', relative import level %s",
+                self.current_module,
+                node.lineno,
+                node.module,
+                node.level,
             )
             absname = resolve(self.current_module, node.module, node.level)
             if node.level > 0:
-                self.logger.debug("    resolved relative import to '{}'".format(absname))
+                self.logger.debug("    resolved relative import to '%s'", absname)
             self.add_dependency(absname)
 
         # from . import foo  -->  module = None; now the **names** refer to modules
         else:
             for alias in node.names:
                 self.logger.debug(
-                    "{}:{}: ImportFrom '{}', target module '{}', relative import level {}".format(
-                        self.current_module, node.lineno, "." * node.level, alias.name, node.level
-                    )
+                    "%s:%s: ImportFrom '%s', target module '%s', relative import level %s",
+                    self.current_module,
+                    node.lineno,
+                    "." * node.level,
+                    alias.name,
+                    node.level,
                 )
                 absname = resolve(self.current_module, alias.name, node.level)
                 if node.level > 0:
-                    self.logger.debug("    resolved relative import to '{}'".format(absname))
+                    self.logger.debug("    resolved relative import to '%s'", absname)
                 self.add_dependency(absname)
 
     # --------------------------------------------------------------------------------
@@ -297,9 +311,39 @@ def main():
     parser.add_option(
         "-a", "--annotated", action="store_true", default=False, dest="annotated", help="annotate with module location"
     )
+    parser.add_option(
+        "--profile",
+        action="store_true",
+        default=False,
+        dest="profile",
+        help="print time and peak memory used by each phase of the run to stderr",
+    )
+    parser.add_option(
+        "--profile-json",
+        dest="profile_json",
+        help="write the profile to FILE (implies profiling)",
+        metavar="FILE",
+        default=None,
+    )
+    parser.add_option(
+        "--profile-top",
+        type="int",
+        default=10,
+        dest="profile_top",
+        help="number of slowest files to list in the profile [default 10]",
+        metavar="N",
+    )
 
     options, args = parser.parse_args()
-    filenames = [fn2 for fn in args for fn2 in glob(fn, recursive=True)]
+
+    if options.profile or options.profile_json:
+        profiler = pyan.profiling.Profiler()
+        profiler.start()
+    else:
+        profiler = pyan.profiling.NullProfiler()
+
+    with profiler.phase("discovery"):
+        filenames = [fn2 for fn in args for fn2 in glob(fn, recursive=True)]
     if len(args) == 0:
         parser.error("Need one or more filenames to process")
 
@@ -330,7 +374,8 @@ def main():
         logger.addHandler(handler)
 
     # run the analysis
-    v = ImportVisitor(filenames, logger)
+    with profiler.phase("analysis"):
+        v = ImportVisitor(filenames, logger, profiler=profiler)
 
     # Postprocessing: detect import cycles
     #
@@ -360,7 +405,8 @@ def main():
     # stack trace. So this analysis is just extra information that says what
     # other cycles exist, if any.
     if options.cycles:
-        cycles = v.detect_cycles()
+        with profiler.phase("detect_cycles"):
+            cycles = v.detect_cycles()
         if not cycles:
             print("No import cycles detected.")
         else:
@@ -401,20 +447,35 @@ def main():
     # Postprocessing: format graph report
     make_graph = options.dot or options.tgf or options.yed
     if make_graph:
-        v.prepare_graph()
+        with profiler.phase("prepare_graph"):
+            v.prepare_graph()
         # print(v.nodes, v.uses_edges)
-        graph = pyan.visgraph.VisualGraph.from_visitor(v, options=graph_options, logger=logger)
+        with profiler.phase("visgraph"):
+            graph = pyan.visgraph.VisualGraph.from_visitor(v, options=graph_options, logger=logger)
 
     if options.dot:
         writer = pyan.writers.DotWriter(
-            graph, options=["rankdir=" + options.rankdir], output=options.filename, logger=logger
+            graph, options=["rankdir=" + options.rankdir], output=options.filename, logger=logger, profiler=profiler
         )
     if options.tgf:
-        writer = pyan.writers.TgfWriter(graph, output=options.filename, logger=logger)
+        writer = pyan.writers.TgfWriter(graph, output=options.filename, logger=logger, profiler=profiler)
     if options.yed:
-        writer = pyan.writers.YedWriter(graph, output=options.filename, logger=logger)
+        writer = pyan.writers.YedWriter(graph, output=options.filename, logger=logger, profiler=profiler)
     if make_graph:
-        writer.run()
+        with profiler.phase("writer"):
+            writer.run()
+
+    if isinstance(profiler, pyan.profiling.Profiler):
+        profiler.stop()
+        profiler.set_count("files", len(filenames))
+        profiler.set_count("modules", len(v.modules))
+        if make_graph:
+            profiler.set_count("graph nodes", graph.count_nodes())
+            profiler.set_count("graph edges", graph.count_edges())
+        if options.profile:
+            print(profiler.report(top=options.profile_top), file=sys.stderr)
+        if options.profile_json:
+            profiler.write_json(options.profile_json, top=options.profile_top)
 
 
 if __name__ == "__main__":
@@ -5,10 +5,15 @@ from glob import glob
 import io
 from typing import List, Union
 
+from .aio import AnalysisSession, analyze_async  # noqa: F401, for export only.
 from .analyzer import CallGraphVisitor
+from .demand import demand_driven_visitor
+from .hooks import AnalysisHooks
+from .layout import BUILTIN_ENGINE, BuiltinRenderer
 from .main import main  # noqa: F401, for export only.
+from .simplify import simplify
 from .visgraph import VisualGraph
-from .writers import DotWriter, HTMLWriter, SVGWriter
+from .writers import DotWriter, GraphvizRenderer, HTMLWriter, InteractiveHTMLWriter, SVGWriter
 
 __version__ = "1.2.1"
 
@@ -29,6 +34,12 @@ def create_callgraph(
     annotated: bool = False,
     grouped: bool = True,
     max_iter: int = 1000,
+    analysis_level: Union[str, None] = None,
+    hooks: Union[AnalysisHooks, None] = None,
+    demand_driven: bool = False,
+    collapse_to: Union[str, None] = None,
+    simplify_passes: Union[List[str], None] = None,
+    layout_engine: str = "dot",
 ) -> str:
     """
     create callgraph based on static code analysis
@@ -42,8 +53,9 @@ def create_callgraph(
             to only include calls that are related to `my_function`
         namespace: if defined, namespace to filter for, e.g. "my_module", it is highly
             recommended to define this filter
-        format: format to write callgraph to, of of "dot", "svg", "html". you need to have graphviz
-            installed for svg or html output
+        format: format to write callgraph to, of of "dot", "svg", "html", "interactive". you need to have graphviz
+            installed for svg or html output, unless layout_engine is "builtin" ("interactive" html is laid out in
+            the browser)
         rankdir: direction of graph, e.g. "LR" for horizontal or "TB" for vertical
         nested_groups: if to group by modules and submodules
         draw_defines: if to draw defines edges (functions that are defines)
@@ -53,6 +65,18 @@ def create_callgraph(
         annotated: if to annotate graph with filenames
         grouped: if to group by modules
         max_iter: maximum number of iterations for filtering. Defaults to 1000.
+        analysis_level: one of "structure", "resolve", "full". Defaults to None, i.e. the
+            cheapest level that can produce the requested graph.
+        hooks: if defined, `pyan.hooks.AnalysisHooks` instance to notify of the progress of the
+            analysis and the writer
+        demand_driven: if to analyze only the files needed for the function or namespace filter
+            (the files defining them and their imports), instead of all files
+        collapse_to: if defined, one of "package", "module", "class": aggregate the nodes to that
+            level, with the edges between the aggregates merged and weighted by their number
+        simplify_passes: if defined, names of the `pyan.simplify` passes that remove redundant
+            edges before layout, e.g. ["defines", "uses", "leaves"]
+        layout_engine: layout engine for svg and html output: a GraphViz engine, e.g. "dot" or "sfdp", or
+            "builtin" for the built-in force-directed layout, which needs numpy instead of graphviz
 
     Returns:
         str: callgraph
@@ -73,7 +97,15 @@ def create_callgraph(
         "annotated": annotated,
     }
 
-    v = CallGraphVisitor(filenames, root=root)
+    if analysis_level is None:
+        analysis_level = "full" if draw_uses or function else "structure"
+
+    if demand_driven and (function or namespace):
+        v = demand_driven_visitor(
+            filenames, function=function, namespace=namespace, root=root, analysis_level=analysis_level, hooks=hooks
+        )
+    else:
+        v = CallGraphVisitor(filenames, root=root, analysis_level=analysis_level, hooks=hooks)
     if function or namespace:
         if function:
             function_name = function.split(".")[-1]
@@ -82,19 +114,30 @@ def create_callgraph(
         else:
             node = None
         v.filter(node=node, namespace=namespace, max_iter=max_iter)
-    graph = VisualGraph.from_visitor(v, options=graph_options)
+    if simplify_passes:
+        simplify(v, simplify_passes)
+    graph = VisualGraph.from_visitor(v, options=graph_options, collapse_to=collapse_to)
+
+    if layout_engine == BUILTIN_ENGINE:
+        renderer = BuiltinRenderer()
+    else:
+        renderer = GraphvizRenderer(engine=layout_engine)
 
     stream = io.StringIO()
     if format == "dot":
-        writer = DotWriter(graph, options=["rankdir=" + rankdir], output=stream)
+        writer = DotWriter(graph, options=["rankdir=" + rankdir], output=stream, hooks=hooks)
         writer.run()
 
     elif format == "html":
-        writer = HTMLWriter(graph, options=["rankdir=" + rankdir], output=stream)
+        writer = HTMLWriter(graph, options=["rankdir=" + rankdir], output=stream, hooks=hooks, renderer=renderer)
         writer.run()
 
     elif format == "svg":
-        writer = SVGWriter(graph, options=["rankdir=" + rankdir], output=stream)
+        writer = SVGWriter(graph, options=["rankdir=" + rankdir], output=stream, hooks=hooks, renderer=renderer)
+        writer.run()
+
+    elif format == "interactive":
+        writer = InteractiveHTMLWriter(graph, output=stream, hooks=hooks)
         writer.run()
     else:
         raise ValueError(f"format {format} is unknown")
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Asyncio-friendly analysis API.
+
+The analysis runs in an executor, so that it does not block the event loop.
+Progress is reported per file and phase, and the analysis can be cancelled
+between files and phases by cancelling the awaiting task::
+
+    session = await pyan.analyze_async("mypackage/**/*.py", on_event=print)
+    svg = await session.render_async("svg")
+"""
+
+import asyncio
+from functools import partial
+from glob import glob
+import io
+import logging
+import threading
+
+from .analyzer import CallGraphVisitor
+from .hooks import AnalysisHooks
+from .visgraph import VisualGraph
+from .writers import DotWriter, TgfWriter, YedWriter, render_html
+
+
+class AnalysisCancelled(Exception):
+    """Raised in the executor to stop a cancelled analysis."""
+
+    pass
+
+
+class AnalysisEvent:
+    """A progress event of an asynchronous analysis.
+
+    kind is one of "file_start", "file_done", "phase" and "progress".
+    name is the filename or the phase name; duration is in seconds, and
+    done/total are the progress counts, where applicable.
+    """
+
+    def __init__(self, kind, name=None, duration=None, done=None, total=None):
+        self.kind = kind
+        self.name = name
+        self.duration = duration
+        self.done = done
+        self.total = total
+
+    def __repr__(self):
+        if self.kind == "progress":
+            return "<AnalysisEvent progress %d/%d>" % (self.done, self.total)
+        if self.duration is not None:
+            return "<AnalysisEvent %s %s (%.3fs)>" % (self.kind, self.name, self.duration)
+        return "<AnalysisEvent %s %s>" % (self.kind, self.name)
+
+
+class AsyncHooks(AnalysisHooks):
+    """Hooks that forward progress to the event loop, and stop the analysis once cancelled.
+
+    Each asynchronous operation gets its own hooks (see fork()), so that cancelling
+    one operation does not stop, nor is undone by, another."""
+
+    def __init__(self, loop, on_event=None):
+        self.loop = loop
+        self.on_event = on_event
+        self.cancelled = threading.Event()
+
+    def fork(self):
+        """Return new hooks reporting to the same loop and callback, with their own cancellation."""
+        return AsyncHooks(self.loop, self.on_event)
+
+    def emit(self, event):
+        if self.on_event is not None:
+            self.loop.call_soon_threadsafe(self.on_event, event)
+
+    def check_cancelled(self):
+        if self.cancelled.is_set():
+            raise AnalysisCancelled()
+
+    def on_file_start(self, filename):
+        self.check_cancelled()
+        self.emit(AnalysisEvent("file_start", filename))
+
+    def on_file_done(self, filename, duration, nodes_added, edges_added):
+        self.emit(AnalysisEvent("file_done", filename, duration))
+
+    def on_phase(self, name, duration):
+        self.emit(AnalysisEvent("phase", name, duration))
+        self.check_cancelled()
+
+    def on_progress(self, done, total):
+        self.emit(AnalysisEvent("progress", done=done, total=total))
+
+
+async def run_in_executor_cancellable(executor, hooks, func, *args):
+    """Run func(*args) in executor. If the awaiting task is cancelled, stop func at its next
+    file or phase boundary (through hooks), wait for it to stop, and re-raise the cancellation."""
+    future = asyncio.get_running_loop().run_in_executor(executor, partial(func, *args))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        hooks.cancelled.set()
+        try:
+            await future
+        except AnalysisCancelled:
+            pass
+        raise
+
+
+async def run_dot_async(dot_source, format="svg"):
+    """Render GraphViz dot source with the dot program, without blocking the event loop.
+
+    The process is killed if the awaiting task is cancelled.
+    """
+    process = await asyncio.create_subprocess_exec(
+        "dot",
+        "-T" + format,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await process.communicate(dot_source.encode())
+    except asyncio.CancelledError:
+        process.kill()
+        await process.wait()
+        raise
+    if process.returncode != 0:
+        raise RuntimeError("dot failed with exit code %d: %s" % (process.returncode, stderr.decode().strip()))
+    return stdout.decode()
+
+
+class AnalysisSession:
+    """The result of analyze_async(), which can be rendered in several formats."""
+
+    def __init__(self, visitor, hooks, executor=None, logger=None):
+        self.visitor = visitor
+        self.hooks = hooks
+        self.executor = executor
+        self.logger = logger or logging.getLogger(__name__)
+
+    def write(self, writer_class, graph, hooks, **kwargs):
+        stream = io.StringIO()
+        writer_class(graph, output=stream, logger=self.logger, hooks=hooks, **kwargs).run()
+        return stream.getvalue()
+
+    def render(self, format, graph_options, rankdir, hooks):
+        """Build the visual graph and write it in the given format (for svg and html, as dot)."""
+        graph = VisualGraph.from_visitor(self.visitor, options=graph_options, logger=self.logger)
+        hooks.check_cancelled()
+        if format == "tgf":
+            return self.write(TgfWriter, graph, hooks)
+        elif format == "yed":
+            return self.write(YedWriter, graph, hooks)
+        return self.write(DotWriter, graph, hooks, options=["rankdir=" + rankdir])
+
+    async def render_async(
+        self,
+        format: str = "dot",
+        rankdir: str = "LR",
+        nested_groups: bool = True,
+        draw_defines: bool = True,
+        draw_uses: bool = True,
+        colored: bool = True,
+        grouped_alt: bool = False,
+        annotated: bool = False,
+        grouped: bool = True,
+    ) -> str:
+        """Render the call graph; see create_callgraph() for the arguments.
+
+        format is one of "dot", "svg", "html", "tgf" and "yed". For svg and
+        html, GraphViz must be installed.
+        """
+        if format not in ("dot", "svg", "html", "tgf", "yed"):
+            raise ValueError(f"format {format} is unknown")
+        graph_options = {
+            "draw_defines": draw_defines,
+            "draw_uses": draw_uses,
+            "colored": colored,
+            "grouped_alt": grouped_alt,
+            "grouped": grouped or nested_groups,
+            "nested_groups": nested_groups,
+            "annotated": annotated,
+        }
+        hooks = self.hooks.fork()  # cancelling this render must not affect the analysis or other renders
+        output = await run_in_executor_cancellable(
+            self.executor, hooks, self.render, format, graph_options, rankdir, hooks
+        )
+        if format in ("svg", "html"):
+            output = await run_dot_async(output)
+        if format == "html":
+            output = render_html(output)
+        return output
+
+
+async def analyze_async(
+    filenames="**/*.py",
+    root: str = None,
+    function: str = None,
+    namespace: str = None,
+    analysis_level: str = "full",
+    max_iter: int = 1000,
+    on_event=None,
+    executor=None,
+    logger=None,
+    **kwargs,
+) -> AnalysisSession:
+    """Analyze the given files in an executor, without blocking the event loop.
+
+    filenames, root, function, namespace and max_iter are as in create_callgraph().
+    on_event, if given, is called in the event loop thread with an AnalysisEvent
+    for each file and phase. executor defaults to the loop's default executor.
+    Other keyword arguments are passed to CallGraphVisitor.
+
+    Cancelling the awaiting task stops the analysis at the next file or phase.
+    """
+    loop = asyncio.get_running_loop()
+    hooks = AsyncHooks(loop, on_event)
+    logger = logger or logging.getLogger(__name__)
+
+    def analyze():
+        patterns = [filenames] if isinstance(filenames, str) else filenames
+        files = [fn2 for fn in patterns for fn2 in glob(fn, recursive=True)]
+        v = CallGraphVisitor(files, root=root, logger=logger, analysis_level=analysis_level, hooks=hooks, **kwargs)
+        if function or namespace:
+            if function:
+                function_name = function.split(".")[-1]
+                function_namespace = ".".join(function.split(".")[:-1])
+                node = v.get_node(function_namespace, function_name)
+            else:
+                node = None
+            v.filter(node=node, namespace=namespace, max_iter=max_iter)
+        return v
+
+    visitor = await run_in_executor_cancellable(executor, hooks, analyze)
+    return AnalysisSession(visitor, hooks, executor=executor, logger=logger)
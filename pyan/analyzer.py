@@ -3,26 +3,36 @@
 """The AST visitor."""
 
 import ast
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import itertools
 import logging
 import symtable
+import sys
+import time
 from typing import Union
 
 from .anutils import (
     ExecuteInInnerScope,
+    FileTimeLimitExceeded,
     Scope,
     UnresolvedSuperCallError,
     format_alias,
     get_ast_node_name,
     get_module_name,
+    get_peak_memory_usage,
     resolve_method_resolution_order,
     sanitize_exprs,
     tail,
 )
-from .node import Flavor, Node
+from .hooks import AnalysisHooks, instrumented_phase
+from .node import Flavor, Node, SourceLocation
+from .profiling import NullProfiler
 
 # TODO: add Cython support (strip type annotations in a preprocess step, then treat as Python)
 # TODO: built-in functions (range(), enumerate(), zip(), iter(), ...):
-#       add to a special scope "built-in" in analyze_scopes() (or ignore altogether)
+#       add to a special scope "built-in" in build_scopes() (or ignore altogether)
 # TODO: support Node-ifying ListComp et al, List, Tuple
 # TODO: make the analyzer smarter (see individual TODOs below)
 
@@ -41,6 +51,16 @@ from .node import Flavor, Node
 # https://docs.python.org/3/library/ast.html#abstract-grammar
 #
 
+# Analysis levels, from cheapest to most complete:
+#
+#  - "structure": only the module/class/function hierarchy (defines edges).
+#    Function bodies and other expressions are not visited; single pass.
+#  - "resolve": also uses edges, but without the expensive expand_unknowns()
+#    and cull_inherited() postprocessing steps.
+#  - "full": everything.
+#
+ANALYSIS_LEVELS = ("structure", "resolve", "full")
+
 
 class CallGraphVisitor(ast.NodeVisitor):
     """A visitor that can be walked over a Python AST, and will derive
@@ -51,16 +71,71 @@ class CallGraphVisitor(ast.NodeVisitor):
     all files.  This way use information between objects in different files
     can be gathered."""
 
-    def __init__(self, filenames, root: str = None, logger=None):
+    def __init__(
+        self,
+        filenames,
+        root: str = None,
+        logger=None,
+        strict: bool = False,
+        analysis_level: str = "full",
+        profiler=None,
+        hooks=None,
+        low_memory: bool = False,
+        max_memory: int = None,
+        parse_threads: int = 1,
+        max_file_bytes: int = None,
+        max_ast_nodes: int = None,
+        file_time_limit: float = None,
+        external_summaries=None,
+    ):
         self.logger = logger or logging.getLogger(__name__)
+        self.profiler = profiler or NullProfiler()  # see pyan.profiling.Profiler
+        self.hooks = hooks or AnalysisHooks()
+        # Guards diagnostics whose arguments are costly to compute even when not logged.
+        self.debug_enabled = self.logger.isEnabledFor(logging.DEBUG)
+        self.info_enabled = self.logger.isEnabledFor(logging.INFO)
+
+        if analysis_level not in ANALYSIS_LEVELS:
+            raise ValueError("Unknown analysis level '%s'; expected one of %s" % (analysis_level, ANALYSIS_LEVELS))
+        self.analysis_level = analysis_level
 
         # full module names for all given files
         self.module_to_filename = {}  # inverse mapping for recording which file each AST node came from
         for filename in filenames:
-            mod_name = get_module_name(filename)
+            mod_name = self.get_module_name(filename)
             self.module_to_filename[mod_name] = filename
         self.filenames = filenames
         self.root = root
+        self.strict = strict  # re-visit all files in pass 2, not only those with unresolved lookups
+
+        # In low-memory mode, Nodes keep only the source location of their AST node, so that
+        # the ASTs of analyzed files can be freed. If max_memory (bytes) is given, low-memory
+        # mode is switched on once the peak memory usage of the process exceeds it. Nothing is
+        # spilled to disk; the graph and scopes stay in memory, so max_memory is a trigger, not a cap.
+        self.low_memory = low_memory
+        self.max_memory = max_memory
+
+        # With parse_threads > 1, files are read and parsed, and their symbol tables built, by a thread
+        # pool ahead of their visits (see process_files()). This scales on free-threaded Python builds.
+        # Only parsing is concurrent: the visits, which update the shared analysis state, run
+        # sequentially in the given order, so the result is that of a sequential run.
+        self.parse_threads = parse_threads
+        if parse_threads > 1 and getattr(sys, "_is_gil_enabled", lambda: True)():
+            self.logger.info("The GIL is enabled; parsing with %d threads will not run faster", parse_threads)
+
+        # Per-file budgets. Files that cannot be read or parsed, or that are larger than max_file_bytes,
+        # are skipped. Files with more than max_ast_nodes AST nodes, or whose analysis takes longer than
+        # file_time_limit seconds (checked between definitions), are degraded to structure-only analysis.
+        # The edges added by an interrupted visit are rolled back before the structure-only visit.
+        self.max_file_bytes = max_file_bytes
+        self.max_ast_nodes = max_ast_nodes
+        self.file_time_limit = file_time_limit
+        self.skipped_files = {}  # filename: reason
+        self.degraded_files = {}  # filename: reason
+
+        # If given (a pyan.external.PackageSummaries), references into installed third-party
+        # packages are resolved against summaries of those packages (see resolve_external()).
+        self.external_summaries = external_summaries
 
         # data gathered from analysis
         self.defines_edges = {}
@@ -72,9 +147,39 @@ class CallGraphVisitor(ast.NodeVisitor):
         self.class_base_nodes = {}  # pass 2: class Node: list of Node objects (local bases, no recursion)
         self.mro = {}  # pass 2: class Node: list of Node objects in Python's MRO order
 
+        # pass 2: attr name: {class Node: (base Node, value Node)}, memo table for inherited attribute lookups
+        self.inherited_attributes = {}
+
+        # cumulative counters, for monitoring (see also pyan.hooks)
+        self.counters = {
+            "nodes_created": 0,
+            "edges_added": 0,  # defines and uses edges
+            "wildcards_created": 0,  # nodes *.name
+            "wildcard_expansions": 0,  # edges added by expand_unknowns()
+            "nonexistents_contracted": 0,  # edges redirected to wildcards by contract_nonexistents()
+            "import_remaps": 0,  # imported items mapped to their definitions by resolve_imports()
+            "inherited_edges_culled": 0,  # edges removed by cull_inherited()
+            "inherited_attribute_cache_hits": 0,
+            "inherited_attribute_cache_misses": 0,
+            "files_skipped": 0,
+            "files_degraded": 0,
+            "files_revisited": 0,  # files visited again in pass 2
+            "external_resolved": 0,  # references resolved by resolve_external()
+        }
+
+        # pass 1: filename: lookups (as dict keys) that failed (or may be shadowed) in pass 1, re-checked before pass 2
+        self.unresolved_lookups = {}
+
+        # changes to the graph by the visit of the current file, recorded only if it may be interrupted
+        # by file_time_limit (see rollback_file_changes()); list of (kind, Node, Node or None)
+        self.file_changes = None
+
         # current context for analysis
+        self.pass_number = None
         self.module_name = None
         self.filename = None
+        self.structure_only = analysis_level == "structure"  # visit only definitions in the current file
+        self.file_deadline = None  # time.perf_counter() value by which the current file must be done
         self.name_stack = []  # for building namespace name, node naming
         self.scope_stack = []  # the Scope objects currently in scope
         self.class_stack = []  # Nodes for class definitions currently in scope
@@ -85,31 +190,334 @@ class CallGraphVisitor(ast.NodeVisitor):
         self.process()
 
     def process(self):
-        """Analyze the set of files, twice so that any forward-references are picked up."""
+        """Analyze the set of files, twice so that any forward-references are picked up.
+
+        Pass 2 re-visits only those files that have a lookup recorded in pass 1
+        which resolves differently now that all files have been seen (see
+        select_files_for_pass_2()). In strict mode, all files are re-visited.
+
+        At the "structure" analysis level, only definitions are visited, so a
+        single pass suffices, and no postprocessing is needed."""
+        if self.analysis_level == "structure":
+            self.pass_number = 1
+            with self.phase("pass 1"):
+                self.process_files(self.filenames, 0, len(self.filenames))
+            self.pass_number = None
+            self.report_budget_violations()
+            return
+
+        done = 0
+        total = 2 * len(self.filenames)  # refined once the files for pass 2 are known
         for pas in range(2):
-            for filename in self.filenames:
-                self.logger.info("========== pass %d, file '%s' ==========" % (pas + 1, filename))
-                self.process_one(filename)
+            self.pass_number = pas + 1
+            if pas == 0 or self.strict:
+                filenames = self.filenames
+            else:
+                with self.phase("select_files_for_pass_2"):
+                    filenames = self.select_files_for_pass_2()
+                self.logger.info("Pass 2: re-visiting %d of %d files", len(filenames), len(self.filenames))
+                total = len(self.filenames) + len(filenames)
+                self.hooks.on_progress(done, total)
+            if pas == 1:
+                self.counters["files_revisited"] = len(filenames)
+            with self.phase("pass %d" % (pas + 1)):
+                done = self.process_files(filenames, done, total)
             if pas == 0:
-                self.resolve_base_classes()  # must be done only after all files seen
+                with self.phase("resolve_base_classes"):
+                    self.resolve_base_classes()  # must be done only after all files seen
+        self.pass_number = None
+        self.report_budget_violations()
+        hits = self.counters["inherited_attribute_cache_hits"]
+        lookups = hits + self.counters["inherited_attribute_cache_misses"]
+        if lookups:
+            self.logger.info(
+                "Inherited attribute lookups: %d, memo hits: %d (%.1f%%)", lookups, hits, 100.0 * hits / lookups
+            )
         self.postprocess()
 
-    def process_one(self, filename):
-        """Analyze the specified Python source file."""
+    def process_files(self, filenames, done, total):
+        """Analyze the given files in the current pass, in the given order.
+
+        With parse_threads > 1, a thread pool parses the files (see parse_file()) a few
+        files ahead of their visits. The visits, which update the shared analysis
+        state, always run in this thread and in order, as the result depends on
+        the order in which files are visited.
+
+        done and total are the progress so far, for reporting to the hooks.
+        Return the updated number of files done.
+        """
+        if self.parse_threads > 1 and len(filenames) > 1:
+            with ThreadPoolExecutor(max_workers=self.parse_threads) as executor:
+
+                def submit(filename):
+                    if filename in self.skipped_files:
+                        return filename, None
+                    return filename, executor.submit(self.parse_file, filename, profiled=False)
+
+                # Parse a bounded number of files ahead, so that only a few ASTs are kept at a time.
+                remaining = iter(filenames)
+                pending = deque(submit(filename) for filename in itertools.islice(remaining, 2 * self.parse_threads))
+                while pending:
+                    filename, parsed = pending.popleft()
+                    for filename_ahead in itertools.islice(remaining, 1):
+                        pending.append(submit(filename_ahead))
+                    self.logger.info("========== pass %d, file '%s' ==========", self.pass_number, filename)
+                    self.process_one(filename, parsed)
+                    done += 1
+                    self.hooks.on_progress(done, total)
+        else:
+            for filename in filenames:
+                self.logger.info("========== pass %d, file '%s' ==========", self.pass_number, filename)
+                self.process_one(filename)
+                done += 1
+                self.hooks.on_progress(done, total)
+        return done
+
+    def process_one(self, filename, parsed=None):
+        """Analyze the specified Python source file.
+
+        parsed is a future of parse_file() for the file, if it is parsed in a worker thread."""
         if filename not in self.filenames:
             raise ValueError(
                 "Filename '%s' has not been preprocessed (was not given to __init__, which got %s)"
                 % (filename, self.filenames)
             )
-        with open(filename, "rt", encoding="utf-8") as f:
-            content = f.read()
+        if filename in self.skipped_files:
+            return
+        self.hooks.on_file_start(filename)
+        nodes_before = self.counters["nodes_created"]
+        edges_before = self.counters["edges_added"]
+        t0 = time.perf_counter()
         self.filename = filename
-        self.module_name = get_module_name(filename, root=self.root)
-        self.analyze_scopes(content, filename)  # add to the currently known scopes
-        self.visit(ast.parse(content, filename))
+        self.module_name = self.get_module_name(filename, root=self.root)
+        tree = self.load_file(filename, parsed)
+        if tree is not None:
+            self.structure_only = self.analysis_level == "structure" or filename in self.degraded_files
+            if self.file_time_limit is not None:
+                self.file_deadline = t0 + self.file_time_limit
+                self.file_changes = []
+            with self.phase("visit"):
+                try:
+                    self.visit(tree)
+                except FileTimeLimitExceeded:
+                    self.degrade_file(filename, "time limit of %gs exceeded" % self.file_time_limit)
+                    # The analysis was interrupted; discard its partial results, reset its context,
+                    # and make sure all definitions are seen.
+                    self.rollback_file_changes()
+                    self.name_stack = []
+                    self.scope_stack = []
+                    self.class_stack = []
+                    self.context_stack = []
+                    self.last_value = None
+                    self.file_deadline = None
+                    self.structure_only = True
+                    self.visit(tree)
+            self.file_deadline = None
+            self.file_changes = None
+        duration = time.perf_counter() - t0
+        if not self.low_memory and self.max_memory is not None:
+            self.check_memory_budget()
+        self.profiler.record_file(filename, duration)
+        self.hooks.on_file_done(
+            filename,
+            duration,
+            self.counters["nodes_created"] - nodes_before,
+            self.counters["edges_added"] - edges_before,
+        )
         self.module_name = None
         self.filename = None
 
+    def load_file(self, filename, parsed=None):
+        """Read and parse the specified file, and add its scope information to the known scopes.
+
+        parsed is a future of parse_file() for the file, if it is parsed in a worker thread.
+
+        Return the AST, or None if the file is skipped, because it could not be
+        read or parsed, or because it exceeds the size limit. Files that exceed
+        the AST node limit are marked as degraded."""
+        try:
+            size, scopes, tree = parsed.result() if parsed is not None else self.parse_file(filename)
+        except (OSError, SyntaxError, ValueError, RecursionError) as e:  # ValueError includes UnicodeDecodeError
+            self.skip_file(filename, "%s: %s" % (type(e).__name__, e))
+            return None
+        if tree is None:
+            self.skip_file(filename, "size of %d bytes exceeds limit of %d" % (size, self.max_file_bytes))
+            return None
+        self.merge_scopes(scopes)
+        if self.max_ast_nodes is not None and self.pass_number == 1 and filename not in self.degraded_files:
+            count = sum(1 for _ in ast.walk(tree))
+            if count > self.max_ast_nodes:
+                self.degrade_file(filename, "%d AST nodes exceed limit of %d" % (count, self.max_ast_nodes))
+        return tree
+
+    def parse_file(self, filename, profiled=True):
+        """Read and parse the specified file, and build its scope information.
+
+        Return (size, scopes, tree), where size is in bytes if max_file_bytes is set.
+        If the file exceeds max_file_bytes, scopes and tree are None.
+
+        This does not modify the analysis state, so it may run in a worker thread.
+        There, pass profiled=False, as the profiler is not thread-safe; the phases
+        are then reported to the hooks only (from the worker thread)."""
+        phase = self.phase if profiled else partial(instrumented_phase, profiler=NullProfiler(), hooks=self.hooks)
+        with phase("read"):
+            content = self.read_source(filename)
+        size = None
+        if self.max_file_bytes is not None:
+            size = len(content.encode("utf-8"))
+            if size > self.max_file_bytes:
+                return size, None, None
+        with phase("symtable"):
+            scopes = self.build_scopes(content, filename, self.get_module_name(filename, root=self.root))
+        with phase("parse"):
+            tree = ast.parse(content, filename)
+        return size, scopes, tree
+
+    def skip_file(self, filename, reason):
+        self.logger.warning("Skipping file '%s': %s", filename, reason)
+        self.skipped_files[filename] = reason
+        self.counters["files_skipped"] += 1
+
+    def degrade_file(self, filename, reason):
+        self.logger.warning("Analyzing only the definitions in file '%s': %s", filename, reason)
+        self.degraded_files[filename] = reason
+        self.counters["files_degraded"] += 1
+
+    def check_file_deadline(self):
+        """Raise FileTimeLimitExceeded if the current file has exceeded its time limit."""
+        if self.file_deadline is not None and time.perf_counter() > self.file_deadline:
+            raise FileTimeLimitExceeded()
+
+    def rollback_file_changes(self):
+        """Undo the changes to the graph recorded in self.file_changes, and stop recording."""
+        for kind, from_node, to_node in reversed(self.file_changes):
+            if kind == "defined":
+                from_node.defined = False
+            elif kind == "defines":
+                self.defines_edges[from_node].discard(to_node)
+            elif kind == "uses":
+                self.uses_edges[from_node].discard(to_node)
+            else:  # "removed uses"
+                self.uses_edges.setdefault(from_node, set()).add(to_node)
+        self.file_changes = None
+
+    def trace(self, level, kind, msg, *args, line=None, **fields):
+        """Log a structured trace event of the analysis.
+
+        The record is formatted from msg and args like a plain log message, and also carries
+        a ``pyan_event`` dict with the event kind ("visit", "defines_edge", "uses_edge",
+        "get_value" or "set_value"), the file and line being analyzed, and the given fields.
+        Node-valued fields are given by their full name, so that handlers can filter events
+        without parsing the message.
+        """
+        if not (self.debug_enabled if level <= logging.DEBUG else self.info_enabled):
+            return
+        event = {"kind": kind, "file": self.filename, "line": line}
+        for key, value in fields.items():
+            event[key] = value.get_name() if isinstance(value, Node) else value
+        self.logger.log(level, msg, *args, extra={"pyan_event": event})
+
+    def report_budget_violations(self):
+        """Log a summary of the files that were skipped or degraded."""
+        if self.skipped_files:
+            self.logger.warning(
+                "Skipped %d file(s):\n%s",
+                len(self.skipped_files),
+                "\n".join("    %s: %s" % item for item in sorted(self.skipped_files.items())),
+            )
+        if self.degraded_files:
+            self.logger.warning(
+                "Analyzed only the definitions in %d file(s):\n%s",
+                len(self.degraded_files),
+                "\n".join("    %s: %s" % item for item in sorted(self.degraded_files.items())),
+            )
+
+    def read_source(self, filename):
+        """Return the source code of the given file. Override to analyze sources not on disk."""
+        with open(filename, "rt", encoding="utf-8") as f:
+            return f.read()
+
+    def get_module_name(self, filename, root=None):
+        """Return the full module name of the given file. Override to analyze sources not on disk."""
+        return get_module_name(filename, root=root)
+
+    def check_memory_budget(self):
+        """Switch to low-memory mode if the memory usage exceeds max_memory."""
+        usage = get_peak_memory_usage()
+        if usage is None:
+            self.logger.warning("Cannot determine memory usage on this platform; switching to low-memory mode")
+        elif usage > self.max_memory:
+            self.logger.info(
+                "Memory usage %.1f MiB exceeds budget of %.1f MiB; switching to low-memory mode",
+                usage / 2**20,
+                self.max_memory / 2**20,
+            )
+        else:
+            return
+        self.compact_nodes()
+        self.low_memory = True
+
+    def compact_nodes(self):
+        """Replace the AST nodes associated with all Nodes by their source locations."""
+        for nodes in self.nodes.values():
+            for n in nodes:
+                n.ast_node = SourceLocation.from_ast_node(n.ast_node)
+
+    def phase(self, name):
+        """Context manager that reports the enclosed code as the named phase to the profiler and hooks."""
+        return instrumented_phase(name, self.profiler, self.hooks)
+
+    def record_unresolved(self, *lookup):
+        """Record a lookup in the current file that may resolve differently in pass 2.
+
+        Lookups are recorded in pass 1 only, as tuples starting with a kind:
+
+          - ("name", name, scopes, value): get_value() found no value for name
+            in any of the given scopes (which may still get one later), and
+            returned value (from an outer scope, or None).
+          - ("attr", obj_node, attr_name): attr_name was not found in the
+            namespace of obj_node (may be defined later, or inherited
+            once the MRO is known).
+          - ("call", node): a call to node, which may turn out to be a class.
+          - ("super",): super() cannot be resolved before the MRO is known.
+        """
+        if self.pass_number == 1 and self.filename is not None:
+            # a dict as an ordered set, so that select_files_for_pass_2() checks them in a fixed order
+            self.unresolved_lookups.setdefault(self.filename, {})[lookup] = None
+
+    def select_files_for_pass_2(self):
+        """Return the files with a pass 1 lookup that would now resolve differently.
+
+        Run this between pass 1 and pass 2, after resolve_base_classes()."""
+
+        def resolves(lookup):
+            kind = lookup[0]
+            if kind == "name":
+                _, name, scopes, value = lookup
+                for sc in reversed(scopes):  # innermost first, as in get_value()
+                    if sc.defs.get(name) is not None:
+                        return sc.defs[name] is not value
+                return False
+            elif kind == "attr":
+                _, obj_node, attr_name = lookup
+                ns = obj_node.get_name()
+                sc = self.scopes.get(ns)
+                value_node = sc.defs.get(attr_name) if sc is not None else None
+                if not isinstance(value_node, Node) and obj_node in self.mro:
+                    value_node = self.lookup_inherited_attribute(obj_node, attr_name)[1]
+                # In pass 1, the lookup fell back to the Node ns.attr_name; it resolves differently now
+                # only if it finds another Node (e.g. not a forward reference to a method of the same class).
+                return isinstance(value_node, Node) and (value_node.namespace, value_node.name) != (ns, attr_name)
+            elif kind == "call":
+                return lookup[1] in self.class_base_ast_nodes
+            return True  # "super"
+
+        return [
+            filename
+            for filename in self.filenames
+            if any(resolves(lookup) for lookup in self.unresolved_lookups.get(filename, ()))
+        ]
+
     def resolve_base_classes(self):
         """Resolve base classes from AST nodes to Nodes.
 
@@ -136,11 +544,12 @@ class CallGraphVisitor(ast.NodeVisitor):
                 if isinstance(baseclass_node, Node) and baseclass_node.namespace is not None:
                     self.class_base_nodes[node].append(baseclass_node)
 
-        self.logger.debug("All base classes (non-recursive, local level only): %s" % self.class_base_nodes)
+        self.logger.debug("All base classes (non-recursive, local level only): %s", self.class_base_nodes)
 
         self.logger.debug("Resolving method resolution order (MRO) for all analyzed classes")
         self.mro = resolve_method_resolution_order(self.class_base_nodes, self.logger)
-        self.logger.debug("Method resolution order (MRO) for all analyzed classes: %s" % self.mro)
+        self.inherited_attributes = {}
+        self.logger.debug("Method resolution order (MRO) for all analyzed classes: %s", self.mro)
 
     def postprocess(self):
         """Finalize the analysis."""
@@ -159,11 +568,25 @@ class CallGraphVisitor(ast.NodeVisitor):
         # those references that could not be resolved to any known name, and
         # then remove any references pointing outside the analyzed file set.
 
-        self.expand_unknowns()
-        self.resolve_imports()
-        self.contract_nonexistents()
-        self.cull_inherited()
-        self.collapse_inner()
+        #
+        # At the "resolve" analysis level, the unknowns are not expanded (only
+        # hidden), and inherited edges are not culled.
+
+        if self.analysis_level == "full":
+            steps = [
+                self.expand_unknowns,
+                self.resolve_imports,
+                self.contract_nonexistents,
+                self.cull_inherited,
+                self.collapse_inner,
+            ]
+        else:
+            steps = [self.hide_unknowns, self.resolve_imports, self.contract_nonexistents, self.collapse_inner]
+        if self.external_summaries is not None:
+            steps.insert(0, self.resolve_external)
+        for step in steps:
+            with self.phase(step.__name__):
+                step()
 
     ###########################################################################
     # visitor methods
@@ -224,20 +647,101 @@ class CallGraphVisitor(ast.NodeVisitor):
                                     attribute_import_mapping[node] = candidate_to_node
                                     break
         import_mapping.update(attribute_import_mapping)
+        self.counters["import_remaps"] += len(import_mapping)
+        self.remap_nodes(import_mapping)
+
+    def remap_nodes(self, mapping):
+        """Replace Nodes by other Nodes (given as a dict old: new) throughout the graph.
+
+        Several Nodes may be replaced by the same Node, which may also exist already;
+        each Node is listed only once in self.nodes."""
 
-        # remap nodes based on import mapping
-        self.nodes = {name: [import_mapping.get(n, n) for n in items] for name, items in self.nodes.items()}
+        def remap_items(items):
+            remapped = {mapping.get(n, n): None for n in items}  # Nodes compare by identity
+            return list(remapped)
+
+        self.nodes = {name: remap_items(items) for name, items in self.nodes.items()}
         self.uses_edges = {
-            import_mapping.get(from_node, from_node): {import_mapping.get(to_node, to_node) for to_node in to_nodes}
+            mapping.get(from_node, from_node): {mapping.get(to_node, to_node) for to_node in to_nodes}
             for from_node, to_nodes in self.uses_edges.items()
             if len(to_nodes) > 0
         }
         self.defines_edges = {
-            import_mapping.get(from_node, from_node): {import_mapping.get(to_node, to_node) for to_node in to_nodes}
+            mapping.get(from_node, from_node): {mapping.get(to_node, to_node) for to_node in to_nodes}
             for from_node, to_nodes in self.defines_edges.items()
             if len(to_nodes) > 0
         }
 
+    def resolve_external(self):
+        """Resolve references into installed third-party packages, using self.external_summaries.
+
+        Each undefined uses target that names something in a third-party package
+        (directly, or as an attribute that an analyzed class inherits from a
+        third-party base class) is replaced by a defined Node for the definition
+        found in the package summaries, nested in Nodes for its module and class.
+        """
+        project_packages = {name.split(".", 1)[0] for name in self.module_to_filename}
+        classes = {class_node.get_name(): class_node for class_node in self.mro}
+        targets = {n for nodes in self.uses_edges.values() for n in nodes if not n.defined and n.namespace is not None}
+
+        mapping = {}
+        for node in targets:
+            definition = None
+            if node.get_name().split(".", 1)[0] not in project_packages:
+                definition = self.external_summaries.resolve(node.get_name())
+            elif node.namespace in classes:
+                for base_name in self.get_external_base_names(classes[node.namespace], project_packages):
+                    definition = self.external_summaries.resolve_member(base_name, node.name)
+                    if definition is not None:
+                        break
+            if definition is not None:
+                self.logger.info("Resolved %s to third-party %s", node, definition)
+                mapping[node] = self.get_external_node(definition)
+
+        self.counters["external_resolved"] += len(mapping)
+        self.remap_nodes({n: n2 for n, n2 in mapping.items() if n is not n2})
+        self.external_summaries.save()
+
+    def get_external_base_names(self, class_node, project_packages):
+        """Return the fully qualified names of the third-party base classes of an analyzed class
+        (and of its analyzed ancestors), in MRO order."""
+        names = []
+        for ancestor in self.mro[class_node]:
+            scope = self.scopes.get(ancestor.namespace)  # the scope enclosing the class definition
+            for ast_node in self.class_base_ast_nodes.get(ancestor, []):
+                name = get_ast_node_name(ast_node)
+                if scope is None or not isinstance(name, str):
+                    continue
+                head, _, rest = name.partition(".")
+                value = scope.defs.get(head)
+                if isinstance(value, Node) and value.namespace is not None:
+                    name = value.get_name() + ("." + rest if rest else "")
+                if name.split(".", 1)[0] not in project_packages:
+                    names.append(name)
+        return names
+
+    def get_external_node(self, definition):
+        """Return a defined Node for a pyan.external.ExternalDefinition, nested in its module and class Nodes."""
+        module_node = self.get_node("", definition.module, None, flavor=Flavor.MODULE)
+        module_node.defined = True
+        module_node.filename = definition.filename
+        if definition.flavor == Flavor.MODULE:
+            return module_node
+
+        parent_node = module_node
+        if definition.namespace != definition.module:  # a class member
+            class_name = definition.namespace[len(definition.module) + 1 :]
+            parent_node = self.get_node(definition.module, class_name, None, flavor=Flavor.CLASS)
+            parent_node.filename = definition.filename
+            self.add_defines_edge(module_node, parent_node)
+
+        node = self.get_node(definition.namespace, definition.name, None, flavor=definition.flavor)
+        node.filename = definition.filename
+        if definition.lineno is not None:
+            node.ast_node = SourceLocation(definition.lineno, end_lineno=definition.end_lineno)
+        self.add_defines_edge(parent_node, node)
+        return node
+
     def filter(self, node: Union[None, Node] = None, namespace: Union[str, None] = None, max_iter: int = 1000):
         """
         filter callgraph nodes that related to `node` or are in `namespace`
@@ -330,7 +834,7 @@ class CallGraphVisitor(ast.NodeVisitor):
         return new_nodes
 
     def visit_Module(self, node):
-        self.logger.debug("Module %s, %s" % (self.module_name, self.filename))
+        self.trace(logging.DEBUG, "visit", "Module %s, %s", self.module_name, self.filename)
 
         # Modules live in the top-level namespace, ''.
         module_node = self.get_node("", self.module_name, node, flavor=Flavor.MODULE)
@@ -340,23 +844,38 @@ class CallGraphVisitor(ast.NodeVisitor):
         self.name_stack.append(ns)
         self.scope_stack.append(self.scopes[ns])
         self.context_stack.append("Module %s" % (ns))
-        self.generic_visit(node)  # visit the **children** of node
+        if self.structure_only:
+            self.visit_definitions(node.body)
+        else:
+            self.generic_visit(node)  # visit the **children** of node
         self.context_stack.pop()
         self.scope_stack.pop()
         self.name_stack.pop()
         self.last_value = None
 
         if self.add_defines_edge(module_node, None):
-            self.logger.info("Def Module %s" % node)
+            self.trace(logging.INFO, "defines_edge", "Def Module %s", module_node, target=module_node)
 
     def visit_ClassDef(self, node):
-        self.logger.debug("ClassDef %s, %s:%s" % (node.name, self.filename, node.lineno))
+        self.trace(
+            logging.DEBUG, "visit", "ClassDef %s, %s:%s", node.name, self.filename, node.lineno, line=node.lineno
+        )
+        self.check_file_deadline()
 
         from_node = self.get_node_of_current_namespace()
         ns = from_node.get_name()
         to_node = self.get_node(ns, node.name, node, flavor=Flavor.CLASS)
         if self.add_defines_edge(from_node, to_node):
-            self.logger.info("Def from %s to Class %s" % (from_node, to_node))
+            self.trace(
+                logging.INFO,
+                "defines_edge",
+                "Def from %s to Class %s",
+                from_node,
+                to_node,
+                source=from_node,
+                target=to_node,
+                line=node.lineno,
+            )
 
         # The graph Node may have been created earlier by a FromImport,
         # in which case its AST node points to the site of the import.
@@ -379,14 +898,17 @@ class CallGraphVisitor(ast.NodeVisitor):
         self.context_stack.append("ClassDef %s" % (node.name))
 
         self.class_base_ast_nodes[to_node] = []
-        for b in node.bases:
-            # gather info for resolution of inherited attributes in pass 2 (see get_attribute())
-            self.class_base_ast_nodes[to_node].append(b)
-            # mark uses from a derived class to its bases (via names appearing in a load context).
-            self.visit(b)
+        if self.structure_only:
+            self.visit_definitions(node.body)
+        else:
+            for b in node.bases:
+                # gather info for resolution of inherited attributes in pass 2 (see get_attribute())
+                self.class_base_ast_nodes[to_node].append(b)
+                # mark uses from a derived class to its bases (via names appearing in a load context).
+                self.visit(b)
 
-        for stmt in node.body:
-            self.visit(stmt)
+            for stmt in node.body:
+                self.visit(stmt)
 
         self.context_stack.pop()
         self.scope_stack.pop()
@@ -394,7 +916,10 @@ class CallGraphVisitor(ast.NodeVisitor):
         self.class_stack.pop()
 
     def visit_FunctionDef(self, node):
-        self.logger.debug("FunctionDef %s, %s:%s" % (node.name, self.filename, node.lineno))
+        self.trace(
+            logging.DEBUG, "visit", "FunctionDef %s, %s:%s", node.name, self.filename, node.lineno, line=node.lineno
+        )
+        self.check_file_deadline()
 
         # To begin with:
         #
@@ -416,7 +941,16 @@ class CallGraphVisitor(ast.NodeVisitor):
         ns = from_node.get_name()
         to_node = self.get_node(ns, node.name, node, flavor=flavor)
         if self.add_defines_edge(from_node, to_node):
-            self.logger.info("Def from %s to Function %s" % (from_node, to_node))
+            self.trace(
+                logging.INFO,
+                "defines_edge",
+                "Def from %s to Function %s",
+                from_node,
+                to_node,
+                source=from_node,
+                target=to_node,
+                line=node.lineno,
+            )
 
         # Same remarks as for ClassDef above.
         #
@@ -430,6 +964,13 @@ class CallGraphVisitor(ast.NodeVisitor):
         self.scope_stack.append(self.scopes[inner_ns])
         self.context_stack.append("FunctionDef %s" % (node.name))
 
+        if self.structure_only:
+            self.visit_definitions(node.body)
+            self.context_stack.pop()
+            self.scope_stack.pop()
+            self.name_stack.pop()
+            return
+
         # Capture which names correspond to function args.
         #
         self.generate_args_nodes(node.args, inner_ns)
@@ -446,7 +987,7 @@ class CallGraphVisitor(ast.NodeVisitor):
         if self_name is not None:
             class_node = self.get_current_class()
             self.scopes[inner_ns].defs[self_name] = class_node
-            self.logger.info('Method def: setting self name "%s" to %s' % (self_name, class_node))
+            self.logger.info('Method def: setting self name "%s" to %s', self_name, class_node)
 
         # record bindings of args to the given default values, if present
         self.analyze_arguments(node.args)
@@ -462,12 +1003,26 @@ class CallGraphVisitor(ast.NodeVisitor):
         self.scope_stack.pop()
         self.name_stack.pop()
 
+    def visit_definitions(self, stmts):
+        """Visit only the class and function definitions in a list of statements.
+
+        Used at the "structure" analysis level. Compound statements (if, try,
+        with, ...) are searched for nested definitions, but no expressions
+        are visited, so no uses edges are generated."""
+        for stmt in stmts:
+            if isinstance(stmt, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+                self.visit(stmt)
+            else:
+                self.visit_definitions(
+                    [child for child in ast.iter_child_nodes(stmt) if not isinstance(child, ast.expr)]
+                )
+
     def visit_AsyncFunctionDef(self, node):
         self.visit_FunctionDef(node)  # TODO: alias for now; tag async functions in output in a future version?
 
     def visit_Lambda(self, node):
         # TODO: avoid lumping together all lambdas in the same namespace.
-        self.logger.debug("Lambda, %s:%s" % (self.filename, node.lineno))
+        self.trace(logging.DEBUG, "visit", "Lambda, %s:%s", self.filename, node.lineno, line=node.lineno)
         with ExecuteInInnerScope(self, "lambda"):
             inner_ns = self.get_node_of_current_namespace().get_name()
             self.generate_args_nodes(node.args, inner_ns)
@@ -523,7 +1078,16 @@ class CallGraphVisitor(ast.NodeVisitor):
                     self.analyze_binding(targets, values)
 
     def visit_Import(self, node):
-        self.logger.debug("Import %s, %s:%s" % ([format_alias(x) for x in node.names], self.filename, node.lineno))
+        if self.debug_enabled:
+            self.trace(
+                logging.DEBUG,
+                "visit",
+                "Import %s, %s:%s",
+                [format_alias(x) for x in node.names],
+                self.filename,
+                node.lineno,
+                line=node.lineno,
+            )
 
         # TODO: add support for relative imports (path may be like "....something.something")
         # https://www.python.org/dev/peps/pep-0328/#id10
@@ -532,10 +1096,17 @@ class CallGraphVisitor(ast.NodeVisitor):
             self.analyze_module_import(import_item, node)
 
     def visit_ImportFrom(self, node):
-        self.logger.debug(
-            "ImportFrom: from %s import %s, %s:%s"
-            % (node.module, [format_alias(x) for x in node.names], self.filename, node.lineno)
-        )
+        if self.debug_enabled:
+            self.trace(
+                logging.DEBUG,
+                "visit",
+                "ImportFrom: from %s import %s, %s:%s",
+                node.module,
+                [format_alias(x) for x in node.names],
+                self.filename,
+                node.lineno,
+                line=node.lineno,
+            )
         # Pyan needs to know the package structure, and how the program
         # being analyzed is actually going to be invoked (!), to be able to
         # resolve relative imports correctly.
@@ -543,29 +1114,57 @@ class CallGraphVisitor(ast.NodeVisitor):
         # As a solution, we register imports here and later, when all files have been parsed, resolve them.
         from_node = self.get_node_of_current_namespace()
         if node.module is None:  # resolve relative imports 'None' such as "from . import foo"
-            self.logger.debug(
-                "ImportFrom (original) from %s import %s, %s:%s"
-                % ("." * node.level, [format_alias(x) for x in node.names], self.filename, node.lineno)
-            )
+            if self.debug_enabled:
+                self.trace(
+                    logging.DEBUG,
+                    "visit",
+                    "ImportFrom (original) from %s import %s, %s:%s",
+                    "." * node.level,
+                    [format_alias(x) for x in node.names],
+                    self.filename,
+                    node.lineno,
+                    line=node.lineno,
+                )
             tgt_level = node.level
             current_module_namespace = self.module_name.rsplit(".", tgt_level)[0]
             tgt_name = current_module_namespace
-            self.logger.debug(
-                "ImportFrom (resolved): from %s import %s, %s:%s"
-                % (tgt_name, [format_alias(x) for x in node.names], self.filename, node.lineno)
-            )
+            if self.debug_enabled:
+                self.trace(
+                    logging.DEBUG,
+                    "visit",
+                    "ImportFrom (resolved): from %s import %s, %s:%s",
+                    tgt_name,
+                    [format_alias(x) for x in node.names],
+                    self.filename,
+                    node.lineno,
+                    line=node.lineno,
+                )
         elif node.level != 0:  # resolve from ..module import foo
-            self.logger.debug(
-                "ImportFrom (original): from %s import %s, %s:%s"
-                % (node.module, [format_alias(x) for x in node.names], self.filename, node.lineno)
-            )
+            if self.debug_enabled:
+                self.trace(
+                    logging.DEBUG,
+                    "visit",
+                    "ImportFrom (original): from %s import %s, %s:%s",
+                    node.module,
+                    [format_alias(x) for x in node.names],
+                    self.filename,
+                    node.lineno,
+                    line=node.lineno,
+                )
             tgt_level = node.level
             current_module_namespace = self.module_name.rsplit(".", tgt_level)[0]
             tgt_name = current_module_namespace + "." + node.module
-            self.logger.debug(
-                "ImportFrom (resolved): from %s import %s, %s:%s"
-                % (tgt_name, [format_alias(x) for x in node.names], self.filename, node.lineno)
-            )
+            if self.debug_enabled:
+                self.trace(
+                    logging.DEBUG,
+                    "visit",
+                    "ImportFrom (resolved): from %s import %s, %s:%s",
+                    tgt_name,
+                    [format_alias(x) for x in node.names],
+                    self.filename,
+                    node.lineno,
+                    line=node.lineno,
+                )
         else:
             tgt_name = node.module  # normal from module.submodule import foo
 
@@ -582,11 +1181,20 @@ class CallGraphVisitor(ast.NodeVisitor):
             else:
                 alias_name = alias.name
             self.set_value(alias_name, to_node)  # set node to be discoverable in module
-            self.logger.info("From setting name %s to %s" % (alias_name, to_node))
+            self.logger.info("From setting name %s to %s", alias_name, to_node)
 
-            self.logger.debug("Use from %s to ImportFrom %s" % (from_node, to_node))
+            self.logger.debug("Use from %s to ImportFrom %s", from_node, to_node)
             if self.add_uses_edge(from_node, to_node):
-                self.logger.info("New edge added for Use from %s to ImportFrom %s" % (from_node, to_node))
+                self.trace(
+                    logging.INFO,
+                    "uses_edge",
+                    "New edge added for Use from %s to ImportFrom %s",
+                    from_node,
+                    to_node,
+                    source=from_node,
+                    target=to_node,
+                    line=node.lineno,
+                )
 
     def analyze_module_import(self, import_item, ast_node):
         """Analyze a names AST node inside an Import or ImportFrom AST node.
@@ -610,9 +1218,18 @@ class CallGraphVisitor(ast.NodeVisitor):
         else:
             alias_name = mod_node.name
         self.add_uses_edge(from_node, mod_node)
-        self.logger.info("New edge added for Use import %s in %s" % (mod_node, from_node))
+        self.trace(
+            logging.INFO,
+            "uses_edge",
+            "New edge added for Use import %s in %s",
+            mod_node,
+            from_node,
+            source=from_node,
+            target=mod_node,
+            line=ast_node.lineno,
+        )
         self.set_value(alias_name, mod_node)  # set node to be discoverable in module
-        self.logger.info("From setting name %s to %s" % (alias_name, mod_node))
+        self.logger.info("From setting name %s to %s", alias_name, mod_node)
 
     # Edmund Horner's original post has info on what this fixed in Python 2.
     # https://ejrh.wordpress.com/2012/01/31/call-graphs-in-python-part-2/
@@ -624,7 +1241,9 @@ class CallGraphVisitor(ast.NodeVisitor):
     # TODO: actually test this with Python 3.6 or later.
     #
     def visit_Constant(self, node):
-        self.logger.debug("Constant %s, %s:%s" % (node.value, self.filename, node.lineno))
+        self.trace(
+            logging.DEBUG, "visit", "Constant %s, %s:%s", node.value, self.filename, node.lineno, line=node.lineno
+        )
         t = type(node.value)
         ns = self.get_node_of_current_namespace().get_name()
         tn = t.__name__
@@ -633,8 +1252,16 @@ class CallGraphVisitor(ast.NodeVisitor):
     # attribute access (node.ctx determines whether set (ast.Store) or get (ast.Load))
     def visit_Attribute(self, node):
         objname = get_ast_node_name(node.value)
-        self.logger.debug(
-            "Attribute %s of %s in context %s, %s:%s" % (node.attr, objname, type(node.ctx), self.filename, node.lineno)
+        self.trace(
+            logging.DEBUG,
+            "visit",
+            "Attribute %s of %s in context %s, %s:%s",
+            node.attr,
+            objname,
+            type(node.ctx),
+            self.filename,
+            node.lineno,
+            line=node.lineno,
         )
 
         # TODO: self.last_value is a hack. Handle names in store context (LHS)
@@ -645,7 +1272,7 @@ class CallGraphVisitor(ast.NodeVisitor):
             new_value = self.last_value
             try:
                 if self.set_attribute(node, new_value):
-                    self.logger.info("setattr %s on %s to %s" % (node.attr, objname, new_value))
+                    self.logger.info("setattr %s on %s to %s", node.attr, objname, new_value)
             except UnresolvedSuperCallError:
                 # Trying to set something belonging to an unresolved super()
                 # of something; just ignore this attempt to setattr.
@@ -661,13 +1288,22 @@ class CallGraphVisitor(ast.NodeVisitor):
 
             # Both object and attr known.
             if isinstance(attr_node, Node):
-                self.logger.info("getattr %s on %s returns %s" % (node.attr, objname, attr_node))
+                self.logger.info("getattr %s on %s returns %s", node.attr, objname, attr_node)
 
                 # add uses edge
                 from_node = self.get_node_of_current_namespace()
-                self.logger.debug("Use from %s to %s" % (from_node, attr_node))
+                self.logger.debug("Use from %s to %s", from_node, attr_node)
                 if self.add_uses_edge(from_node, attr_node):
-                    self.logger.info("New edge added for Use from %s to %s" % (from_node, attr_node))
+                    self.trace(
+                        logging.INFO,
+                        "uses_edge",
+                        "New edge added for Use from %s to %s",
+                        from_node,
+                        attr_node,
+                        source=from_node,
+                        target=attr_node,
+                        line=node.lineno,
+                    )
 
                 # remove resolved wildcard from current site to <Node *.attr>
                 if attr_node.namespace is not None:
@@ -696,13 +1332,26 @@ class CallGraphVisitor(ast.NodeVisitor):
                 ns = obj_node.get_name()  # fully qualified namespace **of attr**
                 to_node = self.get_node(ns, tgt_name, node, flavor=Flavor.ATTRIBUTE)
                 self.logger.debug(
-                    f"Use from {from_node} to {to_node} (target obj {obj_node} known but target attr "
-                    f"{node.attr} not resolved; maybe fwd ref or unanalyzed import)"
+                    "Use from %s to %s (target obj %s known but target attr "
+                    "%s not resolved; maybe fwd ref or unanalyzed import)",
+                    from_node,
+                    to_node,
+                    obj_node,
+                    node.attr,
                 )
                 if self.add_uses_edge(from_node, to_node):
-                    self.logger.info(
-                        "New edge added for Use from {from_node} to {to_node} (target obj {obj_node} known but "
-                        f"target attr {node.attr} not resolved; maybe fwd ref or unanalyzed import)"
+                    self.trace(
+                        logging.INFO,
+                        "uses_edge",
+                        "New edge added for Use from %s to %s (target obj %s known but "
+                        "target attr %s not resolved; maybe fwd ref or unanalyzed import)",
+                        from_node,
+                        to_node,
+                        obj_node,
+                        node.attr,
+                        source=from_node,
+                        target=to_node,
+                        line=node.lineno,
                     )
 
                 # remove resolved wildcard from current site to <Node *.attr>
@@ -716,7 +1365,16 @@ class CallGraphVisitor(ast.NodeVisitor):
 
     # name access (node.ctx determines whether set (ast.Store) or get (ast.Load))
     def visit_Name(self, node):
-        self.logger.debug("Name %s in context %s, %s:%s" % (node.id, type(node.ctx), self.filename, node.lineno))
+        self.trace(
+            logging.DEBUG,
+            "visit",
+            "Name %s in context %s, %s:%s",
+            node.id,
+            type(node.ctx),
+            self.filename,
+            node.lineno,
+            line=node.lineno,
+        )
 
         # TODO: self.last_value is a hack. Handle names in store context (LHS)
         # in analyze_binding(), so that visit_Name() only needs to handle
@@ -738,9 +1396,18 @@ class CallGraphVisitor(ast.NodeVisitor):
                     to_node = self.get_node(None, tgt_name, node, flavor=Flavor.UNKNOWN)
 
                 from_node = self.get_node_of_current_namespace()
-                self.logger.debug("Use from %s to Name %s" % (from_node, to_node))
+                self.logger.debug("Use from %s to Name %s", from_node, to_node)
                 if self.add_uses_edge(from_node, to_node):
-                    self.logger.info("New edge added for Use from %s to Name %s" % (from_node, to_node))
+                    self.trace(
+                        logging.INFO,
+                        "uses_edge",
+                        "New edge added for Use from %s to Name %s",
+                        from_node,
+                        to_node,
+                        source=from_node,
+                        target=to_node,
+                        line=node.lineno,
+                    )
 
             self.last_value = to_node
 
@@ -749,7 +1416,7 @@ class CallGraphVisitor(ast.NodeVisitor):
         # - tuple unpacking works as a separate mechanism on top of that (see analyze_binding())
         #
         if len(node.targets) > 1:
-            self.logger.debug("Assign (chained with %d outputs)" % (len(node.targets)))
+            self.logger.debug("Assign (chained with %d outputs)", len(node.targets))
 
         # TODO: support lists, dicts, sets (so that we can recognize calls to their methods)
         # TODO: begin with supporting empty lists, dicts, sets
@@ -758,15 +1425,17 @@ class CallGraphVisitor(ast.NodeVisitor):
         values = sanitize_exprs(node.value)  # values is the same for each set of targets
         for targets in node.targets:
             targets = sanitize_exprs(targets)
-            self.logger.debug(
-                "Assign %s %s, %s:%s"
-                % (
+            if self.debug_enabled:
+                self.trace(
+                    logging.DEBUG,
+                    "visit",
+                    "Assign %s %s, %s:%s",
                     [get_ast_node_name(x) for x in targets],
                     [get_ast_node_name(x) for x in values],
                     self.filename,
                     node.lineno,
+                    line=node.lineno,
                 )
-            )
             self.analyze_binding(targets, values)
 
     def visit_AnnAssign(self, node):  # PEP 526, Python 3.6+
@@ -776,15 +1445,29 @@ class CallGraphVisitor(ast.NodeVisitor):
             value = sanitize_exprs(node.value)
             # issue #62: value may be an empty list, so it doesn't always have any elements
             # even after `sanitize_exprs`.
-            self.logger.debug(
-                "AnnAssign %s %s, %s:%s"
-                % (get_ast_node_name(target[0]), get_ast_node_name(value), self.filename, node.lineno)
-            )
+            if self.debug_enabled:
+                self.trace(
+                    logging.DEBUG,
+                    "visit",
+                    "AnnAssign %s %s, %s:%s",
+                    get_ast_node_name(target[0]),
+                    get_ast_node_name(value),
+                    self.filename,
+                    node.lineno,
+                    line=node.lineno,
+                )
             self.analyze_binding(target, value)
         else:  # just a type declaration
-            self.logger.debug(
-                "AnnAssign %s <no value>, %s:%s" % (get_ast_node_name(target[0]), self.filename, node.lineno)
-            )
+            if self.debug_enabled:
+                self.trace(
+                    logging.DEBUG,
+                    "visit",
+                    "AnnAssign %s <no value>, %s:%s",
+                    get_ast_node_name(target[0]),
+                    self.filename,
+                    node.lineno,
+                    line=node.lineno,
+                )
             self.last_value = None
             self.visit(target[0])
         # TODO: use the type annotation from node.annotation?
@@ -794,16 +1477,18 @@ class CallGraphVisitor(ast.NodeVisitor):
         targets = sanitize_exprs(node.target)
         values = sanitize_exprs(node.value)  # values is the same for each set of targets
 
-        self.logger.debug(
-            "AugAssign %s %s %s, %s:%s"
-            % (
+        if self.debug_enabled:
+            self.trace(
+                logging.DEBUG,
+                "visit",
+                "AugAssign %s %s %s, %s:%s",
                 [get_ast_node_name(x) for x in targets],
                 type(node.op),
                 [get_ast_node_name(x) for x in values],
                 self.filename,
                 node.lineno,
+                line=node.lineno,
             )
-        )
 
         # TODO: maybe no need to handle tuple unpacking in AugAssign? (but simpler to use the same implementation)
         self.analyze_binding(targets, values)
@@ -816,7 +1501,7 @@ class CallGraphVisitor(ast.NodeVisitor):
     #  in use elsewhere.)
     #
     def visit_For(self, node):
-        self.logger.debug("For-loop, %s:%s" % (self.filename, node.lineno))
+        self.trace(logging.DEBUG, "visit", "For-loop, %s:%s", self.filename, node.lineno, line=node.lineno)
 
         targets = sanitize_exprs(node.target)
         values = sanitize_exprs(node.iter)
@@ -831,19 +1516,19 @@ class CallGraphVisitor(ast.NodeVisitor):
         self.visit_For(node)  # TODO: alias for now; tag async for in output in a future version?
 
     def visit_ListComp(self, node):
-        self.logger.debug("ListComp, %s:%s" % (self.filename, node.lineno))
+        self.trace(logging.DEBUG, "visit", "ListComp, %s:%s", self.filename, node.lineno, line=node.lineno)
         self.analyze_comprehension(node, "listcomp")
 
     def visit_SetComp(self, node):
-        self.logger.debug("SetComp, %s:%s" % (self.filename, node.lineno))
+        self.trace(logging.DEBUG, "visit", "SetComp, %s:%s", self.filename, node.lineno, line=node.lineno)
         self.analyze_comprehension(node, "setcomp")
 
     def visit_DictComp(self, node):
-        self.logger.debug("DictComp, %s:%s" % (self.filename, node.lineno))
+        self.trace(logging.DEBUG, "visit", "DictComp, %s:%s", self.filename, node.lineno, line=node.lineno)
         self.analyze_comprehension(node, "dictcomp", field1="key", field2="value")
 
     def visit_GeneratorExp(self, node):
-        self.logger.debug("GeneratorExp, %s:%s" % (self.filename, node.lineno))
+        self.trace(logging.DEBUG, "visit", "GeneratorExp, %s:%s", self.filename, node.lineno, line=node.lineno)
         self.analyze_comprehension(node, "genexpr")
 
     def analyze_comprehension(self, node, label, field1="elt", field2=None):
@@ -885,7 +1570,16 @@ class CallGraphVisitor(ast.NodeVisitor):
                 self.visit(getattr(node, field2))
 
     def visit_Call(self, node):
-        self.logger.debug("Call %s, %s:%s" % (get_ast_node_name(node.func), self.filename, node.lineno))
+        if self.debug_enabled:
+            self.trace(
+                logging.DEBUG,
+                "visit",
+                "Call %s, %s:%s",
+                get_ast_node_name(node.func),
+                self.filename,
+                node.lineno,
+                line=node.lineno,
+            )
 
         # visit args to detect uses
         for arg in node.args:
@@ -904,10 +1598,17 @@ class CallGraphVisitor(ast.NodeVisitor):
 
             from_node = self.get_node_of_current_namespace()
             to_node = result_node
-            self.logger.debug("Use from %s to %s (via resolved call to built-ins)" % (from_node, to_node))
+            self.logger.debug("Use from %s to %s (via resolved call to built-ins)", from_node, to_node)
             if self.add_uses_edge(from_node, to_node):
-                self.logger.info(
-                    "New edge added for Use from %s to %s (via resolved call to built-ins)" % (from_node, to_node)
+                self.trace(
+                    logging.INFO,
+                    "uses_edge",
+                    "New edge added for Use from %s to %s (via resolved call to built-ins)",
+                    from_node,
+                    to_node,
+                    source=from_node,
+                    target=to_node,
+                    line=node.lineno,
                 )
 
         else:  # generic function call
@@ -915,6 +1616,9 @@ class CallGraphVisitor(ast.NodeVisitor):
             # it will be left standing as self.last_value.
             self.visit(node.func)
 
+            if isinstance(self.last_value, Node) and not self.last_value.defined:
+                self.record_unresolved("call", self.last_value)
+
             # If self.last_value matches a known class i.e. the call was of the
             # form MyClass(), add a uses edge to MyClass.__init__().
             #
@@ -929,14 +1633,23 @@ class CallGraphVisitor(ast.NodeVisitor):
                 from_node = self.get_node_of_current_namespace()
                 class_node = self.last_value
                 to_node = self.get_node(class_node.get_name(), "__init__", None, flavor=Flavor.METHOD)
-                self.logger.debug("Use from %s to %s (call creates an instance)" % (from_node, to_node))
+                self.logger.debug("Use from %s to %s (call creates an instance)", from_node, to_node)
                 if self.add_uses_edge(from_node, to_node):
-                    self.logger.info(
-                        "New edge added for Use from %s to %s (call creates an instance)" % (from_node, to_node)
+                    self.trace(
+                        logging.INFO,
+                        "uses_edge",
+                        "New edge added for Use from %s to %s (call creates an instance)",
+                        from_node,
+                        to_node,
+                        source=from_node,
+                        target=to_node,
+                        line=node.lineno,
                     )
 
     def visit_With(self, node):
-        self.logger.debug("With (context manager), %s:%s" % (self.filename, node.lineno))
+        self.trace(
+            logging.DEBUG, "visit", "With (context manager), %s:%s", self.filename, node.lineno, line=node.lineno
+        )
 
         def add_uses_enter_exit_of(graph_node):
             # add uses edges to __enter__ and __exit__ methods of given Node
@@ -944,11 +1657,20 @@ class CallGraphVisitor(ast.NodeVisitor):
                 from_node = self.get_node_of_current_namespace()
                 withed_obj_node = graph_node
 
-                self.logger.debug("Use from %s to With %s" % (from_node, withed_obj_node))
+                self.logger.debug("Use from %s to With %s", from_node, withed_obj_node)
                 for methodname in ("__enter__", "__exit__"):
                     to_node = self.get_node(withed_obj_node.get_name(), methodname, None, flavor=Flavor.METHOD)
                     if self.add_uses_edge(from_node, to_node):
-                        self.logger.info("New edge added for Use from %s to %s" % (from_node, to_node))
+                        self.trace(
+                            logging.INFO,
+                            "uses_edge",
+                            "New edge added for Use from %s to %s",
+                            from_node,
+                            to_node,
+                            source=from_node,
+                            target=to_node,
+                            line=node.lineno,
+                        )
 
         for withitem in node.items:
             expr = withitem.context_expr
@@ -998,6 +1720,11 @@ class CallGraphVisitor(ast.NodeVisitor):
         self.last_value = None
         deco_names = []
         for deco in ast_node.decorator_list:
+            if self.structure_only:  # just the name, without resolving it
+                deco_name = get_ast_node_name(deco)
+                if isinstance(deco_name, str):
+                    deco_names.append(deco_name.rsplit(".", 1)[-1])
+                continue
             self.visit(deco)  # capture function name of decorator (self.last_value hack)
             deco_node = self.last_value
             if isinstance(deco_node, Node):
@@ -1110,7 +1837,7 @@ class CallGraphVisitor(ast.NodeVisitor):
             funcname = func_ast_node.id
             if funcname == "super":
                 class_node = self.get_current_class()
-                self.logger.debug("Resolving super() of %s" % (class_node))
+                self.logger.debug("Resolving super() of %s", class_node)
                 if class_node in self.mro:
                     # Our super() class is the next one in the MRO.
                     #
@@ -1126,7 +1853,7 @@ class CallGraphVisitor(ast.NodeVisitor):
                     #
                     if len(self.mro[class_node]) > 1:
                         result = self.mro[class_node][1]
-                        self.logger.debug("super of %s is %s" % (class_node, result))
+                        self.logger.debug("super of %s is %s", class_node, result)
                         return result
                     else:
                         msg = "super called for %s, but no known bases" % (class_node)
@@ -1135,21 +1862,26 @@ class CallGraphVisitor(ast.NodeVisitor):
                 else:
                     msg = "super called for %s, but MRO not determined for it (maybe still in pass 1?)" % (class_node)
                     self.logger.info(msg)
+                    self.record_unresolved("super")
                     raise UnresolvedSuperCallError(msg)
 
             if funcname in ("str", "repr"):
                 if len(ast_node.args) == 1:  # these take only one argument
                     obj_astnode = ast_node.args[0]
                     if isinstance(obj_astnode, (ast.Name, ast.Attribute)):
-                        self.logger.debug("Resolving %s() of %s" % (funcname, get_ast_node_name(obj_astnode)))
+                        if self.debug_enabled:
+                            self.logger.debug("Resolving %s() of %s", funcname, get_ast_node_name(obj_astnode))
                         attrname = "__%s__" % (funcname)
                         # build a temporary ast.Attribute AST node so that we can use get_attribute()
                         tmp_astnode = ast.Attribute(value=obj_astnode, attr=attrname, ctx=obj_astnode.ctx)
                         obj_node, attr_node = self.get_attribute(tmp_astnode)
-                        self.logger.debug(
-                            "Resolve %s() of %s: returning attr node %s"
-                            % (funcname, get_ast_node_name(obj_astnode), attr_node)
-                        )
+                        if self.debug_enabled:
+                            self.logger.debug(
+                                "Resolve %s() of %s: returning attr node %s",
+                                funcname,
+                                get_ast_node_name(obj_astnode),
+                                attr_node,
+                            )
                         return attr_node
 
             # add implementations for other built-in funcnames here if needed
@@ -1169,9 +1901,10 @@ class CallGraphVisitor(ast.NodeVisitor):
         if not isinstance(ast_node, ast.Attribute):
             raise TypeError("Expected ast.Attribute; got %s" % (type(ast_node)))
 
-        self.logger.debug(
-            "Resolve %s.%s in context %s" % (get_ast_node_name(ast_node.value), ast_node.attr, type(ast_node.ctx))
-        )
+        if self.debug_enabled:
+            self.logger.debug(
+                "Resolve %s.%s in context %s", get_ast_node_name(ast_node.value), ast_node.attr, type(ast_node.ctx)
+            )
 
         # Resolve nested attributes
         #
@@ -1186,8 +1919,11 @@ class CallGraphVisitor(ast.NodeVisitor):
                 if ns in self.scopes:  # imported modules not in the set of analyzed files are not seen by Pyan
                     sc = self.scopes[ns]
                     if attr_name in sc.defs:
-                        self.logger.debug("Resolved to attr %s of %s" % (ast_node.attr, sc.defs[attr_name]))
+                        self.logger.debug("Resolved to attr %s of %s", ast_node.attr, sc.defs[attr_name])
+                        if sc.defs[attr_name] is None:
+                            self.record_unresolved("attr", obj_node, attr_name)
                         return sc.defs[attr_name], ast_node.attr
+                self.record_unresolved("attr", obj_node, attr_name)
 
             # It may happen that ast_node.value has no corresponding graph Node,
             # if this is a forward-reference, or a reference to a file
@@ -1196,7 +1932,7 @@ class CallGraphVisitor(ast.NodeVisitor):
             # In this case, return None for the object to let visit_Attribute()
             # add a wildcard reference to *.attr.
             #
-            self.logger.debug("Unresolved, returning attr %s of unknown" % (ast_node.attr))
+            self.logger.debug("Unresolved, returning attr %s of unknown", ast_node.attr)
             return None, ast_node.attr
         else:
             # detect str.join() and similar (attributes of constant literals)
@@ -1226,7 +1962,7 @@ class CallGraphVisitor(ast.NodeVisitor):
 
                 # can't resolve result of general function call
                 if not isinstance(obj_node, Node):
-                    self.logger.debug("Unresolved function call as obj, returning attr %s of unknown" % (ast_node.attr))
+                    self.logger.debug("Unresolved function call as obj, returning attr %s of unknown", ast_node.attr)
                     return None, ast_node.attr
             else:
                 # Get the Node object corresponding to node.value in the current ns.
@@ -1236,14 +1972,14 @@ class CallGraphVisitor(ast.NodeVisitor):
                 #  and the leftmost name always resides in the current ns.)
                 obj_node = self.get_value(get_ast_node_name(ast_node.value))  # resolves "self" if needed
 
-        self.logger.debug("Resolved to attr %s of %s" % (ast_node.attr, obj_node))
+        self.logger.debug("Resolved to attr %s of %s", ast_node.attr, obj_node)
         return obj_node, ast_node.attr
 
     ###########################################################################
     # Scope analysis
 
-    def analyze_scopes(self, code, filename):
-        """Gather lexical scope information."""
+    def build_scopes(self, code, filename, module_name):
+        """Gather lexical scope information of a module. Return a dict of Scopes by namespace."""
 
         # Below, ns is the fully qualified ("dotted") name of sc.
         #
@@ -1261,7 +1997,11 @@ class CallGraphVisitor(ast.NodeVisitor):
             for t in table.get_children():
                 process(ns, t)
 
-        process(self.module_name, symtable.symtable(code, filename, compile_type="exec"))
+        process(module_name, symtable.symtable(code, filename, compile_type="exec"))
+        return scopes
+
+    def merge_scopes(self, scopes):
+        """Add scope information from build_scopes() to the currently known scopes."""
 
         # add to existing scopes (while not overwriting any existing definitions with None)
         for ns in scopes:
@@ -1274,7 +2014,7 @@ class CallGraphVisitor(ast.NodeVisitor):
                     if name not in oldsc.defs:
                         oldsc.defs[name] = sc.defs[name]
 
-        self.logger.debug("Scopes now: %s" % (self.scopes))
+        self.logger.debug("Scopes now: %s", self.scopes)
 
     def get_current_class(self):
         """Return the node representing the current class, or None if not inside a class definition."""
@@ -1310,18 +2050,51 @@ class CallGraphVisitor(ast.NodeVisitor):
                     return sc
 
         sc = find_scope(name)
+
+        # Scopes inside the one where name was found may still get a value for it.
+        if self.pass_number == 1:
+            inner = self.scope_stack[self.scope_stack.index(sc) + 1 :] if sc is not None else self.scope_stack
+            shadowing = tuple(inner_sc for inner_sc in inner if name in inner_sc.defs)
+            if shadowing:
+                self.record_unresolved("name", name, shadowing, sc.defs[name] if sc is not None else None)
+
         if sc is not None:
             value = sc.defs[name]
             if isinstance(value, Node):
-                self.logger.info("Get %s in %s, found in %s, value %s" % (name, self.scope_stack[-1], sc, value))
+                self.trace(
+                    logging.INFO,
+                    "get_value",
+                    "Get %s in %s, found in %s, value %s",
+                    name,
+                    self.scope_stack[-1],
+                    sc,
+                    value,
+                    name=name,
+                    value=value,
+                )
                 return value
             else:
                 # TODO: should always be a Node or None
-                self.logger.debug(
-                    "Get %s in %s, found in %s: value %s is not a Node" % (name, self.scope_stack[-1], sc, value)
+                self.trace(
+                    logging.DEBUG,
+                    "get_value",
+                    "Get %s in %s, found in %s: value %s is not a Node",
+                    name,
+                    self.scope_stack[-1],
+                    sc,
+                    value,
+                    name=name,
+                    value=value,
                 )
         else:
-            self.logger.debug("Get %s in %s: no Node value (or name not in scope)" % (name, self.scope_stack[-1]))
+            self.trace(
+                logging.DEBUG,
+                "get_value",
+                "Get %s in %s: no Node value (or name not in scope)",
+                name,
+                self.scope_stack[-1],
+                name=name,
+            )
 
     def set_value(self, name, value):
         """Set the value of name in the current scope. Value must be a Node."""
@@ -1335,13 +2108,24 @@ class CallGraphVisitor(ast.NodeVisitor):
         sc = find_scope(name)
         if sc is not None:
             if isinstance(value, Node):
+                if sc.defs[name] is not value:
+                    self.inherited_attributes.pop(name, None)
                 sc.defs[name] = value
-                self.logger.info("Set %s in %s to %s" % (name, sc, value))
+                self.trace(logging.INFO, "set_value", "Set %s in %s to %s", name, sc, value, name=name)
             else:
                 # TODO: should always be a Node or None
-                self.logger.debug("Set %s in %s: value %s is not a Node" % (name, sc, value))
+                self.trace(
+                    logging.DEBUG,
+                    "set_value",
+                    "Set %s in %s: value %s is not a Node",
+                    name,
+                    sc,
+                    value,
+                    name=name,
+                    value=value,
+                )
         else:
-            self.logger.debug("Set: name %s not in scope" % (name))
+            self.trace(logging.DEBUG, "set_value", "Set: name %s not in scope", name, name=name)
 
     ###########################################################################
     # Attribute getter and setter
@@ -1391,22 +2175,45 @@ class CallGraphVisitor(ast.NodeVisitor):
             value_node = lookup(ns)
             if value_node is not None:
                 return obj_node, value_node
+            self.record_unresolved("attr", obj_node, attr_name)
 
             # next try ns of each ancestor (this works only in pass 2,
             # after self.mro has been populated)
             #
             if obj_node in self.mro:
-                for base_node in tail(self.mro[obj_node]):  # the first element is always obj itself
-                    ns = base_node.get_name()
-                    value_node = lookup(ns)
-                    if value_node is not None:
-                        break
-                else:
-                    return None, None  # not found
-                return base_node, value_node  # as obj, return the base class in which attr was found
+                base_node, value_node = self.lookup_inherited_attribute(obj_node, attr_name)
+                if value_node is not None:
+                    return base_node, value_node
 
         return obj_node, None  # here obj_node is either None or unknown (namespace None)
 
+    def lookup_inherited_attribute(self, class_node, attr_name):
+        """Look up attr_name in the ancestors of class_node, following its MRO.
+
+        Return pair of Node objects (base,attr), where base is the class in
+        which attr was found, or (None,None) if not found.
+
+        Results are memoized per (class_node, attr_name). The memo table for
+        attr_name is invalidated whenever a binding of that name changes in
+        any scope (see set_value(), set_attribute()).
+        """
+        memo = self.inherited_attributes.setdefault(attr_name, {})
+        if class_node in memo:
+            self.counters["inherited_attribute_cache_hits"] += 1
+            return memo[class_node]
+        self.counters["inherited_attribute_cache_misses"] += 1
+
+        result = (None, None)  # not found
+        for base_node in tail(self.mro[class_node]):  # the first element is always obj itself
+            ns = base_node.get_name()
+            if ns in self.scopes:
+                value_node = self.scopes[ns].defs.get(attr_name)
+                if value_node is not None:
+                    result = (base_node, value_node)  # as obj, return the base class in which attr was found
+                    break
+        memo[class_node] = result
+        return result
+
     def set_attribute(self, ast_node, new_value):
         """Assign the Node provided as new_value into the attribute described
         by the AST node ast_node. Return True if assignment was done,
@@ -1429,6 +2236,8 @@ class CallGraphVisitor(ast.NodeVisitor):
             ns = obj_node.get_name()  # fully qualified namespace **of attr**
             if ns in self.scopes:
                 sc = self.scopes[ns]
+                if sc.defs.get(attr_name) is not new_value:
+                    self.inherited_attributes.pop(attr_name, None)
                 sc.defs[attr_name] = new_value
                 return True
         return False
@@ -1486,7 +2295,12 @@ class CallGraphVisitor(ast.NodeVisitor):
         else:  # Assume the Node belongs to the current file.
             filename = self.filename
 
+        if self.low_memory:
+            ast_node = SourceLocation.from_ast_node(ast_node)
         n = Node(namespace, name, ast_node, filename, flavor)
+        self.counters["nodes_created"] += 1
+        if namespace is None:
+            self.counters["wildcards_created"] += 1
 
         # Add to the list of nodes that have this short name.
         if name in self.nodes:
@@ -1523,6 +2337,8 @@ class CallGraphVisitor(ast.NodeVisitor):
         This method re-associates the given graph Node with a different
         AST node, which allows updating the context when the definition
         of a function or class is encountered."""
+        if self.low_memory:
+            ast_node = SourceLocation.from_ast_node(ast_node)
         graph_node.ast_node = ast_node
         if filename is not None:
             graph_node.filename = filename
@@ -1534,10 +2350,17 @@ class CallGraphVisitor(ast.NodeVisitor):
         if from_node not in self.defines_edges:
             self.defines_edges[from_node] = set()
             status = True
+        if self.file_changes is not None and not from_node.defined:
+            self.file_changes.append(("defined", from_node, None))
         from_node.defined = True
         if to_node is None or to_node in self.defines_edges[from_node]:
             return status
         self.defines_edges[from_node].add(to_node)
+        self.counters["edges_added"] += 1
+        if self.file_changes is not None:
+            self.file_changes.append(("defines", from_node, to_node))
+            if not to_node.defined:
+                self.file_changes.append(("defined", to_node, None))
         to_node.defined = True
         return True
 
@@ -1549,6 +2372,9 @@ class CallGraphVisitor(ast.NodeVisitor):
         if to_node in self.uses_edges[from_node]:
             return False
         self.uses_edges[from_node].add(to_node)
+        self.counters["edges_added"] += 1
+        if self.file_changes is not None:
+            self.file_changes.append(("uses", from_node, to_node))
 
         # for pass 2: remove uses edge to any matching wildcard target node
         # if the given to_node has a known namespace.
@@ -1586,6 +2412,8 @@ class CallGraphVisitor(ast.NodeVisitor):
             u = self.uses_edges[from_node]
             if to_node in u:
                 u.remove(to_node)
+                if self.file_changes is not None:
+                    self.file_changes.append(("removed uses", from_node, to_node))
 
     def remove_wild(self, from_node, to_node, name):
         """Remove uses edge from from_node to wildcard *.name.
@@ -1653,7 +2481,7 @@ class CallGraphVisitor(ast.NodeVisitor):
         assert len(matching_wilds) < 2  # the set can have only one wild of matching name
         if len(matching_wilds):
             wild_node = matching_wilds[0]
-            self.logger.info("Use from %s to %s resolves %s; removing wildcard" % (from_node, to_node, wild_node))
+            self.logger.info("Use from %s to %s resolves %s; removing wildcard", from_node, to_node, wild_node)
             self.remove_uses_edge(from_node, wild_node)
 
     ###########################################################################
@@ -1671,13 +2499,14 @@ class CallGraphVisitor(ast.NodeVisitor):
                     n3.defined = False
                     new_uses_edges.append((n, n3))
                     removed_uses_edges.append((n, n2))
-                    self.logger.info("Contracting non-existent from %s to %s as %s" % (n, n2, n3))
+                    self.logger.info("Contracting non-existent from %s to %s as %s", n, n2, n3)
 
         for from_node, to_node in new_uses_edges:
             self.add_uses_edge(from_node, to_node)
 
         for from_node, to_node in removed_uses_edges:
             self.remove_uses_edge(from_node, to_node)
+        self.counters["nonexistents_contracted"] += len(removed_uses_edges)
 
     def expand_unknowns(self):
         """For each unknown node *.name, replace all its incoming edges with edges to X.name for all possible Xs.
@@ -1694,7 +2523,7 @@ class CallGraphVisitor(ast.NodeVisitor):
 
         for from_node, to_node in new_defines_edges:
             self.add_defines_edge(from_node, to_node)
-            self.logger.info("Expanding unknowns: new defines edge from %s to %s" % (from_node, to_node))
+            self.logger.info("Expanding unknowns: new defines edge from %s to %s", from_node, to_node)
 
         new_uses_edges = []
         for n in self.uses_edges:
@@ -1706,8 +2535,13 @@ class CallGraphVisitor(ast.NodeVisitor):
 
         for from_node, to_node in new_uses_edges:
             self.add_uses_edge(from_node, to_node)
-            self.logger.info("Expanding unknowns: new uses edge from %s to %s" % (from_node, to_node))
+            self.logger.info("Expanding unknowns: new uses edge from %s to %s", from_node, to_node)
+        self.counters["wildcard_expansions"] += len(new_defines_edges) + len(new_uses_edges)
+
+        self.hide_unknowns()
 
+    def hide_unknowns(self):
+        """Mark all unknown nodes *.name as not defined (so that they won't be visualized)."""
         for name in self.nodes:
             for n in self.nodes[name]:
                 if n.namespace is None:
@@ -1739,10 +2573,11 @@ class CallGraphVisitor(ast.NodeVisitor):
 
                 if inherited and n in self.uses_edges:
                     removed_uses_edges.append((n, n2))
-                    self.logger.info("Removing inherited edge from %s to %s" % (n, n2))
+                    self.logger.info("Removing inherited edge from %s to %s", n, n2)
 
         for from_node, to_node in removed_uses_edges:
             self.remove_uses_edge(from_node, to_node)
+        self.counters["inherited_edges_culled"] += len(removed_uses_edges)
 
     def collapse_inner(self):
         """Combine lambda and comprehension Nodes with their parent Nodes to reduce visual noise.
@@ -1758,7 +2593,9 @@ class CallGraphVisitor(ast.NodeVisitor):
                 for n in self.nodes[name]:
                     pn = self.get_parent_node(n)
                     if n in self.uses_edges:
-                        for n2 in self.uses_edges[n]:  # outgoing uses edges
-                            self.logger.info("Collapsing inner from %s to %s, uses %s" % (n, pn, n2))
+                        # Outgoing uses edges. Add the edges to wildcards first, so that add_uses_edge()
+                        # removes those resolved by the other edges whatever the (id-based) set order.
+                        for n2 in sorted(self.uses_edges[n], key=lambda n2: n2.namespace is not None):
+                            self.logger.info("Collapsing inner from %s to %s, uses %s", n, pn, n2)
                             self.add_uses_edge(pn, n2)
                     n.defined = False
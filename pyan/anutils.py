@@ -4,9 +4,15 @@
 
 import ast
 import os.path
+import sys
 
 from .node import Flavor
 
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
 
 def head(lst):
     if len(lst):
@@ -53,6 +59,30 @@ def get_module_name(filename, root: str = None):
     return mod_name
 
 
+def resolve_import_name(module_name, is_package, level, target):
+    """Return the absolute name of a (possibly relative) import target, imported in the given module."""
+    if level == 0:
+        return target
+    parts = module_name.split(".")
+    if not is_package:  # relative to the package containing the module
+        parts = parts[:-1]
+    if level > 1:
+        parts = parts[: max(0, len(parts) - (level - 1))]
+    if target:
+        parts.append(target)
+    return ".".join(parts)
+
+
+def get_peak_memory_usage():
+    """Return the peak resident set size of this process in bytes, or None if it cannot be determined."""
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return maxrss  # macOS reports bytes, Linux KiB
+    return 1024 * maxrss
+
+
 def format_alias(x):
     """Return human-readable description of an ast.alias (used in Import and ImportFrom nodes)."""
     if not isinstance(x, ast.alias):
@@ -103,39 +133,40 @@ def resolve_method_resolution_order(class_base_nodes, logger):
     class LinearizationImpossible(Exception):
         pass
 
-    from functools import reduce
-    from operator import add
-
-    def C3_find_good_head(heads, tails):  # find an element of heads which is not in any of the tails
-        flat_tails = reduce(add, tails, [])  # flatten the outer level
-        for hd in heads:
-            if hd not in flat_tails:
-                break
-        else:  # no break only if there are cyclic dependencies.
-            raise LinearizationImpossible(
-                "MRO linearization impossible; cyclic dependency detected. heads: %s, tails: %s" % (heads, tails)
-            )
-        return hd
-
-    def remove_all(elt, lst):  # remove all occurrences of elt from lst, return a copy
-        return [x for x in lst if x != elt]
-
-    def remove_all_in(elt, lists):  # remove elt from all lists, return a copy
-        return [remove_all(elt, lst) for lst in lists]
-
     def C3_merge(lists):
+        # Linear-time merge: instead of flattening and filtering the tails
+        # on every step, keep a read position into each (unmodified) input
+        # list, and count how many times each element occurs in the tails.
+        # An element is a good head when it occurs in no tail.
+        positions = [0] * len(lists)
+        tail_counts = {}
+        for lst in lists:
+            for x in tail(lst):
+                tail_counts[x] = tail_counts.get(x, 0) + 1
+
         out = []
         while True:
-            logger.debug("MRO: C3 merge: out: %s, lists: %s" % (out, lists))
-            heads = [head(lst) for lst in lists if head(lst) is not None]
+            heads = [lst[k] for lst, k in zip(lists, positions) if k < len(lst)]
             if not len(heads):
                 break
-            tails = [tail(lst) for lst in lists]
-            logger.debug("MRO: C3 merge: heads: %s, tails: %s" % (heads, tails))
-            hd = C3_find_good_head(heads, tails)
-            logger.debug("MRO: C3 merge: chose head %s" % (hd))
+            for hd in heads:
+                if not tail_counts.get(hd, 0):
+                    break
+            else:  # no break only if there are cyclic dependencies.
+                raise LinearizationImpossible(
+                    "MRO linearization impossible; cyclic dependency detected. heads: %s, lists: %s" % (heads, lists)
+                )
+            logger.debug("MRO: C3 merge: chose head %s", hd)
             out.append(hd)
-            lists = remove_all_in(hd, lists)
+            # A good head occurs in no tail, so it can only be found at the
+            # head of each list. Advancing past it moves the next element
+            # of that list from the tail to the head.
+            for j, lst in enumerate(lists):
+                k = positions[j]
+                if k < len(lst) and lst[k] is hd:
+                    positions[j] = k + 1
+                    if k + 1 < len(lst):
+                        tail_counts[lst[k + 1]] -= 1
         return out
 
     mro = {}  # result
@@ -143,7 +174,7 @@ def resolve_method_resolution_order(class_base_nodes, logger):
         memo = {}  # caching/memoization
 
         def C3_linearize(node):
-            logger.debug("MRO: C3 linearizing %s" % (node))
+            logger.debug("MRO: C3 linearizing %s", node)
             seen.add(node)
             if node not in memo:
                 #  unknown class                     or no ancestors
@@ -156,15 +187,15 @@ def resolve_method_resolution_order(class_base_nodes, logger):
                         if baseclass_node not in seen:
                             lists.append(C3_linearize(baseclass_node))
                     # ...and the parents themselves (in the order they appear in the ClassDef)
-                    logger.debug("MRO: parents of %s: %s" % (node, class_base_nodes[node]))
+                    logger.debug("MRO: parents of %s: %s", node, class_base_nodes[node])
                     lists.append(class_base_nodes[node])
-                    logger.debug("MRO: C3 merging %s" % (lists))
+                    logger.debug("MRO: C3 merging %s", lists)
                     memo[node] = [node] + C3_merge(lists)
-            logger.debug("MRO: C3 linearized %s, result %s" % (node, memo[node]))
+            logger.debug("MRO: C3 linearized %s, result %s", node, memo[node])
             return memo[node]
 
         for node in class_base_nodes:
-            logger.debug("MRO: analyzing class %s" % (node))
+            logger.debug("MRO: analyzing class %s", node)
             seen = set()  # break cycles (separately for each class we start from)
             mro[node] = C3_linearize(node)
     except LinearizationImpossible as e:
@@ -191,7 +222,7 @@ def resolve_method_resolution_order(class_base_nodes, logger):
 
         mro = {}
         for node in class_base_nodes:
-            logger.debug("MRO: generic fallback: analyzing class %s" % (node))
+            logger.debug("MRO: generic fallback: analyzing class %s", node)
             seen = set()  # break cycles (separately for each class we start from)
             mro[node] = lookup_bases_recursive(node)
 
@@ -204,6 +235,12 @@ class UnresolvedSuperCallError(Exception):
     pass
 
 
+class FileTimeLimitExceeded(Exception):
+    """For signaling that the analysis of a file has exceeded its time limit."""
+
+    pass
+
+
 class Scope:
     """Adaptor that makes scopes look somewhat like those from the Python 2
     compiler module, as far as Pyan's CallGraphVisitor is concerned."""
@@ -279,5 +316,5 @@ class ExecuteInInnerScope:
         ns = from_node.get_name()
         to_node = analyzer.get_node(ns, scopename, None, flavor=Flavor.NAMESPACE)
         if analyzer.add_defines_edge(from_node, to_node):
-            analyzer.logger.info("Def from %s to %s %s" % (from_node, scopename, to_node))
+            analyzer.logger.info("Def from %s to %s %s", from_node, scopename, to_node)
         analyzer.last_value = to_node  # Make this inner scope node assignable to track its uses.
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Demand-driven analysis: analyze only the files needed for a --function or --namespace filter.
+
+A cheap scan (parsing only, like modvis) finds the imports of each file.
+The analysis then covers the modules of the seed (the module defining the
+function, or the modules in the namespace) and everything they import,
+transitively.
+
+References that cannot be resolved within the analyzed files become
+wildcards, which the full analysis would expand to every definition of
+the same name, anywhere. When another file in the filtered namespace
+defines such a name, that file (and its imports) is added, and the
+analysis is repeated, until no more files are needed. If the needed files
+exceed a given fraction of all files, all files are analyzed instead.
+"""
+
+import ast
+import logging
+import os
+
+from .analyzer import CallGraphVisitor
+from .anutils import get_module_name, resolve_import_name
+
+
+class ModuleScan:
+    """The imports and definitions of a source file, found by parsing only."""
+
+    def __init__(self, filename, module_name):
+        self.filename = filename
+        self.module_name = module_name
+        self.imports = set()  # candidate absolute module names
+        self.defined_names = set()  # names bound by the module, at any depth
+
+    def scan(self, tree):
+        is_package = os.path.basename(self.filename) == "__init__.py"
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    self.add_import(alias.name)
+            elif isinstance(node, ast.ImportFrom):
+                base = resolve_import_name(self.module_name, is_package, node.level, node.module)
+                self.add_import(base)
+                for alias in node.names:  # "from pkg import mod" may import a module
+                    self.add_import("%s.%s" % (base, alias.name) if base else alias.name)
+                    self.defined_names.add(alias.asname or alias.name)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                self.defined_names.add(node.name)
+            elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                self.defined_names.add(node.id)
+            elif isinstance(node, ast.Attribute) and isinstance(node.ctx, ast.Store):
+                self.defined_names.add(node.attr)
+        return self
+
+    def add_import(self, name):
+        # Importing a.b.c also imports the packages a and a.b.
+        parts = name.split(".")
+        for i in range(1, len(parts) + 1):
+            self.imports.add(".".join(parts[:i]))
+
+
+def scan_files(filenames, root: str = None, logger=None):
+    """Scan the given files. Return a dict module name: ModuleScan.
+
+    Files that cannot be read or parsed are scanned as empty (the analysis reports them).
+    """
+    logger = logger or logging.getLogger(__name__)
+    modules = {}
+    for filename in filenames:
+        module_scan = ModuleScan(filename, get_module_name(filename, root=root))
+        try:
+            with open(filename, "rt", encoding="utf-8") as f:
+                module_scan.scan(ast.parse(f.read(), filename))
+        except (OSError, SyntaxError, ValueError, RecursionError) as e:
+            logger.info("Cannot scan %s: %s", filename, e)
+        modules[module_scan.module_name] = module_scan
+    return modules
+
+
+def import_closure(modules, seeds):
+    """Return the names of the given seed modules and all modules they import, transitively."""
+    closure = set()
+    stack = [name for name in seeds if name in modules]
+    while stack:
+        name = stack.pop()
+        if name in closure:
+            continue
+        closure.add(name)
+        stack.extend(imported for imported in modules[name].imports if imported in modules and imported not in closure)
+    return closure
+
+
+def find_seed_modules(modules, function=None, namespace=None):
+    """Return the modules where the analysis for the given filter starts."""
+    if function is not None:
+        # The longest module prefix of the function name (which may be a method, "pkg.mod.Class.method").
+        parts = function.split(".")
+        for i in range(len(parts) - 1, 0, -1):
+            name = ".".join(parts[:i])
+            if name in modules:
+                return {name}
+        return set()
+    return {name for name in modules if namespace in name}
+
+
+def demand_driven_visitor(
+    filenames,
+    function: str = None,
+    namespace: str = None,
+    root: str = None,
+    logger=None,
+    max_fraction: float = 0.5,
+    **kwargs,
+):
+    """Analyze the files needed for filtering the call graph by function or namespace.
+
+    Returns the CallGraphVisitor, to be filtered as usual (with filter()); the
+    filtered graph is the same as with all files analyzed. The arguments are as
+    in create_callgraph(). max_fraction is the fraction of the files above which
+    all files are analyzed. Other keyword arguments are passed to CallGraphVisitor.
+
+    Each round that adds files analyzes all the selected files again, as the
+    analysis of the earlier files depends on the new ones (the analyzer is not
+    incremental). In the worst case, every round adds a single file, so the
+    total work is quadratic in the number of selected files, up to
+    max_fraction * len(filenames) of them, before the analysis of all files.
+    """
+    logger = logger or logging.getLogger(__name__)
+    if function is None and namespace is None:
+        raise ValueError("demand-driven analysis needs a function or a namespace")
+
+    modules = scan_files(filenames, root=root, logger=logger)
+    seeds = find_seed_modules(modules, function=function, namespace=namespace)
+    if not seeds:
+        logger.warning("No module found for the filter; analyzing all files")
+        return CallGraphVisitor(filenames, root=root, logger=logger, **kwargs)
+
+    # Only definitions in the filtered namespace can show up in the filtered graph.
+    if namespace is None:
+        namespace = function.split(".", 1)[0]
+
+    selected = import_closure(modules, seeds)
+    while True:
+        if len(selected) > max_fraction * len(filenames):
+            logger.info("Demand-driven analysis needs %d of %d files; analyzing all", len(selected), len(filenames))
+            return CallGraphVisitor(filenames, root=root, logger=logger, **kwargs)
+
+        # Keep the order of the given files, as the analysis depends on it.
+        selected_set = {modules[name].filename for name in selected}
+        selected_filenames = [fn for fn in filenames if fn in selected_set]
+        logger.info("Demand-driven analysis of %d of %d files", len(selected_filenames), len(filenames))
+        v = CallGraphVisitor(selected_filenames, root=root, logger=logger, **kwargs)
+
+        wildcard_names = {n.name for nodes in v.uses_edges.values() for n in nodes if n.namespace is None}
+        needed = {
+            name
+            for name, module_scan in modules.items()
+            if name not in selected and namespace in name and module_scan.defined_names & wildcard_names
+        }
+        if not needed:
+            return v
+        selected |= import_closure(modules, needed)
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Summaries of installed third-party packages, for resolving references into them.
+
+Calls into packages outside the analyzed files normally end up as wildcards,
+or are dropped by contract_nonexistents(). Instead of analyzing the sources
+of those packages, which is slow, the analyzer can look the references up in
+summaries of the installed modules: their public definitions, their classes
+with their members and base classes, and their imports (to follow re-exports,
+e.g. ``requests.get`` defined in ``requests.api``).
+
+A module is summarized by parsing its source (it is never imported), the
+first time a reference into it is resolved. Summaries are cached on disk
+per distribution name and version, so each module is summarized only once
+per environment. Only modules of installed distributions are summarized;
+the standard library and extension modules are not.
+"""
+
+import ast
+import importlib.machinery
+import json
+import logging
+import os
+import sys
+
+try:
+    import importlib.metadata as importlib_metadata
+except ImportError:  # Python < 3.8
+    importlib_metadata = None
+
+from .anutils import get_ast_node_name, resolve_import_name, resolve_method_resolution_order
+from .node import Flavor
+
+SUMMARY_VERSION = 2
+
+# Nesting limit when following re-exports (guards against import cycles).
+MAX_DEPTH = 20
+
+
+def default_cache_dir():
+    """Return the default directory for summary caches (under $XDG_CACHE_HOME, or ~/.cache)."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "pyan", "summaries")
+
+
+def top_level_distributions():
+    """Return a dict top-level package name: (distribution name, version) for the installed distributions."""
+    result = {}
+    if importlib_metadata is None:
+        return result
+    for dist in importlib_metadata.distributions():
+        name = dist.metadata["Name"]
+        if not name:
+            continue
+        top_level = dist.read_text("top_level.txt")
+        if top_level:
+            packages = top_level.split()
+        else:  # no top_level.txt (e.g. wheels built by newer tools); use the installed files
+            packages = {top_level_name(path.parts) for path in dist.files or ()} - {None}
+        for package in packages:
+            result.setdefault(package, (name, dist.version))
+    return result
+
+
+def top_level_name(parts):
+    """Return the top-level module or package name of an installed file (given as path parts), or None."""
+    if len(parts) == 1:
+        return parts[0][:-3] if parts[0].endswith(".py") else None
+    if parts[0] in ("..", "__pycache__") or parts[0].endswith((".dist-info", ".egg-info", ".data")):
+        return None
+    return parts[0]
+
+
+def summarize_module(tree, module_name, is_package):
+    """Return the summary (a JSON-serializable dict) of a parsed module.
+
+    definitions: name: [flavor, lineno, end_lineno], for the module-level functions, classes and names
+    classes: name: {"bases": absolute names of the base classes, "members": name: [flavor, lineno, end_lineno]}
+    imports: name: absolute name of what the module binds to it by importing
+    star_imports: absolute names of the modules imported with "from ... import *"
+    """
+    definitions = {}
+    classes = {}
+    imports = {}
+    star_imports = []
+
+    for stmt in tree.body:
+        if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            definitions[stmt.name] = [Flavor.FUNCTION.value, stmt.lineno, getattr(stmt, "end_lineno", None)]
+        elif isinstance(stmt, ast.ClassDef):
+            definitions[stmt.name] = [Flavor.CLASS.value, stmt.lineno, getattr(stmt, "end_lineno", None)]
+            classes[stmt.name] = {
+                "bases": [
+                    get_ast_node_name(base) for base in stmt.bases if isinstance(base, (ast.Name, ast.Attribute))
+                ],
+                "members": summarize_class_body(stmt),
+            }
+        elif isinstance(stmt, (ast.Assign, ast.AnnAssign)):
+            targets = stmt.targets if isinstance(stmt, ast.Assign) else [stmt.target]
+            for target in targets:
+                if isinstance(target, ast.Name):
+                    definitions[target.id] = [Flavor.NAME.value, stmt.lineno, getattr(stmt, "end_lineno", None)]
+        elif isinstance(stmt, ast.Import):
+            for alias in stmt.names:
+                if alias.asname is not None:
+                    imports[alias.asname] = alias.name
+                else:  # "import a.b" binds "a"
+                    top = alias.name.split(".", 1)[0]
+                    imports[top] = top
+        elif isinstance(stmt, ast.ImportFrom):
+            base = resolve_import_name(module_name, is_package, stmt.level, stmt.module)
+            for alias in stmt.names:
+                if alias.name == "*":
+                    star_imports.append(base)
+                else:
+                    imports[alias.asname or alias.name] = "%s.%s" % (base, alias.name) if base else alias.name
+
+    # Base classes are looked up by absolute name.
+    for info in classes.values():
+        info["bases"] = [absolute_name(base, module_name, definitions, imports) for base in info["bases"]]
+
+    return {"definitions": definitions, "classes": classes, "imports": imports, "star_imports": star_imports}
+
+
+def summarize_class_body(class_node):
+    members = {}
+    for stmt in class_node.body:
+        if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            flavor = Flavor.METHOD
+            for decorator in stmt.decorator_list:
+                if isinstance(decorator, ast.Name) and decorator.id == "staticmethod":
+                    flavor = Flavor.STATICMETHOD
+                elif isinstance(decorator, ast.Name) and decorator.id == "classmethod":
+                    flavor = Flavor.CLASSMETHOD
+            members[stmt.name] = [flavor.value, stmt.lineno, getattr(stmt, "end_lineno", None)]
+        elif isinstance(stmt, ast.ClassDef):
+            members[stmt.name] = [Flavor.CLASS.value, stmt.lineno, getattr(stmt, "end_lineno", None)]
+        elif isinstance(stmt, (ast.Assign, ast.AnnAssign)):
+            targets = stmt.targets if isinstance(stmt, ast.Assign) else [stmt.target]
+            for target in targets:
+                if isinstance(target, ast.Name):
+                    members[target.id] = [Flavor.NAME.value, stmt.lineno, getattr(stmt, "end_lineno", None)]
+    return members
+
+
+def absolute_name(name, module_name, definitions, imports):
+    """Return the absolute name of a dotted name as written in the given module."""
+    head, _, rest = name.partition(".")
+    if head in imports:
+        head = imports[head]
+    elif head in definitions:
+        head = "%s.%s" % (module_name, head)
+    return "%s.%s" % (head, rest) if rest else head
+
+
+class ExternalDefinition:
+    """A definition found in the summary of a third-party module."""
+
+    def __init__(self, module, namespace, name, flavor, filename, lineno=None, end_lineno=None):
+        self.module = module  # the module that contains the definition
+        self.namespace = namespace
+        self.name = name
+        self.flavor = flavor
+        self.filename = filename
+        self.lineno = lineno
+        self.end_lineno = end_lineno
+
+    def __repr__(self):
+        return "<ExternalDefinition %s %s.%s>" % (self.flavor, self.namespace, self.name)
+
+
+class PackageSummaries:
+    """Lazily built, cached summaries of installed third-party modules.
+
+    cache_dir is where to keep the summaries (one JSON file per distribution
+    and version); None for the default, see default_cache_dir(). With
+    cache_dir=False, the summaries are kept in memory only.
+    """
+
+    def __init__(self, cache_dir=None, logger=None):
+        self.cache_dir = default_cache_dir() if cache_dir is None else cache_dir
+        self.logger = logger or logging.getLogger(__name__)
+        self.distributions = None  # top-level package: (name, version), filled in on first use
+        self.caches = {}  # (name, version): {"modules": module name: summary or None}
+        self.dirty = set()  # keys of the caches that have new summaries
+        self.locations = {}  # module name: source filename, or None if not found
+        self.mros = {}  # class name: names of the classes in its MRO, see get_mro()
+
+    def distribution_of(self, module_name):
+        """Return the (name, version) of the installed distribution providing the module, or None."""
+        if self.distributions is None:
+            self.distributions = top_level_distributions()
+        return self.distributions.get(module_name.split(".", 1)[0])
+
+    def cache_filename(self, key):
+        name, version = key
+        return os.path.join(self.cache_dir, "%s-%s.json" % (name, version))
+
+    def get_cache(self, key):
+        cache = self.caches.get(key)
+        if cache is None:
+            cache = {"version": SUMMARY_VERSION, "modules": {}}
+            if self.cache_dir:
+                try:
+                    with open(self.cache_filename(key), "rt", encoding="utf-8") as f:
+                        loaded = json.load(f)
+                    if loaded.get("version") == SUMMARY_VERSION:
+                        cache = loaded
+                except (OSError, ValueError):
+                    pass
+            self.caches[key] = cache
+        return cache
+
+    def save(self):
+        """Write the summaries built since the last save to the cache directory."""
+        if not self.cache_dir:
+            self.dirty.clear()
+            return
+        for key in sorted(self.dirty):
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(self.cache_filename(key), "wt", encoding="utf-8") as f:
+                    json.dump(self.caches[key], f)
+            except OSError as e:
+                self.logger.warning("Cannot write summary cache %s: %s", self.cache_filename(key), e)
+        self.dirty.clear()
+
+    def find_source(self, module_name):
+        """Return the source filename of the module, without importing it (or its parent packages)."""
+        if module_name in self.locations:
+            return self.locations[module_name]
+        filename = None
+        parent, _, name = module_name.rpartition(".")
+        if parent:
+            parent_filename = self.find_source(parent)
+            if parent_filename is not None and os.path.basename(parent_filename) == "__init__.py":
+                spec = importlib.machinery.PathFinder.find_spec(name, [os.path.dirname(parent_filename)])
+            else:
+                spec = None
+        else:
+            spec = importlib.machinery.PathFinder.find_spec(name)
+        if spec is not None and spec.origin and spec.origin.endswith(".py"):
+            filename = spec.origin
+        self.locations[module_name] = filename
+        return filename
+
+    def get_module(self, module_name):
+        """Return the summary of a third-party module, or None if it is not available."""
+        key = self.distribution_of(module_name)
+        if key is None:
+            return None
+        modules = self.get_cache(key)["modules"]
+        if module_name not in modules:
+            summary = None
+            filename = self.find_source(module_name)
+            if filename is not None:
+                try:
+                    with open(filename, "rt", encoding="utf-8") as f:
+                        tree = ast.parse(f.read(), filename)
+                    is_package = os.path.basename(filename) == "__init__.py"
+                    summary = summarize_module(tree, module_name, is_package)
+                    summary["filename"] = filename
+                    self.logger.info("Summarized %s (%s %s)", module_name, key[0], key[1])
+                except (OSError, SyntaxError, ValueError, RecursionError) as e:
+                    self.logger.info("Cannot summarize %s: %s", module_name, e)
+            modules[module_name] = summary
+            self.dirty.add(key)
+        return modules[module_name]
+
+    def resolve(self, name, depth=0):
+        """Return the ExternalDefinition of a fully qualified name in a third-party package, or None."""
+        if depth > MAX_DEPTH or self.distribution_of(name) is None:
+            return None
+        parts = name.split(".")
+        for i in range(len(parts), 0, -1):  # the longest module prefix
+            module_name = ".".join(parts[:i])
+            summary = self.get_module(module_name)
+            if summary is not None:
+                return self.resolve_in_module(summary, module_name, parts[i:], depth)
+        return None
+
+    def resolve_in_module(self, summary, module_name, parts, depth):
+        filename = summary["filename"]
+        if not parts:
+            return ExternalDefinition(module_name, "", module_name, Flavor.MODULE, filename)
+        name, rest = parts[0], parts[1:]
+        if name in summary["definitions"]:
+            flavor, lineno, end_lineno = summary["definitions"][name]
+            if not rest:
+                return ExternalDefinition(module_name, module_name, name, Flavor(flavor), filename, lineno, end_lineno)
+            if name in summary["classes"] and len(rest) == 1:
+                return self.resolve_member("%s.%s" % (module_name, name), rest[0], depth)
+            return None
+        if name in summary["imports"]:
+            return self.resolve(".".join([summary["imports"][name]] + rest), depth + 1)
+        for star_module in summary["star_imports"]:
+            definition = self.resolve(".".join([star_module] + parts), depth + 1)
+            if definition is not None:
+                return definition
+        return None
+
+    def find_class(self, class_name, depth=0):
+        """Return the fully qualified name of the definition of a third-party class (following
+        re-exports), and its summary; or (None, None) if it is not found.
+
+        The names are interned, so that resolve_method_resolution_order() can compare them by identity."""
+        if depth > MAX_DEPTH:
+            return None, None
+        module_name, _, name = class_name.rpartition(".")
+        summary = self.get_module(module_name) if module_name else None
+        if summary is not None and name in summary["classes"]:
+            return sys.intern(class_name), summary["classes"][name]
+        # the class may be re-exported; find where it is defined
+        definition = self.resolve(class_name, depth + 1)
+        if definition is None or definition.flavor != Flavor.CLASS or definition.namespace == module_name:
+            return None, None
+        return self.find_class("%s.%s" % (definition.namespace, definition.name), depth + 1)
+
+    def get_mro(self, class_name, depth=0):
+        """Return the MRO of a third-party class, as the fully qualified names of the classes.
+
+        Base classes that cannot be found (e.g. those in the standard library) are left out."""
+        class_name, _ = self.find_class(class_name, depth)
+        if class_name is None:
+            return []
+        if class_name not in self.mros:
+            class_base_names = {}  # class name: names of its bases
+            stack = [class_name]
+            while stack:
+                name = stack.pop()
+                if name in class_base_names:
+                    continue
+                _, info = self.find_class(name, depth)
+                bases = [base for base in (self.find_class(base, depth)[0] for base in info["bases"]) if base]
+                class_base_names[name] = bases
+                stack.extend(bases)
+            self.mros.update(resolve_method_resolution_order(class_base_names, self.logger))
+        return self.mros[class_name]
+
+    def resolve_member(self, class_name, attr_name, depth=0):
+        """Look up an attribute of a third-party class, in the class and then in its bases (in MRO order)."""
+        for name in self.get_mro(class_name, depth):
+            module_name, _, short_name = name.rpartition(".")
+            summary = self.get_module(module_name)
+            members = summary["classes"][short_name]["members"]
+            if attr_name in members:
+                flavor, lineno, end_lineno = members[attr_name]
+                return ExternalDefinition(
+                    module_name, name, attr_name, Flavor(flavor), summary["filename"], lineno, end_lineno
+                )
+        return None
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Instrumentation hooks for monitoring Pyan runs programmatically."""
+
+from contextlib import contextmanager
+import time
+
+
+class AnalysisHooks:
+    """Callbacks invoked by CallGraphVisitor and the writers.
+
+    The default implementation does nothing. Subclass and override the
+    methods of interest, e.g. to feed a metrics pipeline or a progress bar::
+
+        class Progress(AnalysisHooks):
+            def on_progress(self, done, total):
+                print("%d/%d" % (done, total))
+
+        CallGraphVisitor(filenames, hooks=Progress())
+
+    Cumulative counters (wildcards created, imports remapped, ...) are not
+    passed to the hooks; see CallGraphVisitor.counters.
+    """
+
+    def on_file_start(self, filename):
+        """Called before a file is analyzed (once per pass in which the file is visited)."""
+        pass
+
+    def on_file_done(self, filename, duration, nodes_added, edges_added):
+        """Called after a file is analyzed.
+
+        duration:    wall time in seconds
+        nodes_added: number of graph nodes created while visiting the file
+        edges_added: number of defines and uses edges added while visiting the file
+        """
+        pass
+
+    def on_phase(self, name, duration):
+        """Called when a phase of the run (e.g. "pass 1", "expand_unknowns", "dot") finishes.
+
+        Phases may nest; e.g. "parse" is reported for each file within "pass 1".
+        """
+        pass
+
+    def on_progress(self, done, total):
+        """Called after each analyzed file, and when total changes.
+
+        total is the number of file visits in the whole analysis. Until the
+        files for pass 2 have been selected, it assumes all files are visited
+        twice, so it may decrease once during the run.
+        """
+        pass
+
+
+@contextmanager
+def instrumented_phase(name, profiler, hooks):
+    """Context manager that profiles the enclosed code as the named phase,
+    and reports its duration to hooks.on_phase()."""
+    t0 = time.perf_counter()
+    with profiler.phase(name):
+        yield
+    hooks.on_phase(name, time.perf_counter() - t0)
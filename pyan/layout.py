@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""A built-in layout engine, to render the call graph as SVG without GraphViz.
+
+GraphViz's dot takes hours to lay out graphs of tens of thousands of nodes,
+and is not always installed. This engine lays out a VisualGraph with a
+multilevel force-directed algorithm (Fruchterman-Reingold forces), computed
+with NumPy over the arrays of all nodes and edges at once:
+
+  - the graph is coarsened by repeatedly merging neighbouring nodes (within
+    the same namespace cluster), laid out at the coarsest level, and the
+    positions are refined level by level back to the full graph
+  - the repulsion between all nodes is approximated on a grid: the nodes are
+    binned into cells, whose masses are convolved with the repulsion kernel
+    by FFT; only the nodes sharing a cell repel each other exactly
+  - the nodes of each namespace cluster are pulled back into a disc around
+    its centroid, so that the clusters stay together; the edges between
+    clusters pull less than those within one
+
+The SVG has the structure of GraphViz's (clusters, nodes and edges as titled
+groups), so that the HTML page (see pyan.writers.HTMLWriter) works with it.
+Edges are drawn straight, and the rankdir option does not apply.
+
+NumPy is imported only when the engine is used.
+"""
+
+import html
+import logging
+import os
+import sys
+
+BUILTIN_ENGINE = "builtin"
+
+# Sizes in points, as in GraphViz output.
+NODE_HEIGHT = 36.0
+NODE_PADDING = 12.0
+CHAR_WIDTH = 7.0  # approximate, for 14pt Times
+FONT_SIZE = 14.0
+LINE_HEIGHT = 16.0
+CLUSTER_PADDING = 8.0
+CLUSTER_LABEL_HEIGHT = 22.0
+ARROW_LENGTH = 10.0
+ARROW_WIDTH = 3.5
+MARGIN = 4.0
+
+
+def import_numpy():
+    """Return the numpy module; raise RuntimeError if it is not installed."""
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError(
+            "The built-in layout engine needs NumPy (pip install numpy); or use a GraphViz layout engine, e.g. dot"
+        )
+    return numpy
+
+
+def get_label_lines(node):
+    return node.label.split("\\n")
+
+
+def get_node_width(node):
+    """Return the width of a node's ellipse, from the length of its label."""
+    return max(len(line) for line in get_label_lines(node)) * CHAR_WIDTH + 2 * NODE_PADDING
+
+
+def get_node_height(node):
+    return max(NODE_HEIGHT, len(get_label_lines(node)) * LINE_HEIGHT + NODE_PADDING)
+
+
+class LayoutGraph:
+    """The nodes, edges and clusters (subgraphs) of a VisualGraph, numbered for the layout.
+
+    Nodes with the same id (the same node, in two places) are merged, as GraphViz does.
+    """
+
+    def __init__(self, graph):
+        self.nodes = []  # VisualNodes
+        self.node_cluster = []  # number of the innermost cluster of each node, or -1
+        self.clusters = []  # VisualGraphs of the subgraphs, parents before children
+        self.cluster_parent = []  # number of the parent cluster of each cluster, or -1
+        self.edges = []  # VisualEdges
+        self.sources = []  # number of the source node of each edge
+        self.targets = []
+        self.numbers = {}  # node id: number
+        self.add_nodes(graph, -1)
+        for edge in graph.edges:
+            self.edges.append(edge)
+            self.sources.append(self.numbers[edge.source.id])
+            self.targets.append(self.numbers[edge.target.id])
+
+    def add_nodes(self, graph, cluster):
+        for node in graph.nodes:
+            if node.id not in self.numbers:
+                self.numbers[node.id] = len(self.nodes)
+                self.nodes.append(node)
+                self.node_cluster.append(cluster)
+        for subgraph in graph.subgraphs:
+            self.clusters.append(subgraph)
+            self.cluster_parent.append(cluster)
+            self.add_nodes(subgraph, len(self.clusters) - 1)
+
+
+class ForceLayout:
+    """Multilevel force-directed layout (see the module docstring).
+
+    spacing is the typical distance between neighbouring nodes, in points:
+    the layout is scaled to make it the median distance to the nearest node.
+    iterations is the number of force iterations at each level; the coarsest
+    level gets three times as many. max_cells is the number of grid cells per
+    side, for the repulsion. The layout is reproducible for a given seed.
+    """
+
+    min_nodes = 50  # stop coarsening at this number of nodes
+    cluster_strength = 1000.0  # of the pull of a node's innermost cluster, relative to that of an edge
+    cluster_radius = 0.4  # of the disc a cluster is pulled into, relative to spacing * sqrt(number of nodes)
+    cross_weight = 0.1  # of the edges between clusters, relative to the edges within one
+    gravity = 1.0  # the pull of the whole graph (as a cluster), which keeps its components together
+
+    def __init__(self, spacing=100.0, iterations=60, max_cells=256, seed=0, logger=None):
+        self.spacing = spacing
+        self.iterations = iterations
+        self.max_cells = max_cells
+        self.seed = seed
+        self.logger = logger or logging.getLogger(__name__)
+        self.kernels = {}  # grid size: FFTs of the repulsion kernel
+
+    def run(self, count, sources, targets, node_cluster=None, cluster_parent=None):
+        """Return the positions (an array of count rows of x, y) of the nodes of a graph.
+
+        sources and targets are the node numbers of the edges. node_cluster is
+        the number of the innermost cluster of each node (or -1), and
+        cluster_parent that of the parent of each cluster (or -1).
+        """
+        np = import_numpy()
+        rng = np.random.default_rng(self.seed)
+        if count == 0:
+            return np.zeros((0, 2))
+        sources = np.asarray(sources, dtype=np.int64).reshape(-1)
+        targets = np.asarray(targets, dtype=np.int64).reshape(-1)
+        loops = sources == targets
+        sources, targets = sources[~loops], targets[~loops]
+        groups = np.full(count, -1, dtype=np.int64) if node_cluster is None else np.asarray(node_cluster, np.int64)
+        parents = np.asarray(cluster_parent if cluster_parent is not None else [], dtype=np.int64)
+
+        # Coarsen, keeping the mapping of each level's nodes to the next. Nodes
+        # are merged within their innermost cluster, and once that stops
+        # shrinking the graph, within the cluster around it.
+        levels = [(count, sources, targets, groups, np.ones(count))]
+        mappings = []
+        while levels[-1][0] > self.min_nodes:
+            count, sources, targets, groups, mass = levels[-1]
+            mapping, coarse_count = self.coarsen(np, rng, count, sources, targets, groups)
+            while coarse_count > 0.85 * count and (groups >= 0).any():
+                groups = np.where(groups >= 0, parents[np.maximum(groups, 0)], -1)
+                mapping, coarse_count = self.coarsen(np, rng, count, sources, targets, groups)
+            if coarse_count > 0.85 * count:
+                break
+            coarse_groups = np.empty(coarse_count, dtype=np.int64)
+            coarse_groups[mapping] = groups
+            coarse_sources, coarse_targets = mapping[sources], mapping[targets]
+            inside = coarse_sources != coarse_targets
+            levels.append(
+                (
+                    coarse_count,
+                    coarse_sources[inside],
+                    coarse_targets[inside],
+                    coarse_groups,
+                    np.bincount(mapping, mass, coarse_count),
+                )
+            )
+            mappings.append(mapping)
+        self.logger.info("Layout: %d levels, %d nodes at the coarsest", len(levels), levels[-1][0])
+
+        # Lay out the coarsest level, then refine.
+        count = levels[-1][0]
+        positions = rng.random((count, 2)) * self.spacing * np.sqrt(count)
+        for level in range(len(levels) - 1, -1, -1):
+            if level < len(levels) - 1:
+                positions = positions[mappings[level]]
+                positions += rng.normal(scale=0.1 * self.spacing, size=positions.shape)
+                iterations, temperature = self.iterations, 2 * self.spacing
+            else:
+                iterations, temperature = 3 * self.iterations, self.spacing * np.sqrt(count) / 4
+            count, sources, targets, groups, mass = levels[level]
+            edge_weights = np.where(groups[sources] == groups[targets], 1.0, self.cross_weight)
+            members, member_clusters, member_weights = self.get_memberships(np, groups, parents)
+            self.relax(
+                np,
+                positions,
+                sources,
+                targets,
+                edge_weights,
+                mass,
+                members,
+                member_clusters,
+                member_weights * mass[members],
+                len(parents) + 1,
+                iterations,
+                temperature,
+            )
+        return positions * (self.spacing / max(self.get_neighbour_distance(np, positions), 1e-9))
+
+    def get_neighbour_distance(self, np, positions, window=8):
+        """Return the median distance of the nodes to their nearest neighbour.
+
+        Approximately: the neighbours are looked for among the nodes next to
+        each node in strips (of about one node per unit of their width) across
+        either axis.
+        """
+        count = len(positions)
+        if count < 2:
+            return self.spacing
+        extent = np.maximum(positions.max(axis=0) - positions.min(axis=0), 1e-9)
+        width = np.sqrt(extent[0] * extent[1] / count) or extent.max() / count
+        nearest = np.full(count, np.inf)
+        for axis in range(2):
+            strips = np.floor(positions[:, axis] / width)
+            order = np.lexsort((positions[:, 1 - axis], strips))
+            ordered = positions[order]
+            for shift in range(1, min(window, count - 1) + 1):
+                distances = np.sqrt(((ordered[shift:] - ordered[:-shift]) ** 2).sum(axis=1))
+                nearest[order[shift:]] = np.minimum(nearest[order[shift:]], distances)
+                nearest[order[:-shift]] = np.minimum(nearest[order[:-shift]], distances)
+        return float(np.median(nearest))
+
+    def coarsen(self, np, rng, count, sources, targets, groups):
+        """Merge neighbouring nodes of the same cluster. Return the mapping to the merged nodes, and their number.
+
+        Each node picks a random neighbour; nodes that pick each other are
+        merged, and a node whose pick was merged joins it. Nodes without
+        neighbours are merged in pairs.
+        """
+        nodes = np.arange(count)
+        inside = groups[sources] == groups[targets]
+        a = np.concatenate([sources[inside], targets[inside]])
+        b = np.concatenate([targets[inside], sources[inside]])
+        choice = np.full(count, -1, dtype=np.int64)
+        if len(a):
+            order = np.lexsort((rng.random(len(a)), a))
+            a, b = a[order], b[order]
+            first = np.ones(len(a), dtype=bool)
+            first[1:] = a[1:] != a[:-1]
+            choice[a[first]] = b[first]
+        chose = choice >= 0
+        picked = np.where(chose, choice, 0)
+        matched = chose & (choice[picked] == nodes)
+        representative = nodes.copy()
+        representative[matched] = np.minimum(nodes, choice)[matched]
+        joining = chose & ~matched & matched[picked]
+        representative[joining] = representative[choice[joining]]
+
+        alone = nodes[~chose]
+        alone = alone[np.argsort(groups[alone], kind="stable")]
+        pairs = len(alone) // 2
+        first, second = alone[: 2 * pairs : 2], alone[1 : 2 * pairs : 2]
+        same = groups[first] == groups[second]
+        representative[second[same]] = first[same]
+
+        _, mapping = np.unique(representative, return_inverse=True)
+        return mapping.reshape(-1), int(mapping.max()) + 1
+
+    def get_memberships(self, np, groups, parents):
+        """Return the nodes, the clusters they are in (directly or not), and the strength of their pull, as arrays.
+
+        The pull of a cluster weakens with the number of clusters between it
+        and the node. The whole graph is the last cluster, numbered len(parents).
+        """
+        nodes = np.arange(len(groups))
+        members, clusters, weights = [nodes], [np.full(len(groups), len(parents))], [np.full(len(groups), self.gravity)]
+        current = groups
+        depth = 0
+        while True:
+            inside = current >= 0
+            if not inside.any():
+                break
+            nodes, current = nodes[inside], current[inside]
+            members.append(nodes)
+            clusters.append(current)
+            weights.append(np.full(len(nodes), self.cluster_strength / (depth + 1) ** 2))
+            current = parents[current]
+            depth += 1
+        return np.concatenate(members), np.concatenate(clusters), np.concatenate(weights)
+
+    def relax(
+        self,
+        np,
+        positions,
+        sources,
+        targets,
+        edge_weights,
+        mass,
+        members,
+        member_clusters,
+        member_weights,
+        num_clusters,
+        iterations,
+        t0,
+    ):
+        """Move the nodes (positions, in place) by the forces on them, for the given number of iterations.
+
+        The edges pull their nodes together by edge_weights, and the clusters
+        pull their members that are out of their disc (around their centroid)
+        back into it by member_weights. The moves are limited by a temperature,
+        cooling down from t0.
+        """
+        count = len(positions)
+        k = self.spacing
+        for i in range(iterations):
+            forces = self.repulsion(np, positions, mass)
+
+            delta = positions[targets] - positions[sources]
+            pull = delta * (edge_weights * np.sqrt((delta**2).sum(axis=1)) / k)[:, None]
+            for axis in range(2):
+                forces[:, axis] += np.bincount(sources, pull[:, axis], count)
+                forces[:, axis] -= np.bincount(targets, pull[:, axis], count)
+
+            weights = mass[members]
+            totals = np.maximum(np.bincount(member_clusters, weights, num_clusters), 1)
+            centroids = np.stack(
+                [np.bincount(member_clusters, weights * positions[members, axis], num_clusters) for axis in range(2)],
+                axis=1,
+            )
+            delta = centroids[member_clusters] / totals[member_clusters, None] - positions[members]
+            distances = np.sqrt((delta**2).sum(axis=1))
+            excess = np.maximum(distances - self.cluster_radius * k * np.sqrt(totals[member_clusters]), 0)
+            pull = delta * (member_weights * excess**2 / (k * np.maximum(distances, 1e-9)))[:, None]
+            for axis in range(2):
+                forces[:, axis] += np.bincount(members, pull[:, axis], count)
+
+            temperature = t0 * (1 - i / iterations) + 0.01 * k
+            lengths = np.sqrt((forces**2).sum(axis=1))
+            positions += forces * (np.minimum(lengths, temperature) / np.maximum(lengths, 1e-9))[:, None]
+
+    def repulsion(self, np, positions, mass):
+        """Return the repulsive forces on the nodes, approximated on a grid."""
+        count = len(positions)
+        k = self.spacing
+        low = positions.min(axis=0)
+        extent = float((positions.max(axis=0) - low).max())
+        cell_size = max(extent / (self.max_cells - 1), k)
+        size = int(extent / cell_size) + 1
+        cells = np.minimum(((positions - low) / cell_size).astype(np.int64), size - 1)
+        flat = cells[:, 0] * size + cells[:, 1]
+
+        # Far field: the repulsion k**2 / d of each cell's mass, at the cell centers.
+        grid = np.bincount(flat, mass, size * size).reshape(size, size)
+        spectrum = np.fft.rfft2(grid, s=(2 * size, 2 * size))
+        kernel_x, kernel_y = self.get_kernels(np, size)
+        scale = k * k / cell_size
+        forces = np.empty((count, 2))
+        for axis, kernel in enumerate((kernel_x, kernel_y)):
+            field = np.fft.irfft2(spectrum * kernel, s=(2 * size, 2 * size))[:size, :size]
+            forces[:, axis] = scale * mass * field.reshape(-1)[flat]
+
+        # Near field: exact repulsion between the nodes sharing a cell.
+        order = np.argsort(flat, kind="stable")
+        sorted_cells = flat[order]
+        for shift in range(1, 9):
+            same = sorted_cells[:-shift] == sorted_cells[shift:]
+            if not same.any():
+                break
+            a, b = order[:-shift][same], order[shift:][same]
+            delta = positions[a] - positions[b]
+            push = delta * (k * k * mass[a] * mass[b] / ((delta**2).sum(axis=1) + 1e-9))[:, None]
+            for axis in range(2):
+                forces[:, axis] += np.bincount(a, push[:, axis], count)
+                forces[:, axis] -= np.bincount(b, push[:, axis], count)
+        return forces
+
+    def get_kernels(self, np, size):
+        """Return the FFTs of the repulsion kernel d / |d|**2 (per axis), for a grid of the given size, in cells."""
+        if size not in self.kernels:
+            offsets = np.fft.fftfreq(2 * size, 1.0 / (2 * size))  # 0, 1, ..., size - 1, -size, ..., -1
+            dx, dy = np.meshgrid(offsets, offsets, indexing="ij")
+            squared = dx * dx + dy * dy
+            squared[0, 0] = np.inf  # no force of a cell on itself
+            self.kernels[size] = (np.fft.rfft2(dx / squared), np.fft.rfft2(dy / squared))
+        return self.kernels[size]
+
+
+class BuiltinRenderer(object):
+    """Renders the graph of an SVGWriter as SVG with the built-in layout, in place of a GraphvizRenderer.
+
+    spacing, iterations and seed are as for ForceLayout; by default, the
+    spacing is that of the average node width.
+    """
+
+    phase_name = "layout"
+
+    def __init__(self, spacing=None, iterations=60, seed=0, logger=None):
+        self.spacing = spacing
+        self.iterations = iterations
+        self.seed = seed
+        self.logger = logger or logging.getLogger(__name__)
+
+    def render_graph(self, writer, output=None, prefix="", suffix=""):
+        """Render the graph of writer as SVG, between prefix and suffix, to output (a filename, a stream, or None)."""
+        graph = LayoutGraph(writer.graph)
+        widths = [get_node_width(node) for node in graph.nodes]
+        heights = [get_node_height(node) for node in graph.nodes]
+        spacing = self.spacing or max(sum(widths) / max(len(widths), 1), NODE_HEIGHT)
+        layout = ForceLayout(spacing=spacing, iterations=self.iterations, seed=self.seed, logger=self.logger)
+        positions = layout.run(len(graph.nodes), graph.sources, graph.targets, graph.node_cluster, graph.cluster_parent)
+        if isinstance(output, (str, os.PathLike)):
+            with open(output, "w") as f:
+                self.write_svg(f, graph, positions, widths, heights, prefix, suffix)
+        else:
+            self.write_svg(output if output else sys.stdout, graph, positions, widths, heights, prefix, suffix)
+
+    def write_svg(self, stream, graph, positions, widths, heights, prefix="", suffix=""):
+        np = import_numpy()
+        radii = np.stack([np.asarray(widths, dtype=float), np.asarray(heights, dtype=float)], axis=1).reshape(-1, 2) / 2
+        boxes = self.get_cluster_boxes(np, graph, positions, radii)
+        corners = np.concatenate([positions - radii, positions + radii, boxes[:, :2], boxes[:, 2:]]).reshape(-1, 2)
+        low = corners.min(axis=0) if len(corners) else np.zeros(2)
+        high = corners.max(axis=0) if len(corners) else np.zeros(2)
+        positions = positions + (MARGIN - low)
+        boxes = boxes + np.tile(MARGIN - low, 2)
+        width, height = high - low + 2 * MARGIN
+
+        stream.write(prefix)
+        stream.write('<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n')
+        stream.write(
+            '<svg width="%.0fpt" height="%.0fpt" viewBox="0.00 0.00 %.2f %.2f"'
+            ' xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">\n'
+            % (width, height, width, height)
+        )
+        stream.write('<g id="graph0" class="graph">\n<title>G</title>\n')
+        stream.write(
+            '<polygon fill="white" stroke="none" points="0,0 %.2f,0 %.2f,%.2f 0,%.2f"/>\n'
+            % (width, width, height, height)
+        )
+        for number, (cluster, box) in enumerate(zip(graph.clusters, boxes.tolist())):
+            self.write_cluster(stream, number, cluster, box)
+        thickness = [edge.get_thickness() if edge.weight is not None else 1.0 for edge in graph.edges]
+        geometry = get_edge_geometry(np, positions, radii, graph.sources, graph.targets, thickness)
+        for number, edge in enumerate(graph.edges):
+            self.write_edge(stream, number, edge, thickness[number], *(points[number] for points in geometry))
+        for number, (node, center, node_radii) in enumerate(zip(graph.nodes, positions.tolist(), radii.tolist())):
+            self.write_node(stream, number, node, center, node_radii)
+        stream.write("</g>\n</svg>\n")
+        stream.write(suffix)
+
+    def get_cluster_boxes(self, np, graph, positions, radii):
+        """Return the bounding boxes (x0, y0, x1, y1) of the clusters, around their nodes and subclusters."""
+        boxes = np.tile([np.inf, np.inf, -np.inf, -np.inf], (len(graph.clusters), 1))
+        clusters = np.asarray(graph.node_cluster, dtype=np.int64)
+        inside = clusters >= 0
+        for column, corners in ((0, positions - radii), (2, positions + radii)):
+            for axis in range(2):
+                combine = np.minimum if column == 0 else np.maximum
+                combine.at(boxes[:, column + axis], clusters[inside], corners[inside, axis])
+        padding = [-CLUSTER_PADDING, -CLUSTER_PADDING - CLUSTER_LABEL_HEIGHT, CLUSTER_PADDING, CLUSTER_PADDING]
+        for cluster in range(len(graph.clusters) - 1, -1, -1):  # children before parents
+            if boxes[cluster, 0] <= boxes[cluster, 2]:
+                boxes[cluster] += padding
+            else:  # no nodes
+                boxes[cluster] = 0
+            parent = graph.cluster_parent[cluster]
+            if parent >= 0:
+                boxes[parent, :2] = np.minimum(boxes[parent, :2], boxes[cluster, :2])
+                boxes[parent, 2:] = np.maximum(boxes[parent, 2:], boxes[cluster, 2:])
+        return boxes
+
+    def write_cluster(self, stream, number, cluster, box):
+        x0, y0, x1, y1 = box
+        stream.write('<g id="clust%d" class="cluster">\n<title>cluster_%s</title>\n' % (number + 1, escape(cluster.id)))
+        stream.write(
+            '<rect fill="#808080" fill-opacity="0.094118" stroke="black"'
+            ' x="%.2f" y="%.2f" width="%.2f" height="%.2f" rx="4" ry="4"/>\n' % (x0, y0, x1 - x0, y1 - y0)
+        )
+        stream.write(
+            '<text text-anchor="middle" x="%.2f" y="%.2f" font-family="Times,serif" font-size="%.2f">%s</text>\n'
+            % ((x0 + x1) / 2, y0 + CLUSTER_LABEL_HEIGHT - 6, FONT_SIZE, escape(cluster.label))
+        )
+        stream.write("</g>\n")
+
+    def write_node(self, stream, number, node, center, radii):
+        (x, y), (rx, ry) = center, radii
+        stream.write('<g id="node%d" class="node">\n<title>%s</title>\n' % (number + 1, escape(node.id)))
+        if node.url:
+            stream.write(
+                '<g id="a_node%d"><a xlink:href="%s" xlink:title="%s">\n'
+                % (number + 1, escape(node.url), escape(node.label))
+            )
+        stream.write(
+            '<ellipse %s stroke="black" cx="%.2f" cy="%.2f" rx="%.2f" ry="%.2f"/>\n'
+            % (get_paint("fill", node.fill_color or "#ffffff"), x, y, rx, ry)
+        )
+        lines = get_label_lines(node)
+        top = y - (len(lines) - 1) * LINE_HEIGHT / 2 + FONT_SIZE / 3
+        for i, line in enumerate(lines):
+            stream.write(
+                '<text text-anchor="middle" x="%.2f" y="%.2f" font-family="Times,serif" font-size="%.2f" %s>%s</text>\n'
+                % (x, top + i * LINE_HEIGHT, FONT_SIZE, get_paint("fill", node.text_color or "#000000"), escape(line))
+            )
+        if node.url:
+            stream.write("</a>\n</g>\n")
+        stream.write("</g>\n")
+
+    def write_edge(self, stream, number, edge, thickness, start, base, left, tip, right):
+        stroke = get_paint("stroke", edge.color)
+        dashes = ' stroke-dasharray="5,2"' if edge.flavor == "defines" else ""
+        stream.write(
+            '<g id="edge%d" class="edge">\n<title>%s&#45;&gt;%s</title>\n'
+            % (number + 1, escape(edge.source.id), escape(edge.target.id))
+        )
+        stream.write(
+            '<path fill="none" %s stroke-width="%.1f"%s d="M%.2f,%.2f L%.2f,%.2f"/>\n'
+            % (stroke, thickness, dashes, *start, *base)
+        )
+        stream.write(
+            '<polygon %s %s stroke-width="%.1f" points="%.2f,%.2f %.2f,%.2f %.2f,%.2f %.2f,%.2f"/>\n'
+            % (get_paint("fill", edge.color), stroke, thickness, *left, *tip, *right, *left)
+        )
+        if edge.weight is not None:
+            stream.write(
+                '<text text-anchor="middle" x="%.2f" y="%.2f" font-family="Times,serif" font-size="%.2f">%d</text>\n'
+                % ((start[0] + tip[0]) / 2, (start[1] + tip[1]) / 2, FONT_SIZE, edge.weight)
+            )
+        stream.write("</g>\n")
+
+
+def get_edge_geometry(np, positions, radii, sources, targets, thickness):
+    """Return the points of the edges, drawn straight between the borders of the ellipses of their nodes.
+
+    The points are lists of (x, y), one per edge: the start of the line, the
+    base of the arrowhead (the end of the line), its left corner, its tip
+    and its right corner.
+    """
+    sources = np.asarray(sources, dtype=np.int64).reshape(-1)
+    targets = np.asarray(targets, dtype=np.int64).reshape(-1)
+    direction = positions[targets] - positions[sources]
+    lengths = np.sqrt((direction**2).sum(axis=1))
+    unit = np.where(lengths[:, None] > 0, direction / np.maximum(lengths, 1e-9)[:, None], [1.0, 0.0])
+    start = positions[sources] + unit * get_ellipse_radius(np, unit, radii[sources])[:, None]
+    tip = positions[targets] - unit * get_ellipse_radius(np, unit, radii[targets])[:, None]
+    size = np.minimum(np.asarray(thickness, dtype=float), 2).reshape(-1, 1)
+    base = tip - unit * ARROW_LENGTH * size
+    normal = np.stack([-unit[:, 1], unit[:, 0]], axis=1) * ARROW_WIDTH * size
+    return [points.tolist() for points in (start, base, base + normal, tip, base - normal)]
+
+
+def escape(text):
+    return html.escape(str(text), quote=True)
+
+
+def get_paint(attribute, color):
+    """Return the SVG attributes for a fill or stroke color given as #rrggbb or #rrggbbaa, as GraphViz writes them."""
+    if len(color) == 9 and color.startswith("#"):
+        return '%s="%s" %s-opacity="%f"' % (attribute, color[:7], attribute, int(color[7:], 16) / 255)
+    return '%s="%s"' % (attribute, color)
+
+
+def get_ellipse_radius(np, unit, radii):
+    """Return the distances from the centers of ellipses (with the given radii) to their borders, along unit vectors."""
+    return 1.0 / np.sqrt((unit[:, 0] / radii[:, 0]) ** 2 + (unit[:, 1] / radii[:, 1]) ** 2)
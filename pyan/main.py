@@ -9,18 +9,57 @@
     for rendering by e.g. GraphViz or yEd.
 """
 
-from argparse import ArgumentParser
+from argparse import ArgumentParser, ArgumentTypeError
 from glob import glob
 import logging
 import os
-
-from .analyzer import CallGraphVisitor
-from .visgraph import VisualGraph
-from .writers import DotWriter, HTMLWriter, SVGWriter, TgfWriter, YedWriter
+import sys
+
+from .analyzer import ANALYSIS_LEVELS, CallGraphVisitor
+from .demand import demand_driven_visitor
+from .external import PackageSummaries
+from .layout import BUILTIN_ENGINE, BuiltinRenderer
+from .profiling import NullProfiler, Profiler
+from .shards import extract_main, merge_shards, read_shard
+from .simplify import SIMPLIFY_PASSES, simplify
+from .split import SPLIT_LEVELS, split_graph, write_shards
+from .visgraph import COLLAPSE_LEVELS, VisualGraph, choose_collapse_level
+from .writers import OUTPUT_FORMATS, GraphvizRenderer, write_outputs
+
+
+def parse_output(value):
+    """Parse an --output argument FORMAT:PATH into a pair (format, path), with path None for stdout."""
+    format, sep, path = value.partition(":")
+    if not sep or not path:
+        raise ArgumentTypeError("expected FORMAT:PATH, got '%s'" % value)
+    if format not in OUTPUT_FORMATS:
+        raise ArgumentTypeError("unknown format '%s'; expected one of %s" % (format, ", ".join(OUTPUT_FORMATS)))
+    return format, None if path == "-" else path
+
+
+def parse_passes(value):
+    """Parse a --simplify argument, a comma-separated list of SIMPLIFY_PASSES."""
+    passes = [name.strip() for name in value.split(",") if name.strip()]
+    for name in passes:
+        if name not in SIMPLIFY_PASSES:
+            raise ArgumentTypeError("unknown pass '%s'; expected one of %s" % (name, ", ".join(SIMPLIFY_PASSES)))
+    return passes
 
 
 def main(cli_args=None):
-    usage = """%(prog)s FILENAME... [--dot|--tgf|--yed|--svg|--html]"""
+    if cli_args is None:
+        cli_args = sys.argv[1:]
+
+    # Sharded analysis: "extract" analyzes the files of a shard, "merge" combines shards instead of analyzing files.
+    if cli_args and cli_args[0] == "extract":
+        return extract_main(cli_args[1:])
+    merge = bool(cli_args) and cli_args[0] == "merge"
+    if merge:
+        cli_args = cli_args[1:]
+
+    usage = """%(prog)s FILENAME... [--dot|--tgf|--yed|--svg|--html] [--output FORMAT:PATH]...
+       %(prog)s extract FILENAME... --shard SHARD
+       %(prog)s merge SHARD... [--dot|--tgf|--yed|--svg|--html]"""
     desc = (
         "Analyse one or more Python source files and generate an"
         "approximate call graph of the modules, classes and functions"
@@ -37,10 +76,71 @@ def main(cli_args=None):
 
     parser.add_argument("--html", action="store_true", default=False, help="output in HTML Format")
 
+    parser.add_argument(
+        "--interactive",
+        action="store_true",
+        default=False,
+        help="output in interactive HTML Format, laid out in the browser (without GraphViz)",
+    )
+
     parser.add_argument("--yed", action="store_true", default=False, help="output in yEd GraphML Format")
 
     parser.add_argument("--file", dest="filename", help="write graph to FILE", metavar="FILE", default=None)
 
+    parser.add_argument(
+        "--highlight-depth",
+        type=int,
+        default=None,
+        dest="highlight_depth",
+        help="in html output, highlight the nodes up to N edges away from a clicked node [default: any number]",
+        metavar="N",
+    )
+
+    parser.add_argument(
+        "--layout-engine",
+        default="dot",
+        dest="layout_engine",
+        help="layout engine for svg and html output: a GraphViz engine, e.g. dot, neato, fdp, sfdp, or %s for the"
+        " built-in force-directed layout, which needs NumPy but not GraphViz [default: dot]" % BUILTIN_ENGINE,
+        metavar="ENGINE",
+    )
+
+    parser.add_argument(
+        "--dot-timeout",
+        type=float,
+        default=None,
+        dest="dot_timeout",
+        help="give up rendering svg or html output after SECONDS",
+        metavar="SECONDS",
+    )
+
+    parser.add_argument(
+        "--dot-processes",
+        type=int,
+        default=None,
+        dest="dot_processes",
+        help="run at most N GraphViz processes at a time [default: number of CPUs]",
+        metavar="N",
+    )
+
+    parser.add_argument(
+        "--render-cache",
+        default=None,
+        dest="render_cache",
+        help="reuse svg and html renderings of unchanged graphs, cached in DIR",
+        metavar="DIR",
+    )
+
+    parser.add_argument(
+        "--output",
+        action="append",
+        type=parse_output,
+        dest="outputs",
+        help="write graph in FORMAT (one of %s) to PATH, or to stdout if PATH is '-'; can be repeated, "
+        "to write several formats from one analysis" % ", ".join(OUTPUT_FORMATS),
+        metavar="FORMAT:PATH",
+    )
+
     parser.add_argument("--namespace", dest="namespace", help="filter for NAMESPACE", metavar="NAMESPACE", default=None)
 
     parser.add_argument("--function", dest="function", help="filter for FUNCTION", metavar="FUNCTION", default=None)
@@ -129,6 +229,77 @@ def main(cli_args=None):
         help="create nested groups (subgraphs) for nested namespaces (implies -g) [dot only]",
     )
 
+    parser.add_argument(
+        "--simplify",
+        type=parse_passes,
+        default=[],
+        dest="simplify",
+        help=(
+            "remove redundant edges before layout, with the given passes (comma-separated): "
+            "'defines' (transitive reduction of defines edges), 'uses' (approximate transitive reduction of "
+            "uses edges) and 'leaves' (uses of small helper functions that use nothing else)"
+        ),
+        metavar="PASSES",
+    )
+
+    parser.add_argument(
+        "--simplify-depth",
+        type=int,
+        default=3,
+        dest="simplify_depth",
+        help="longest alternative path considered by the 'uses' pass (default: %(default)s)",
+        metavar="N",
+    )
+
+    parser.add_argument(
+        "--leaf-max-lines",
+        type=int,
+        default=3,
+        dest="leaf_max_lines",
+        help="size limit of the helpers removed by the 'leaves' pass (default: %(default)s)",
+        metavar="N",
+    )
+
+    parser.add_argument(
+        "--collapse-to",
+        choices=COLLAPSE_LEVELS + ("auto",),
+        default=None,
+        dest="collapse_to",
+        help=(
+            "aggregate the nodes of each package, module or class into one node, merging the edges between them "
+            "(weighted by their number); 'auto' chooses the finest level within --max-nodes and --max-edges"
+        ),
+    )
+
+    parser.add_argument(
+        "--max-nodes",
+        type=int,
+        default=1000,
+        dest="max_nodes",
+        help="node budget for --collapse-to auto (default: %(default)s)",
+        metavar="N",
+    )
+
+    parser.add_argument(
+        "--max-edges",
+        type=int,
+        default=5000,
+        dest="max_edges",
+        help="edge budget for --collapse-to auto (default: %(default)s)",
+        metavar="N",
+    )
+
+    parser.add_argument(
+        "--split-by",
+        choices=SPLIT_LEVELS,
+        default=None,
+        dest="split_by",
+        help=(
+            "write one graph per package or module, linked to each other and from an index.html; "
+            "the output paths are then directories"
+        ),
+    )
+
     parser.add_argument(
         "--dot-rankdir",
         default="TB",
@@ -150,6 +321,112 @@ def main(cli_args=None):
         help="annotate with module and source line number",
     )
 
+    parser.add_argument(
+        "--level",
+        choices=ANALYSIS_LEVELS,
+        default=None,
+        dest="analysis_level",
+        help=(
+            "analysis level: 'structure' (defines edges only, function bodies are skipped), "
+            "'resolve' (uses edges, without expanding unknowns or culling inherited edges) "
+            "or 'full'. By default, the cheapest level that can produce the requested output."
+        ),
+    )
+
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        default=False,
+        dest="strict",
+        help="re-visit all files in the second analysis pass, not only those with unresolved references (slower)",
+    )
+
+    parser.add_argument(
+        "--parse-threads",
+        type=int,
+        default=1,
+        dest="parse_threads",
+        help=(
+            "read and parse files concurrently with N threads (0: one per CPU), ahead of their analysis, "
+            "which stays sequential. Faster on free-threaded Python builds"
+        ),
+        metavar="N",
+    )
+
+    parser.add_argument(
+        "--max-file-bytes",
+        type=int,
+        default=None,
+        dest="max_file_bytes",
+        help="skip files larger than N bytes",
+        metavar="N",
+    )
+
+    parser.add_argument(
+        "--max-ast-nodes",
+        type=int,
+        default=None,
+        dest="max_ast_nodes",
+        help="analyze only the definitions in files with more than N syntax tree nodes",
+        metavar="N",
+    )
+
+    parser.add_argument(
+        "--file-time-limit",
+        type=float,
+        default=None,
+        dest="file_time_limit",
+        help="analyze only the definitions in files whose analysis takes longer than SECONDS",
+        metavar="SECONDS",
+    )
+
+    parser.add_argument(
+        "--low-memory",
+        action="store_true",
+        default=False,
+        dest="low_memory",
+        help=(
+            "keep only source line numbers instead of syntax trees, so that analyzed files can be freed; "
+            "the call graph itself stays in memory, so this lowers but does not bound the footprint"
+        ),
+    )
+
+    parser.add_argument(
+        "--max-memory",
+        type=float,
+        default=None,
+        dest="max_memory",
+        help=(
+            "switch to --low-memory mode once the process uses more than MB megabytes; "
+            "this is a trigger, not a limit (nothing is spilled to disk)"
+        ),
+        metavar="MB",
+    )
+
+    parser.add_argument(
+        "--resolve-external",
+        action="store_true",
+        default=False,
+        dest="resolve_external",
+        help="resolve references into installed third-party packages, using cached summaries of the packages",
+    )
+
+    parser.add_argument(
+        "--summary-cache",
+        default=None,
+        dest="summary_cache",
+        help="keep the summaries of third-party packages in DIR [default: ~/.cache/pyan/summaries]",
+        metavar="DIR",
+    )
+
+    parser.add_argument(
+        "--demand-driven",
+        action="store_true",
+        default=False,
+        dest="demand_driven",
+        help="with --function or --namespace, analyze only the files needed for the filter",
+    )
+
     parser.add_argument(
         "--root",
         default=None,
@@ -157,9 +434,41 @@ def main(cli_args=None):
         help="Package root directory. Is inferred by default.",
     )
 
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=False,
+        dest="profile",
+        help="print time and peak memory used by each phase of the run to stderr",
+    )
+
+    parser.add_argument(
+        "--profile-json",
+        dest="profile_json",
+        help="write the profile to PROFILE_JSON (implies profiling)",
+        metavar="PROFILE_JSON",
+        default=None,
+    )
+
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        dest="profile_top",
+        help="number of slowest files to list in the profile [default 10]",
+        metavar="N",
+    )
+
     known_args, unknown_args = parser.parse_known_args(cli_args)
 
-    filenames = [fn2 for fn in unknown_args for fn2 in glob(fn, recursive=True)]
+    if known_args.profile or known_args.profile_json:
+        profiler = Profiler()
+        profiler.start()
+    else:
+        profiler = NullProfiler()
+
+    with profiler.phase("discovery"):
+        filenames = [fn2 for fn in unknown_args for fn2 in glob(fn, recursive=True)]
 
     # determine root
     if known_args.root is not None:
@@ -171,6 +480,16 @@ def main(cli_args=None):
         parser.error("Need one or more filenames to process")
     elif len(filenames) == 0:
         parser.error("No files found matching given glob: %s" % " ".join(unknown_args))
+    if sum(1 for _, path in known_args.outputs or [] if path is None) > 1:
+        parser.error("Only one --output can write to stdout")
+
+    if known_args.split_by:
+        if known_args.collapse_to:
+            parser.error("--split-by cannot be combined with --collapse-to")
+        if any(path is None for _, path in known_args.outputs or []) or (
+            known_args.filename is None and any(getattr(known_args, f) for f in OUTPUT_FORMATS)
+        ):
+            parser.error("--split-by needs an output directory (--output FORMAT:DIR, or --file DIR)")
 
     if known_args.nested_groups:
         known_args.grouped = True
@@ -203,7 +522,35 @@ def main(cli_args=None):
         handler = logging.FileHandler(known_args.logname)
         logger.addHandler(handler)
 
-    v = CallGraphVisitor(filenames, logger, root=root)
+    # Without uses edges to draw, the definitions suffice (unless needed for --function filtering).
+    analysis_level = known_args.analysis_level
+    if analysis_level is None:
+        analysis_level = "full" if known_args.draw_uses or known_args.function else "structure"
+
+    visitor_options = {
+        "logger": logger,
+        "root": root,
+        "strict": known_args.strict,
+        "analysis_level": analysis_level,
+        "profiler": profiler,
+        "parse_threads": known_args.parse_threads or os.cpu_count() or 1,
+        "max_file_bytes": known_args.max_file_bytes,
+        "max_ast_nodes": known_args.max_ast_nodes,
+        "file_time_limit": known_args.file_time_limit,
+        "low_memory": known_args.low_memory,
+        "max_memory": int(known_args.max_memory * 2**20) if known_args.max_memory is not None else None,
+    }
+    if known_args.resolve_external:
+        visitor_options["external_summaries"] = PackageSummaries(cache_dir=known_args.summary_cache, logger=logger)
+    with profiler.phase("analysis"):
+        if merge:
+            v = merge_shards([read_shard(filename) for filename in filenames], **visitor_options)
+        elif known_args.demand_driven and (known_args.function or known_args.namespace):
+            v = demand_driven_visitor(
+                filenames, function=known_args.function, namespace=known_args.namespace, **visitor_options
+            )
+        else:
+            v = CallGraphVisitor(filenames, **visitor_options)
 
     if known_args.function or known_args.namespace:
 
@@ -215,29 +562,91 @@ def main(cli_args=None):
         else:
             node = None
 
-        v.filter(node=node, namespace=known_args.namespace)
-
-    graph = VisualGraph.from_visitor(v, options=graph_options, logger=logger)
-
-    writer = None
-
-    if known_args.dot:
-        writer = DotWriter(graph, options=["rankdir=" + known_args.rankdir], output=known_args.filename, logger=logger)
-
-    if known_args.html:
-        writer = HTMLWriter(graph, options=["rankdir=" + known_args.rankdir], output=known_args.filename, logger=logger)
-
-    if known_args.svg:
-        writer = SVGWriter(graph, options=["rankdir=" + known_args.rankdir], output=known_args.filename, logger=logger)
-
-    if known_args.tgf:
-        writer = TgfWriter(graph, output=known_args.filename, logger=logger)
-
-    if known_args.yed:
-        writer = YedWriter(graph, output=known_args.filename, logger=logger)
-
-    if writer:
-        writer.run()
+        with profiler.phase("filter"):
+            v.filter(node=node, namespace=known_args.namespace)
+
+    removed_edges = {}
+    if known_args.simplify:
+        with profiler.phase("simplify"):
+            removed_edges = simplify(
+                v,
+                known_args.simplify,
+                max_depth=known_args.simplify_depth,
+                max_lines=known_args.leaf_max_lines,
+                logger=logger,
+            )
+
+    with profiler.phase("visgraph"):
+        collapse_to = known_args.collapse_to
+        if collapse_to == "auto":
+            collapse_to = choose_collapse_level(
+                v, known_args.max_nodes, known_args.max_edges, options=graph_options, logger=logger
+            )
+            logger.info("Collapsing to %s level", collapse_to or "no")
+        if known_args.split_by:
+            shards = split_graph(v, known_args.split_by, options=graph_options, logger=logger)
+        else:
+            graph = VisualGraph.from_visitor(
+                v, options=graph_options, logger=logger, streaming=True, collapse_to=collapse_to
+            )
+
+    # The legacy format flags select a single output (if several are given, the last one in this order wins).
+    outputs = []
+    for format in ("yed", "tgf", "svg", "html", "interactive", "dot"):
+        if getattr(known_args, format):
+            outputs.append((format, known_args.filename))
+            break
+    outputs.extend(known_args.outputs or [])
+
+    if outputs:
+        with profiler.phase("writer"):
+            if known_args.layout_engine == BUILTIN_ENGINE:
+                renderer = BuiltinRenderer(logger=logger)
+            else:
+                renderer = GraphvizRenderer(
+                    engine=known_args.layout_engine,
+                    timeout=known_args.dot_timeout,
+                    max_processes=known_args.dot_processes,
+                    cache_dir=known_args.render_cache,
+                )
+            if known_args.split_by:
+                write_shards(
+                    shards,
+                    outputs,
+                    options=graph_options,
+                    dot_options=["rankdir=" + known_args.rankdir],
+                    logger=logger,
+                    renderer=renderer,
+                    highlight_depth=known_args.highlight_depth,
+                )
+            else:
+                write_outputs(
+                    graph,
+                    outputs,
+                    dot_options=["rankdir=" + known_args.rankdir],
+                    logger=logger,
+                    profiler=profiler,
+                    renderer=renderer,
+                    highlight_depth=known_args.highlight_depth,
+                )
+
+    if isinstance(profiler, Profiler):
+        profiler.stop()
+        profiler.set_count("files", len(filenames))
+        profiler.set_count("nodes", sum(1 for nodes in v.nodes.values() for n in nodes if n.defined))
+        profiler.set_count("defines edges", sum(len(edges) for edges in v.defines_edges.values()))
+        profiler.set_count("uses edges", sum(len(edges) for edges in v.uses_edges.values()))
+        for name, count in removed_edges.items():
+            profiler.set_count("edges removed by %s" % name, count)
+        if known_args.split_by:
+            profiler.set_count("graph shards", len(shards))
+        else:
+            profiler.set_count("graph nodes", graph.count_nodes())
+            profiler.set_count("graph edges", graph.count_edges())
+        if known_args.profile:
+            print(profiler.report(top=known_args.profile_top), file=sys.stderr)
+        if known_args.profile_json:
+            profiler.write_json(known_args.profile_json, top=known_args.profile_top)
 
 
 if __name__ == "__main__":
@@ -55,6 +55,34 @@ class Flavor(Enum):
         return self.value
 
 
+class SourceLocation:
+    """Stand-in for an AST node that keeps only its position in the source file.
+
+    Used in place of the AST node of a Node in the low-memory mode of the
+    analyzer, so that the ASTs of analyzed files can be freed.
+    """
+
+    __slots__ = ("lineno", "col_offset", "end_lineno")
+
+    def __init__(self, lineno, col_offset=0, end_lineno=None):
+        self.lineno = lineno
+        self.col_offset = col_offset
+        self.end_lineno = end_lineno  # for the size of a definition (see pyan.simplify)
+
+    @classmethod
+    def from_ast_node(cls, ast_node):
+        """Return the location of ast_node, or None if it has none (e.g. an ast.Module)."""
+        if ast_node is None or isinstance(ast_node, cls):
+            return ast_node
+        lineno = getattr(ast_node, "lineno", None)
+        if lineno is None:
+            return None
+        return cls(lineno, getattr(ast_node, "col_offset", 0), getattr(ast_node, "end_lineno", None))
+
+    def __repr__(self):
+        return "<SourceLocation %d:%d>" % (self.lineno, self.col_offset)
+
+
 class Node:
     """A node is an object in the call graph.
 
@@ -74,6 +102,7 @@ class Node:
     This identifies the syntax object the node represents, and as a bonus,
     provides the line number at which the syntax object appears in the
     analyzed code. The filename, however, must be given manually.
+    (In low-memory mode, the analyzer stores a SourceLocation instead.)
 
     Nodes can also represent namespaces. These namespace nodes do not have an
     associated AST node. For a namespace node, the "namespace" argument is the
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Phase profiler for Pyan runs."""
+
+from contextlib import contextmanager
+import json
+import time
+import tracemalloc
+
+# tracemalloc.reset_peak() is new in Python 3.9.
+_HAS_RESET_PEAK = hasattr(tracemalloc, "reset_peak")
+
+
+def _traced_peak():
+    """Return the peak traced memory since the last reset_peak().
+
+    Without reset_peak(), the peak cannot be scoped to a phase, so fall back to
+    a snapshot of the memory currently traced (a lower bound of the peak)."""
+    current, peak = tracemalloc.get_traced_memory()
+    return peak if _HAS_RESET_PEAK else current
+
+
+class Profiler:
+    """Collect wall time, CPU time and peak traced memory per phase of a run.
+
+    Phases may nest; each phase is identified by its path of names from the
+    outermost phase, e.g. ("pass 1", "parse"). Times are inclusive of any
+    nested phases. Entering a phase with the same path again (e.g. "parse"
+    for each file) accumulates into the same entry.
+
+    Per-file durations and arbitrary counts (e.g. number of nodes) can also
+    be recorded, for the report.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.phases = {}  # path: {"wall": float, "cpu": float, "peak": int, "calls": int}
+        self.file_times = {}  # filename: wall time
+        self.counts = {}  # name: value
+        self._stack = []  # [path, running peak] for each active phase
+        self._started_tracing = False
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager that profiles the enclosed code as the named phase."""
+        parent = self._stack[-1] if self._stack else None
+        path = (parent[0] if parent else ()) + (name,)
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            # Fold the parent's peak so far into its running peak, then measure ours from here.
+            if parent:
+                parent[1] = max(parent[1], _traced_peak())
+            if _HAS_RESET_PEAK:
+                tracemalloc.reset_peak()
+        # Register the phase on entry, so that the report lists phases before their nested phases.
+        stats = self.phases.setdefault(path, {"wall": 0.0, "cpu": 0.0, "peak": 0, "calls": 0})
+        entry = [path, 0]
+        self._stack.append(entry)
+        wall0 = time.perf_counter()
+        cpu0 = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall0
+            cpu = time.process_time() - cpu0
+            self._stack.pop()
+            peak = max(entry[1], _traced_peak()) if tracing else 0
+            if parent:
+                parent[1] = max(parent[1], peak)
+            stats["wall"] += wall
+            stats["cpu"] += cpu
+            stats["peak"] = max(stats["peak"], peak)
+            stats["calls"] += 1
+
+    def record_file(self, filename, seconds):
+        """Add seconds to the time spent on filename."""
+        self.file_times[filename] = self.file_times.get(filename, 0.0) + seconds
+
+    def set_count(self, name, value):
+        self.counts[name] = value
+
+    def slowest_files(self, n=10):
+        """Return the n slowest files as a list of (filename, seconds)."""
+        return sorted(self.file_times.items(), key=lambda item: item[1], reverse=True)[:n]
+
+    def report(self, top=10):
+        """Return a human-readable report as a string."""
+        rows = [("  " * (len(path) - 1) + path[-1], stats) for path, stats in self.phases.items()]
+        width = max([len("phase")] + [len(label) for label, _ in rows])
+        lines = ["%-*s %10s %10s %12s %8s" % (width, "phase", "wall [s]", "cpu [s]", "peak [MiB]", "calls")]
+        for label, stats in rows:
+            peak = "%12.1f" % (stats["peak"] / 2**20) if self.trace_memory else "%12s" % "-"
+            lines.append(
+                "%-*s %10.3f %10.3f %s %8d" % (width, label, stats["wall"], stats["cpu"], peak, stats["calls"])
+            )
+        if self.file_times:
+            lines.append("")
+            lines.append("slowest files:")
+            for filename, seconds in self.slowest_files(top):
+                lines.append("%10.3f  %s" % (seconds, filename))
+        if self.counts:
+            lines.append("")
+            for name, value in self.counts.items():
+                lines.append("%s: %s" % (name, value))
+        return "\n".join(lines)
+
+    def to_dict(self, top=10):
+        """Return the results as a JSON-serializable dict."""
+        return {
+            "phases": [dict(path=list(path), **stats) for path, stats in self.phases.items()],
+            "slowest_files": [{"filename": fn, "wall": seconds} for fn, seconds in self.slowest_files(top)],
+            "counts": dict(self.counts),
+        }
+
+    def write_json(self, filename, top=10):
+        with open(filename, "wt", encoding="utf-8") as f:
+            json.dump(self.to_dict(top), f, indent=1)
+
+
+class NullProfiler:
+    """Profiler that does nothing. Used when profiling is not enabled."""
+
+    class _NullPhase:  # contextlib.nullcontext() is not available on Python 3.6
+        def __enter__(self):
+            return None
+
+        def __exit__(self, *exc_info):
+            return False
+
+    _null = _NullPhase()
+
+    def phase(self, name):
+        return self._null
+
+    def record_file(self, filename, seconds):
+        pass
+
+    def set_count(self, name, value):
+        pass
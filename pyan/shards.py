@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Sharded analysis: analyze parts of a project separately, and merge the results into one call graph.
+
+A shard covers a subset of the files of a project. Extracting a shard runs
+the per-file part of the analysis (pass 1) over its files, and records the
+result as a JSON document:
+
+  - files: for each file, its module name and SHA-256 hash (which tell
+    whether the shard is still up to date and can be reused)
+  - nodes: the definitions, with their flavors and source locations, and
+    the imported items, attributes and wildcards the files refer to
+  - defines, uses: the edges between the nodes, as pairs of node indices
+    (uses edges to undefined nodes and wildcards are the references left
+    unresolved within the shard)
+  - bases: for each class, the full names of its base classes
+  - calls: calls to nodes not yet known to be classes, which create an
+    instance (i.e. use the __init__ method) if they turn out to be classes
+  - super_attributes: the attributes looked up in super() of a class
+
+Shards are self-contained: merging needs only the shard files, not the
+source tree. The merge combines the nodes and edges of the shards, and
+runs only the cross-file resolution: base classes and MROs, inherited
+attributes, calls to classes, imports and wildcard expansion (see
+CallGraphVisitor.postprocess()).
+
+The merged graph approximates the one from a CallGraphVisitor over all
+files. References that only the second analysis pass resolves, because
+they follow a value through an assignment or a call (e.g. a method of an
+instance of a class defined further down, or of the return value of a
+function), remain wildcards, which the postprocessing expands to all
+definitions of the name.
+"""
+
+from argparse import ArgumentParser
+from glob import glob
+import ast
+import hashlib
+import json
+import logging
+import os
+
+from .analyzer import CallGraphVisitor
+from .anutils import (
+    UnresolvedSuperCallError,
+    get_ast_node_name,
+    get_module_name,
+    resolve_method_resolution_order,
+    tail,
+)
+from .node import Flavor, Node, SourceLocation
+
+SHARD_VERSION = 2
+
+
+class ShardError(Exception):
+    """For signaling an invalid or conflicting shard."""
+
+    pass
+
+
+class ShardVisitor(CallGraphVisitor):
+    """CallGraphVisitor that runs only the per-file part of the analysis (pass 1) over the files of a shard."""
+
+    def __init__(self, filenames, **kwargs):
+        self.calls = []  # (from Node, called Node) for calls to Nodes not (yet) known to be classes
+        self.name_lookups = []  # (from Node, name, shadowing scopes, value) for names bound later in pass 1
+        self.called_names = set()  # indices of name_lookups of called names
+        self.super_attributes = []  # (from Node, class Node, attr name) for super().attr
+        super().__init__(filenames, **kwargs)
+
+    def process(self):
+        self.pass_number = 1
+        with self.phase("pass 1"):
+            self.process_files(self.filenames, 0, len(self.filenames))
+        self.pass_number = None
+        self.report_budget_violations()
+        with self.phase("resolve_forward_references"):
+            self.resolve_forward_references()
+
+    def record_unresolved(self, *lookup):
+        super().record_unresolved(*lookup)
+        if self.pass_number != 1:
+            return
+        if lookup[0] == "name":
+            self.name_lookups.append((self.get_node_of_current_namespace(),) + lookup[1:])
+        elif lookup[0] == "call":
+            self.calls.append((self.get_node_of_current_namespace(), lookup[1]))
+
+    def visit_Call(self, node):
+        lookups = len(self.name_lookups)
+        super().visit_Call(node)
+        # A name bound later in the file may turn out to be a class (see resolve_forward_references()).
+        if isinstance(node.func, ast.Name):
+            for k in range(lookups, len(self.name_lookups)):
+                if self.name_lookups[k][1] == node.func.id:
+                    self.called_names.add(k)
+
+    def get_attribute(self, ast_node):
+        try:
+            return super().get_attribute(ast_node)
+        except UnresolvedSuperCallError:
+            # super() needs the MRO, which is known only after the merge
+            value = ast_node.value
+            if (
+                isinstance(value, ast.Call)
+                and isinstance(value.func, ast.Name)
+                and value.func.id == "super"
+                and self.get_current_class() is not None
+            ):
+                self.super_attributes.append(
+                    (self.get_node_of_current_namespace(), self.get_current_class(), ast_node.attr)
+                )
+            raise
+
+    def resolve_forward_references(self):
+        """Add the uses edges of the names that were bound only after their use in pass 1,
+        and of the calls to classes defined only after the call.
+
+        The bindings are local to a file, so they are final once the shard has
+        been visited. add_uses_edge() removes the wildcards they replace."""
+        for k, (from_node, name, scopes, value) in enumerate(self.name_lookups):
+            for sc in reversed(scopes):  # innermost first, as in get_value()
+                new_value = sc.defs.get(name)
+                if new_value is not None:
+                    if isinstance(new_value, Node) and new_value is not value and new_value.namespace is not None:
+                        self.add_uses_edge(from_node, new_value)
+                        if k in self.called_names:
+                            self.calls.append((from_node, new_value))
+                    break
+        for from_node, called_node in self.calls:
+            if called_node in self.class_base_ast_nodes:
+                self.add_uses_edge(from_node, self.get_node(called_node.get_name(), "__init__", flavor=Flavor.METHOD))
+
+    def get_base_names(self, class_node):
+        """Return the full names of the base classes of class_node, as bound in the scope enclosing it."""
+        names = []
+        scope = self.scopes.get(class_node.namespace)
+        for ast_node in self.class_base_ast_nodes.get(class_node, []):
+            name = get_ast_node_name(ast_node)
+            if scope is None or not isinstance(name, str) or not name:
+                continue
+            head, _, rest = name.partition(".")
+            value = scope.defs.get(head)
+            if isinstance(value, Node) and value.namespace is not None:
+                name = value.get_name() + ("." + rest if rest else "")
+            names.append(name)
+        return names
+
+    def to_shard(self, files):
+        """Return the analysis results as a shard (a JSON-serializable dict) of the given file entries."""
+        nodes = sorted(
+            (n for items in self.nodes.values() for n in items),
+            key=lambda n: (n.namespace is None, n.namespace or "", str(n.name)),
+        )
+        index = {n: k for k, n in enumerate(nodes)}
+
+        def node_entry(n):
+            location = SourceLocation.from_ast_node(n.ast_node)
+            if location is None:
+                return [n.namespace, n.name, n.flavor.value, n.filename, n.defined]
+            return [
+                n.namespace,
+                n.name,
+                n.flavor.value,
+                n.filename,
+                n.defined,
+                location.lineno,
+                location.col_offset,
+                location.end_lineno,
+            ]
+
+        def edge_entries(edges):
+            return sorted([index[n], index[n2]] for n, targets in edges.items() for n2 in targets)
+
+        return {
+            "version": SHARD_VERSION,
+            "files": files,
+            "nodes": [node_entry(n) for n in nodes],
+            "defines": edge_entries(self.defines_edges),
+            "uses": edge_entries(self.uses_edges),
+            "bases": sorted([index[n], self.get_base_names(n)] for n in self.class_base_ast_nodes),
+            "calls": sorted({(index[n], index[n2]) for n, n2 in self.calls if n2 not in self.class_base_ast_nodes}),
+            "super_attributes": sorted({(index[n], index[n2], name) for n, n2, name in self.super_attributes}),
+        }
+
+
+def extract_shard(filenames, root: str = None, logger=None):
+    """Analyze the given files (one shard of a project), and return the shard as a JSON-serializable dict."""
+    logger = logger or logging.getLogger(__name__)
+    files = []
+    for filename in filenames:
+        with open(filename, "rb") as f:
+            content = f.read()
+        files.append(
+            {
+                "filename": filename,
+                "module": get_module_name(filename, root=root),
+                "sha256": hashlib.sha256(content).hexdigest(),
+            }
+        )
+    v = ShardVisitor(filenames, root=root, logger=logger)
+    shard = v.to_shard(files)
+    logger.info("Extracted %d node(s) from %d file(s) in the shard", len(shard["nodes"]), len(files))
+    return shard
+
+
+def write_shard(shard, filename):
+    with open(filename, "wt", encoding="utf-8") as f:
+        json.dump(shard, f, indent=1)
+
+
+def read_shard(filename):
+    """Load a shard written by write_shard()."""
+    with open(filename, "rt", encoding="utf-8") as f:
+        shard = json.load(f)
+    if not isinstance(shard, dict) or shard.get("version") != SHARD_VERSION:
+        raise ShardError("'%s' is not a version %d Pyan shard" % (filename, SHARD_VERSION))
+    return shard
+
+
+def is_shard_current(shard):
+    """Return whether the files of the shard are unchanged on disk (so the shard can be reused)."""
+    for entry in shard["files"]:
+        try:
+            with open(entry["filename"], "rb") as f:
+                content = f.read()
+        except OSError:
+            return False
+        if hashlib.sha256(content).hexdigest() != entry["sha256"]:
+            return False
+    return True
+
+
+class ShardedCallGraphVisitor(CallGraphVisitor):
+    """CallGraphVisitor that merges the analysis results stored in shards, instead of analyzing files."""
+
+    def __init__(self, shards, **kwargs):
+        self.shards = shards
+        self.shard_files = {}  # filename: file entry of a shard
+        for shard in shards:
+            for entry in shard["files"]:
+                filename = entry["filename"]
+                previous = self.shard_files.get(filename)
+                if previous is not None and previous["sha256"] != entry["sha256"]:
+                    raise ShardError("Conflicting versions of '%s' in the given shards" % filename)
+                self.shard_files[filename] = entry
+        self.base_names = {}  # class Node: full names of its base classes
+        self.calls = []  # (from Node, called Node), see ShardVisitor
+        self.super_attributes = []  # (from Node, class Node, attr name), see ShardVisitor
+        super().__init__(list(self.shard_files), **kwargs)
+
+    def get_module_name(self, filename, root=None):
+        return self.shard_files[filename]["module"]
+
+    def process(self):
+        """Merge the shards, and run the cross-file resolution and the postprocessing on the result."""
+        with self.phase("merge"):
+            for shard in self.shards:
+                self.merge_shard(shard)
+        if self.analysis_level == "structure":
+            return
+        with self.phase("resolve_base_classes"):
+            self.resolve_base_classes()
+        with self.phase("resolve_references"):
+            self.resolve_references()
+        self.postprocess()
+
+    def merge_shard(self, shard):
+        """Add the nodes and edges of a shard to the graph.
+
+        Nodes of different shards with the same namespace and name are the same
+        Node; the definition site (if any) determines its filename and location."""
+        nodes = []
+        for namespace, name, flavor, filename, defined, *location in shard["nodes"]:
+            created = self.counters["nodes_created"]
+            n = self.get_node(namespace, name, None, flavor=Flavor(flavor))
+            if self.counters["nodes_created"] > created:  # new Node
+                n.defined = defined
+                n.filename = filename
+                n.ast_node = SourceLocation(*location) if location else None
+            elif defined and namespace is not None:
+                if not n.defined or n.ast_node is None:
+                    n.filename = filename
+                    n.ast_node = SourceLocation(*location) if location else None
+                n.defined = True
+            nodes.append(n)
+        for k, k2 in shard["defines"]:
+            self.add_defines_edge(nodes[k], nodes[k2])
+        if self.analysis_level == "structure":
+            return
+        for k, k2 in shard["uses"]:
+            self.add_uses_edge(nodes[k], nodes[k2])
+        for k, names in shard["bases"]:
+            self.base_names[nodes[k]] = names
+        self.calls.extend((nodes[k], nodes[k2]) for k, k2 in shard["calls"])
+        self.super_attributes.extend((nodes[k], nodes[k2], name) for k, k2, name in shard["super_attributes"])
+
+    def find_node(self, full_name):
+        """Return the defined Node with the given full name, or None."""
+        name = full_name.rsplit(".", 1)[-1]
+        for n in self.nodes.get(full_name, []) + self.nodes.get(name, []):
+            if n.defined and n.namespace is not None and n.get_name() == full_name:
+                return n
+        return None
+
+    def resolve_base_classes(self):
+        """Resolve the base classes of all classes from their full names to Nodes, and compute the MROs."""
+        for class_node, names in self.base_names.items():
+            bases = (self.find_node(name) for name in names)
+            self.class_base_nodes[class_node] = [n for n in bases if n is not None]
+        self.mro = resolve_method_resolution_order(self.class_base_nodes, self.logger)
+        self.inherited_attributes = {}
+
+    def resolve_references(self):
+        """Resolve the references that cross shards, and were left unresolved by their extraction.
+
+        Imported items that are modules become module Nodes, calls to classes
+        use their __init__ method, super().attr is looked up in the MRO, and
+        attributes of classes that are not defined in the class itself are
+        looked up in its ancestors."""
+        mapping = {}
+        for nodes in self.nodes.values():
+            for n in nodes:
+                if n.flavor == Flavor.IMPORTEDITEM and n.get_name() in self.module_to_filename:
+                    mapping[n] = self.get_node("", n.get_name(), None, flavor=Flavor.MODULE)
+        self.remap_nodes(mapping)
+        for n in mapping:  # list the module Nodes under their full names only, as the analyzer does
+            self.nodes[n.name] = [n2 for n2 in self.nodes[n.name] if n2.name == n.name]
+
+        for from_node, called_node in self.calls:
+            called_node = mapping.get(called_node, called_node)
+            if called_node in self.class_base_nodes:
+                self.add_uses_edge(from_node, self.get_node(called_node.get_name(), "__init__", flavor=Flavor.METHOD))
+
+        for from_node, class_node, attr_name in self.super_attributes:
+            mro = self.mro.get(class_node, [])
+            for base_node in self.mro.get(mro[1], mro[1:]) if len(mro) > 1 else ():
+                value_node = self.find_node(base_node.get_name() + "." + attr_name)
+                if value_node is not None:
+                    self.add_uses_edge(from_node, value_node)
+                    break
+
+        classes = {class_node.get_name(): class_node for class_node in self.mro}
+        mapping = {}
+        for nodes in self.nodes.values():
+            for n in nodes:
+                if n.defined or n.namespace not in classes:
+                    continue
+                for base_node in tail(self.mro[classes[n.namespace]]):
+                    value_node = self.find_node(base_node.get_name() + "." + n.name)
+                    if value_node is not None:
+                        mapping[n] = value_node
+                        break
+        self.remap_nodes(mapping)
+
+    def get_external_base_names(self, class_node, project_packages):
+        return [
+            name
+            for ancestor in self.mro[class_node]
+            for name in self.base_names.get(ancestor, [])
+            if name.split(".", 1)[0] not in project_packages
+        ]
+
+
+def merge_shards(shards, **kwargs):
+    """Merge the analysis results of the given shards. Return the resulting CallGraphVisitor.
+
+    kwargs are passed to CallGraphVisitor.
+    """
+    return ShardedCallGraphVisitor(shards, **kwargs)
+
+
+def extract_main(cli_args=None):
+    """Command line entry point for `pyan3 extract`."""
+    parser = ArgumentParser(
+        usage="%(prog)s extract FILENAME... --shard SHARD",
+        description="Analyze one shard of a project, to be merged with the other shards by `pyan3 merge`.",
+    )
+    parser.add_argument("--shard", dest="shard", required=True, help="write shard to SHARD", metavar="SHARD")
+    parser.add_argument(
+        "--reuse",
+        action="store_true",
+        default=False,
+        dest="reuse",
+        help="keep an existing SHARD if none of its files has changed",
+    )
+    parser.add_argument("--root", default=None, dest="root", help="Package root directory. Is inferred by default.")
+    parser.add_argument("-v", "--verbose", action="store_true", default=False, dest="verbose", help="verbose output")
+    known_args, unknown_args = parser.parse_known_args(cli_args)
+
+    filenames = [os.path.abspath(fn2) for fn in unknown_args for fn2 in glob(fn, recursive=True)]
+    if len(unknown_args) == 0:
+        parser.error("Need one or more filenames to process")
+    elif len(filenames) == 0:
+        parser.error("No files found matching given glob: %s" % " ".join(unknown_args))
+    root = os.path.abspath(known_args.root) if known_args.root is not None else None
+
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO if known_args.verbose else logging.WARN)
+    logger.addHandler(logging.StreamHandler())
+
+    if known_args.reuse and os.path.exists(known_args.shard):
+        try:
+            shard = read_shard(known_args.shard)
+        except ShardError:
+            shard = None  # written by another version of Pyan; extract again
+        if (
+            shard is not None
+            and sorted(entry["filename"] for entry in shard["files"]) == sorted(filenames)
+            and is_shard_current(shard)
+        ):
+            logger.info("Shard '%s' is up to date", known_args.shard)
+            return
+
+    write_shard(extract_shard(filenames, root=root, logger=logger), known_args.shard)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Graph simplification passes, applied to an analyzed (and filtered) visitor before building the VisualGraph.
+
+Call graphs have many edges that add no information to the picture, but make
+the GraphViz layout much slower. Each pass removes some of them from the
+edges of the visitor, and returns the number of edges it removed:
+
+  - "defines": transitive reduction of the defines edges (an edge from a
+    namespace to a definition nested deeper in it is implied by the chain of
+    defines edges, and by the grouping)
+  - "uses": approximate transitive reduction of the uses edges: an edge is
+    removed if its target is also reachable through at most max_depth other
+    edges. Edges within cycles (e.g. mutual recursion) are kept; the reduction
+    is done on the DAG of the strongly connected components.
+  - "leaves": removal of the uses edges to trivially small leaf helpers:
+    functions and methods of at most max_lines lines that use nothing else in
+    the graph
+
+Only edges between defined nodes are considered, as only those are drawn.
+"""
+
+import logging
+
+from .node import Flavor
+
+SIMPLIFY_PASSES = ("defines", "uses", "leaves")
+
+FUNCTION_FLAVORS = (Flavor.FUNCTION, Flavor.METHOD, Flavor.STATICMETHOD, Flavor.CLASSMETHOD)
+
+
+def get_defined_edges(edges):
+    """Return the edges (a dict Node: set of Nodes) between defined Nodes, as a new dict."""
+    return {n: {n2 for n2 in targets if n2.defined} for n, targets in edges.items() if n.defined}
+
+
+def remove_edges(edges, removed):
+    """Remove the given (source, target) pairs from edges (a dict Node: set of Nodes). Return their number."""
+    for n, n2 in removed:
+        edges[n].discard(n2)
+    return len(removed)
+
+
+def strongly_connected_components(successors):
+    """Return a dict node: component number, for the graph given by successors (a dict node: set of nodes).
+
+    Tarjan's algorithm, without recursion (call graphs can be deep).
+    """
+    index = {}
+    lowlink = {}
+    component = {}
+    stack = []
+    on_stack = set()
+    counter = 0
+    for root in successors:
+        if root in index:
+            continue
+        work = [(root, iter(successors.get(root, ())))]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(successors.get(child, ()))))
+                    break
+                if child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    while True:  # node is the root of a component
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component[member] = index[node]
+                        if member == node:
+                            break
+    return component
+
+
+def find_redundant_edges(successors, max_depth=None):
+    """Return the (source, target) pairs of the edges implied by other paths, at most max_depth edges long.
+
+    successors is a dict node: set of nodes. With max_depth None, the paths may
+    have any length, which gives the exact transitive reduction. Edges within
+    strongly connected components are never redundant.
+    """
+    component = strongly_connected_components(successors)
+    condensed = {}  # component: set of successor components
+    for n, targets in successors.items():
+        for n2 in targets:
+            if component[n] != component[n2]:
+                condensed.setdefault(component[n], set()).add(component[n2])
+
+    indirect = {}  # component: components reachable by a path of two or more edges (up to max_depth)
+
+    def reachable_indirectly(c):
+        if c not in indirect:
+            result = set()
+            frontier = condensed.get(c, set())
+            depth = 1
+            while frontier and (max_depth is None or depth < max_depth):
+                frontier = {c3 for c2 in frontier for c3 in condensed.get(c2, ())} - result
+                result |= frontier
+                depth += 1
+            indirect[c] = result
+        return indirect[c]
+
+    return [
+        (n, n2)
+        for n, targets in successors.items()
+        for n2 in targets
+        if component[n] != component[n2] and component[n2] in reachable_indirectly(component[n])
+    ]
+
+
+def reduce_defines_edges(visitor):
+    """Remove the defines edges implied by chains of other defines edges. Return the number removed."""
+    return remove_edges(visitor.defines_edges, find_redundant_edges(get_defined_edges(visitor.defines_edges)))
+
+
+def reduce_uses_edges(visitor, max_depth=3):
+    """Remove the uses edges whose target is also reachable via at most max_depth other edges.
+
+    Return the number of edges removed.
+    """
+    return remove_edges(
+        visitor.uses_edges, find_redundant_edges(get_defined_edges(visitor.uses_edges), max_depth=max_depth)
+    )
+
+
+def get_size(node):
+    """Return the number of source lines of a node's definition, or None if not known."""
+    lineno = getattr(node.ast_node, "lineno", None)
+    end_lineno = getattr(node.ast_node, "end_lineno", None)
+    if lineno is None or end_lineno is None:
+        return None
+    return end_lineno - lineno + 1
+
+
+def prune_leaf_helpers(visitor, max_lines=3):
+    """Remove the uses edges to functions of at most max_lines lines that use no other defined node.
+
+    Return the number of edges removed.
+    """
+    uses_edges = get_defined_edges(visitor.uses_edges)
+    leaves = set()
+    for name in visitor.nodes:
+        for node in visitor.nodes[name]:
+            if not node.defined or node.flavor not in FUNCTION_FLAVORS or uses_edges.get(node):
+                continue
+            size = get_size(node)
+            if size is not None and size <= max_lines:
+                leaves.add(node)
+    return remove_edges(
+        visitor.uses_edges, [(n, n2) for n, targets in uses_edges.items() for n2 in targets if n2 in leaves]
+    )
+
+
+def simplify(visitor, passes, max_depth=3, max_lines=3, logger=None):
+    """Apply the given simplification passes (names in SIMPLIFY_PASSES) to the visitor, in the order given.
+
+    Return a dict pass name: number of edges removed.
+    """
+    logger = logger or logging.getLogger(__name__)
+    removed = {}
+    for name in passes:
+        if name == "defines":
+            removed[name] = reduce_defines_edges(visitor)
+        elif name == "uses":
+            removed[name] = reduce_uses_edges(visitor, max_depth=max_depth)
+        elif name == "leaves":
+            removed[name] = prune_leaf_helpers(visitor, max_lines=max_lines)
+        else:
+            raise ValueError("Unknown simplification pass '%s'; expected one of %s" % (name, SIMPLIFY_PASSES))
+        logger.info("Simplification pass '%s' removed %d edges", name, removed[name])
+    return removed
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Split the call graph into one graph per package or module.
+
+Each shard has the defined nodes of one package or module, the edges between
+them, and the edges to and from other shards. The other endpoints of those
+are drawn as stub nodes (gray, with their full name), which link to the shard
+they belong to. The shards are written (and rendered) in parallel, with an
+index page linking them.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+
+from jinja2 import Template
+
+from .visgraph import NodeAggregation, VisualGraph, iter_sorted_edges
+from .writers import GraphvizRenderer, write_outputs
+
+SPLIT_LEVELS = ("package", "module")
+
+STUB_FILL_COLOR = "#d3d3d3b2"
+
+# File name extensions of the shards, by output format (by default, the format itself)
+SHARD_EXTENSIONS = {"interactive": "interactive.html"}
+
+# Output formats that stub nodes preferably link to, best first (else, the first format written)
+LINK_FORMATS = ("html", "svg", "interactive")
+
+INDEX_TEMPLATE = """\
+<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{{ title }}</title>
+</head>
+<body>
+<h1>{{ title }}</h1>
+<table>
+<tr><th>graph</th><th>nodes</th><th>linked nodes</th><th colspan="{{ formats | length }}">files</th></tr>
+{% for shard in shards %}
+<tr>
+<td>{{ shard.name }}</td><td>{{ shard.members | length }}</td><td>{{ shard.boundary | length }}</td>
+{% for format in formats %}<td><a href="{{ shard.filename(format) }}">{{ format }}</a></td>{% endfor %}
+</tr>
+{% endfor %}
+</table>
+</body>
+</html>
+"""
+
+
+class GraphShard:
+    """One part of a split call graph: the nodes of a package or module, and their edges.
+
+    It has the parts of a CallGraphVisitor that VisualGraph.from_visitor reads
+    (nodes, defines_edges and uses_edges), so that it can be drawn with the
+    same options as the whole graph.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.members = []  # the Nodes of this shard
+        self.boundary = {}  # the Nodes of other shards, linked to by edges: name of their shard
+        self.defines_edges = {}
+        self.uses_edges = {}
+
+    @property
+    def nodes(self):
+        nodes = {}
+        for node in self.members + list(self.boundary):
+            nodes.setdefault(node.name, []).append(node)
+        return nodes
+
+    def add_edge(self, edges, n, n2):
+        edges.setdefault(n, set()).add(n2)
+
+    def filename(self, format):
+        return shard_filename(self.name, format)
+
+    def to_visual_graph(self, options=None, logger=None, link_format="svg", link_directory=os.curdir):
+        """Return the VisualGraph of this shard; its stub nodes link to the file of their shard in link_format.
+
+        link_directory is the directory of those files, relative to the file of this graph."""
+        graph = VisualGraph.from_visitor(self, options=options, logger=logger)
+        link_prefix = "" if link_directory == os.curdir else link_directory.replace(os.sep, "/") + "/"
+        stubs = {node.get_label(): (node, shard_name) for node, shard_name in self.boundary.items()}
+
+        def mark_stubs(subgraph):
+            for visual_node in subgraph.nodes:
+                if visual_node.id in stubs:
+                    node, shard_name = stubs[visual_node.id]
+                    visual_node.label = node.get_name()
+                    visual_node.fill_color = STUB_FILL_COLOR
+                    visual_node.text_color = "#000000"
+                    visual_node.url = link_prefix + shard_filename(shard_name, link_format)
+            for child in subgraph.subgraphs:
+                mark_stubs(child)
+
+        mark_stubs(graph)
+        return graph
+
+
+def shard_filename(name, format):
+    """Return the file name of the shard of the given name in the given output format."""
+    return "%s.%s" % (name, SHARD_EXTENSIONS.get(format, format))
+
+
+def choose_link_format(formats):
+    """Return the format, among those written, of the files that stub nodes link to."""
+    for format in LINK_FORMATS:
+        if format in formats:
+            return format
+    return formats[0]
+
+
+def split_graph(visitor, level, options=None, logger=None):
+    """Split the graph of an analyzed visitor by package or module (see SPLIT_LEVELS).
+
+    options are the graph options, as for VisualGraph.from_visitor; they
+    determine which edges link the shards. Return the GraphShards, sorted by name.
+    """
+    if level not in SPLIT_LEVELS:
+        raise ValueError("Unknown split level '%s'; expected one of %s" % (level, SPLIT_LEVELS))
+    options = options or {}
+    aggregation = NodeAggregation(visitor, level, logger=logger)  # without options: no edges, just the partition
+    shards = {name: GraphShard(name) for name in aggregation.members}
+    for name, members in aggregation.members.items():
+        shards[name].members = members
+
+    def add_edges(edges, attribute):
+        for n, n2 in iter_sorted_edges(edges):
+            shard, shard2 = shards[aggregation.keys[n]], shards[aggregation.keys[n2]]
+            shard.add_edge(getattr(shard, attribute), n, n2)
+            if shard is not shard2:
+                shard.boundary[n2] = shard2.name
+                shard2.boundary[n] = shard.name
+                shard2.add_edge(getattr(shard2, attribute), n, n2)
+
+    if options.get("draw_defines", False) or options.get("grouped_alt", False):
+        add_edges(visitor.defines_edges, "defines_edges")
+    if options.get("draw_uses", False):
+        add_edges(visitor.uses_edges, "uses_edges")
+    return [shards[name] for name in sorted(shards)]
+
+
+def write_shards(
+    shards,
+    outputs,
+    options=None,
+    dot_options=None,
+    logger=None,
+    hooks=None,
+    renderer=None,
+    max_workers=None,
+    highlight_depth=None,
+):
+    """Write each GraphShard in each of the outputs, and an index page into each output directory.
+
+    outputs is a list of (format, directory) pairs; each shard goes to
+    "<directory>/<shard name>.<format>" ("<shard name>.interactive.html" for
+    the interactive format). Stub nodes link to the shard files of the first
+    of html, svg and interactive that is written, else of the first format
+    (see choose_link_format()), by URLs relative to the directory of the file
+    that contains them. The shards are written concurrently by
+    max_workers threads (by default, one per CPU); the number of concurrent
+    GraphViz processes is limited by the renderer (see GraphvizRenderer).
+    highlight_depth is as for HTMLWriter.
+    """
+    logger = logger or logging.getLogger(__name__)
+    renderer = renderer or GraphvizRenderer()
+    formats = [format for format, _ in outputs]
+    link_format = choose_link_format(formats)
+    link_directory = next(directory for format, directory in outputs if format == link_format)
+    directories = list(dict.fromkeys(directory for _, directory in outputs))  # in order, without duplicates
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+
+    def write_shard(shard):
+        # The URLs of the stubs depend on the directory, so the graph is made once per directory.
+        for directory in directories:
+            graph = shard.to_visual_graph(
+                options=options,
+                logger=logger,
+                link_format=link_format,
+                link_directory=os.path.relpath(link_directory, directory),
+            )
+            shard_outputs = [
+                (format, os.path.join(d, shard.filename(format))) for format, d in outputs if d == directory
+            ]
+            write_outputs(
+                graph,
+                shard_outputs,
+                dot_options=dot_options,
+                logger=logger,
+                hooks=hooks,
+                max_workers=1,
+                renderer=renderer,
+                highlight_depth=highlight_depth,
+            )
+        logger.info("Wrote shard %s", shard.name)
+
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as executor:
+        for future in [executor.submit(write_shard, shard) for shard in shards]:
+            future.result()  # re-raise any exception
+
+    template = Template(INDEX_TEMPLATE)
+    for directory in sorted(directories):
+        directory_formats = [format for format, d in outputs if d == directory]
+        with open(os.path.join(directory, "index.html"), "w") as f:
+            f.write(template.render(title="Call graph", shards=shards, formats=directory_formats))
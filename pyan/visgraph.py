@@ -3,8 +3,30 @@
 """Format-agnostic representation of the output graph."""
 
 import colorsys
+import itertools
 import logging
-import re
+import math
+
+from .node import Flavor, make_safe_label
+
+# Aggregation levels for VisualGraph.from_visitor(collapse_to=...), coarsest first.
+COLLAPSE_LEVELS = ("package", "module", "class")
+
+
+def node_sort_key(node):
+    return (node.namespace, node.name, node.flavor.value)
+
+
+def iter_sorted_edges(edges):
+    """Generate the pairs (source, target) of defined Nodes in edges (a dict Node: set of Nodes), sorted.
+
+    The edges are stored in sets of Nodes, which hash by identity; sorting makes
+    the output the same for identical runs (so that it can be cached, e.g. by
+    GraphvizRenderer).
+    """
+    for n in sorted((n for n in edges if n.defined), key=node_sort_key):
+        for n2 in sorted((n2 for n2 in edges[n] if n2.defined), key=node_sort_key):
+            yield n, n2
 
 
 class Colorizer:
@@ -21,6 +43,7 @@ class Colorizer:
 
     def __init__(self, num_colors, colored=True, logger=None):
         self.logger = logger or logging.getLogger(__name__)
+        self.info_enabled = self.logger.isEnabledFor(logging.INFO)  # called for every node; avoid formatting
         self.colored = colored
 
         self._hues = [j / num_colors for j in range(num_colors)]
@@ -37,7 +60,8 @@ class Colorizer:
 
     def _node_to_idx(self, node):
         ns = node.filename
-        self.logger.info("Coloring %s from file '%s'" % (node.get_short_name(), ns))
+        if self.info_enabled:
+            self.logger.info("Coloring %s from file '%s'", node.get_short_name(), ns)
         if ns not in self._idx_of:
             self._idx_of[ns] = self._next_idx()
         return self._idx_of[ns]
@@ -77,13 +101,15 @@ class VisualNode(object):
     A node in the output graph: colors, internal ID, human-readable label, ...
     """
 
-    def __init__(self, id, label="", flavor="", fill_color="", text_color="", group=""):
+    def __init__(self, id, label="", flavor="", fill_color="", text_color="", group="", url="", name=""):
         self.id = id  # graphing software friendly label (no special chars)
         self.label = label  # human-friendly label
         self.flavor = flavor
         self.fill_color = fill_color
         self.text_color = text_color
         self.group = group
+        self.url = url  # link target, e.g. for nodes that stand for another graph (see pyan.split)
+        self.name = name  # full dotted name of the represented object, for writers that nest by namespace
 
     def __repr__(self):
         optionals = [repr(s) for s in [self.label, self.flavor, self.fill_color, self.text_color, self.group] if s]
@@ -93,18 +119,31 @@ class VisualNode(object):
             return "VisualNode(" + repr(self.id) + ")"
 
 
+MAX_EDGE_THICKNESS = 8.0
+
+
 class VisualEdge(object):
     """
     An edge in the output graph.
 
     flavor is meant to be 'uses' or 'defines'
+
+    weight, if given, is the number of edges merged into this one (see
+    NodeAggregation); writers show it as the thickness and label of the edge.
     """
 
-    def __init__(self, source, target, flavor, color):
+    def __init__(self, source, target, flavor, color, weight=None):
         self.source = source
         self.target = target
         self.flavor = flavor
         self.color = color
+        self.weight = weight
+
+    def get_thickness(self):
+        """Return the line width for drawing the edge: 1 for single edges, growing logarithmically with the weight."""
+        if self.weight is None:
+            return 1.0
+        return min(1.0 + math.log2(self.weight), MAX_EDGE_THICKNESS)
 
     def __repr__(self):
         return "Edge(" + self.source.label + " " + self.flavor + " " + self.target.label + ")"
@@ -119,15 +158,92 @@ class VisualGraph(object):
         self.subgraphs = subgraphs or []
         self.grouped = grouped
 
+    def count_nodes(self):
+        """Return the number of nodes in this graph, including those in subgraphs."""
+        return len(self.nodes) + sum(subgraph.count_nodes() for subgraph in self.subgraphs)
+
+    def count_edges(self):
+        return len(self.edges)
+
     @classmethod
-    def from_visitor(cls, visitor, options=None, logger=None):
+    def from_visitor(cls, visitor, options=None, logger=None, streaming=False, collapse_to=None):
+        """Build the output graph from an analyzed visitor.
+
+        With streaming=True, return a StreamingVisualGraph, which generates its
+        nodes and edges on demand while a writer walks it, instead of holding
+        them all in memory.
+
+        collapse_to, if given, is one of COLLAPSE_LEVELS: the nodes are then
+        aggregated to that level, see NodeAggregation. The aggregated graph is
+        small, so it is always built in memory.
+        """
+        if collapse_to is not None:
+            return NodeAggregation(visitor, collapse_to, options=options, logger=logger).to_visual_graph(cls)
+
+        graph = StreamingVisualGraph(visitor, options=options, logger=logger)
+        if streaming:
+            return graph
+
+        visual_nodes = {}  # Node: VisualNode, so that the edges refer to the same VisualNodes
+
+        def materialize(subgraph, root=False):
+            nodes = []
+            for node in subgraph.iter_graph_nodes():
+                visual_nodes[node] = graph.make_visual_node(node)
+                nodes.append(visual_nodes[node])
+            subgraphs = [materialize(child) for child in subgraph.subgraphs]
+            if root:
+                return cls(subgraph.id, subgraph.label, nodes=nodes, subgraphs=subgraphs, grouped=subgraph.grouped)
+            return cls(subgraph.id, subgraph.label, nodes=nodes, subgraphs=subgraphs)
+
+        root_graph = materialize(graph, root=True)
+        root_graph.edges = list(graph.iter_edges(visual_nodes))
+        return root_graph
+
+
+class StreamingSubgraph(object):
+    """A subgraph of a StreamingVisualGraph: the nodes of one namespace, generated on demand."""
+
+    def __init__(self, graph, id, label, start, end):
+        self.graph = graph
+        self.id = id
+        self.label = label
+        self.start = start  # the nodes of the subgraph are graph.visited_nodes[start:end]
+        self.end = end
+        self.subgraphs = []
+        self.edges = []
+
+    def iter_graph_nodes(self):
+        return itertools.islice(self.graph.visited_nodes, self.start, self.end)
+
+    @property
+    def nodes(self):
+        return (self.graph.make_visual_node(node) for node in self.iter_graph_nodes())
+
+
+class StreamingVisualGraph(object):
+    """A VisualGraph that generates its VisualNodes and VisualEdges on demand.
+
+    It can be walked by the writers just like a VisualGraph: the nodes come
+    grouped by subgraph in namespace order, then the edges. Only the sorted
+    list of defined (analyzer) nodes and the tree of subgraphs are kept; each
+    VisualNode and VisualEdge is created when the writer reaches it, so the
+    memory used does not grow with the number of edges.
+    """
+
+    def __init__(self, visitor, options=None, logger=None):
+        options = options or {}
         colored = options.get("colored", False)
         nested = options.get("nested_groups", False)
-        grouped_alt = options.get("grouped_alt", False)
-        grouped = nested or options.get("grouped", False)  # nested -> grouped
+        self.grouped_alt = options.get("grouped_alt", False)
+        self.grouped = nested or options.get("grouped", False)  # nested -> grouped
         annotated = options.get("annotated", False)
-        draw_defines = options.get("draw_defines", False)
-        draw_uses = options.get("draw_uses", False)
+        self.draw_defines = options.get("draw_defines", False)
+        self.draw_uses = options.get("draw_uses", False)
+        self.id = "G"
+        self.label = ""
+        self.visitor = visitor
+        self.logger = logger or logging.getLogger(__name__)
 
         # Terminology:
         #  - what Node calls "label" is a computer-friendly unique identifier
@@ -137,7 +253,7 @@ class VisualGraph(object):
         # The annotation determines the human-readable name.
         #
         if annotated:
-            if grouped:
+            if self.grouped:
                 # group label includes namespace already
                 def labeler(n):
                     return n.get_annotated_name()
@@ -152,79 +268,85 @@ class VisualGraph(object):
             def labeler(n):
                 return n.get_short_name()
 
-        logger = logger or logging.getLogger(__name__)
+        self.labeler = labeler
 
         # collect and sort defined nodes
-        visited_nodes = []
-        for name in visitor.nodes:
-            for node in visitor.nodes[name]:
-                if node.defined:
-                    visited_nodes.append(node)
-        visited_nodes.sort(key=lambda x: (x.namespace, x.name))
-
-        def find_filenames():
-            filenames = set()
-            for node in visited_nodes:
-                filenames.add(node.filename)
-            return filenames
-
-        colorizer = Colorizer(num_colors=len(find_filenames()) + 1, colored=colored, logger=logger)
-
-        nodes_dict = dict()
-        root_graph = cls("G", label="", grouped=grouped)
-        subgraph = root_graph
-        namespace_stack = []
-        prev_namespace = ""  # The namespace '' is first in visited_nodes.
-        for node in visited_nodes:
-            logger.info("Looking at %s" % node.name)
-
-            # Create the node itself and add it to nodes_dict
-            idx, fill_RGBA, text_RGB = colorizer.make_colors(node)
-            visual_node = VisualNode(
-                id=node.get_label(),
-                label=labeler(node),
-                flavor=repr(node.flavor),
-                fill_color=fill_RGBA,
-                text_color=text_RGB,
-                group=idx,
-            )
-            nodes_dict[node] = visual_node
-
-            # next namespace?
-            if grouped and node.namespace != prev_namespace:
-                if not prev_namespace:
-                    logger.info("New namespace %s" % (node.namespace))
-                else:
-                    logger.info("New namespace %s, old was %s" % (node.namespace, prev_namespace))
-                prev_namespace = node.namespace
-
-                label = node.get_namespace_label()
-                subgraph = cls(label, node.namespace)
-
+        self.visited_nodes = [node for name in visitor.nodes for node in visitor.nodes[name] if node.defined]
+        self.visited_nodes.sort(key=node_sort_key)
+
+        # Colors are assigned by filename, in the order of the sorted nodes.
+        filenames = {node.filename for node in self.visited_nodes}
+        self.colorizer = Colorizer(num_colors=len(filenames) + 1, colored=colored, logger=self.logger)
+        for node in self.visited_nodes:
+            self.colorizer.get(node)
+
+        self.subgraphs = []
+        self.start = 0
+        self.end = len(self.visited_nodes)
+        if self.grouped:
+            self.build_subgraphs(nested)
+
+    def build_subgraphs(self, nested):
+        """Create a subgraph for each namespace, in the order of the sorted nodes.
+
+        With nested groups, the subgraphs form a trie of the namespaces: the
+        parent of a subgraph is the subgraph of the nearest enclosing namespace
+        (by dotted name components) that has one, else the root graph. The
+        namespace '' (of the modules) maps to the root graph.
+        """
+        subgraphs = {"": self}
+        self.end = 0
+        for k, node in enumerate(self.visited_nodes):
+            namespace = node.namespace
+            subgraph = subgraphs.get(namespace)
+            if subgraph is None:
+                self.logger.info("New namespace %s", namespace)
+                subgraph = StreamingSubgraph(self, node.get_namespace_label(), namespace, k, k)
+                parentgraph = self
                 if nested:
-                    # Pop the stack until the newly found namespace is within
-                    # one of the parent namespaces, or until the stack runs out
-                    # (i.e. this is a sibling).
-                    if len(namespace_stack):
-                        m = re.match(namespace_stack[-1].label, node.namespace)
-                        # The '.' check catches siblings in cases like
-                        # MeshGenerator vs. Mesh.
-                        while m is None or m.end() == len(node.namespace) or node.namespace[m.end()] != ".":
-                            namespace_stack.pop()
-                            if not len(namespace_stack):
-                                break
-                            m = re.match(namespace_stack[-1].label, node.namespace)
-                    parentgraph = namespace_stack[-1] if len(namespace_stack) else root_graph
-                    parentgraph.subgraphs.append(subgraph)
-
-                    namespace_stack.append(subgraph)
-                else:
-                    root_graph.subgraphs.append(subgraph)
-
-            subgraph.nodes.append(visual_node)
-
-        # Now add edges
-        if draw_defines or grouped_alt:
+                    parent_namespace = namespace
+                    while "." in parent_namespace:
+                        parent_namespace = parent_namespace.rsplit(".", 1)[0]
+                        if parent_namespace in subgraphs:
+                            parentgraph = subgraphs[parent_namespace]
+                            break
+                parentgraph.subgraphs.append(subgraph)
+                subgraphs[namespace] = subgraph
+            subgraph.end = k + 1  # the nodes of a namespace are contiguous in sort order
+
+    def iter_graph_nodes(self):
+        return itertools.islice(self.visited_nodes, self.start, self.end)
+
+    @property
+    def nodes(self):
+        return (self.make_visual_node(node) for node in self.iter_graph_nodes())
+
+    @property
+    def edges(self):
+        return self.iter_edges()
+
+    def count_nodes(self):
+        return len(self.visited_nodes)
+
+    def count_edges(self):
+        return sum(1 for _ in self.iter_edge_nodes())
+
+    def make_visual_node(self, node):
+        idx, fill_RGBA, text_RGB = self.colorizer.make_colors(node)
+        return VisualNode(
+            id=node.get_label(),
+            label=self.labeler(node),
+            flavor=repr(node.flavor),
+            fill_color=fill_RGBA,
+            text_color=text_RGB,
+            group=idx,
+            name=node.get_name(),
+        )
+
+    def iter_edge_nodes(self):
+        """Generate (source Node, target Node, flavor, color) for each edge of the graph."""
+        visitor = self.visitor
+        if self.draw_defines or self.grouped_alt:
             # If grouped, use gray lines so they won't visually obstruct
             # the "uses" lines.
             #
@@ -233,19 +355,163 @@ class VisualGraph(object):
             # place closer together those nodes that are linked by a
             # defines relationship.
             #
-            color = "#838b8b" if draw_defines else "#ffffff00"
-            for n in visitor.defines_edges:
-                if n.defined:
-                    for n2 in visitor.defines_edges[n]:
-                        if n2.defined:
-                            root_graph.edges.append(VisualEdge(nodes_dict[n], nodes_dict[n2], "defines", color))
+            color = "#838b8b" if self.draw_defines else "#ffffff00"
+            for n, n2 in iter_sorted_edges(visitor.defines_edges):
+                yield n, n2, "defines", color
 
-        if draw_uses:
+        if self.draw_uses:
             color = "#000000"
-            for n in visitor.uses_edges:
-                if n.defined:
-                    for n2 in visitor.uses_edges[n]:
-                        if n2.defined:
-                            root_graph.edges.append(VisualEdge(nodes_dict[n], nodes_dict[n2], "uses", color))
+            for n, n2 in iter_sorted_edges(visitor.uses_edges):
+                yield n, n2, "uses", color
+
+    def iter_edges(self, visual_nodes=None):
+        """Generate the VisualEdges of the graph.
+
+        visual_nodes, if given, maps the Nodes to the VisualNodes to use as
+        edge endpoints. Otherwise, the endpoints are minimal VisualNodes
+        (with the id and label only), created for each edge.
+        """
+        for n, n2, flavor, color in self.iter_edge_nodes():
+            if visual_nodes is not None:
+                source, target = visual_nodes[n], visual_nodes[n2]
+            else:
+                source = VisualNode(id=n.get_label(), label=self.labeler(n))
+                target = VisualNode(id=n2.get_label(), label=self.labeler(n2))
+            yield VisualEdge(source, target, flavor, color)
 
-        return root_graph
+
+def find_prefix(name, names, shortest=False):
+    """Return the longest (or shortest) dotted prefix of name (including name itself) that is in names, or None."""
+    parts = name.split(".")
+    lengths = range(1, len(parts) + 1) if shortest else range(len(parts), 0, -1)
+    for i in lengths:
+        prefix = ".".join(parts[:i])
+        if prefix in names:
+            return prefix
+    return None
+
+
+class NodeAggregation(object):
+    """The defined nodes of an analysis, aggregated by namespace prefix.
+
+    level is one of COLLAPSE_LEVELS:
+
+      - "package": each package (with its subpackages' modules merged into the
+        innermost package); a module outside any package is its own aggregate
+      - "module": each module, with everything defined in it
+      - "class": each top-level class, with its methods and nested classes; the
+        other definitions of a module are merged into the module
+
+    The edges between the members of two aggregates are merged into one edge
+    (per flavor), weighted by their number. Edges within an aggregate are dropped.
+    """
+
+    def __init__(self, visitor, level, options=None, logger=None):
+        if level not in COLLAPSE_LEVELS:
+            raise ValueError("Unknown collapse level '%s'; expected one of %s" % (level, COLLAPSE_LEVELS))
+        options = options or {}
+        self.level = level
+        self.logger = logger or logging.getLogger(__name__)
+        self.colored = options.get("colored", False)
+        draw_defines = options.get("draw_defines", False)
+        draw_uses = options.get("draw_uses", False)
+
+        nodes = sorted(
+            (node for name in visitor.nodes for node in visitor.nodes[name] if node.defined), key=node_sort_key
+        )
+        modules = {node.get_name(): node for node in nodes if node.flavor == Flavor.MODULE}
+        packages = {name for name, node in modules.items() if node.filename.endswith("__init__.py")}
+        classes = {node.get_name() for node in nodes if node.flavor == Flavor.CLASS}
+
+        def aggregate_of(node):
+            name = node.get_name()
+            if level == "class":
+                key = find_prefix(name, classes, shortest=True)
+                if key is not None:
+                    return key
+            key = find_prefix(name, modules)
+            if key is None:  # not in an analyzed module
+                return name
+            if level == "package":
+                return find_prefix(key, packages) or key
+            return key
+
+        self.keys = {}  # Node: aggregate name
+        self.members = {}  # aggregate name: [Nodes], in sort order
+        for node in nodes:
+            key = aggregate_of(node)
+            self.keys[node] = key
+            self.members.setdefault(key, []).append(node)
+
+        self.weights = {}  # (source aggregate, target aggregate, flavor): number of edges
+        if draw_defines:
+            self.add_edges(visitor.defines_edges, "defines")
+        if draw_uses:
+            self.add_edges(visitor.uses_edges, "uses")
+
+    def add_edges(self, edges, flavor):
+        for n, n2 in iter_sorted_edges(edges):
+            key, key2 = self.keys[n], self.keys[n2]
+            if key != key2:
+                self.weights[(key, key2, flavor)] = self.weights.get((key, key2, flavor), 0) + 1
+
+    def count_nodes(self):
+        return len(self.members)
+
+    def count_edges(self):
+        return len(self.weights)
+
+    def get_representative(self, key):
+        """Return the Node that stands for an aggregate: the one named like it, else its first member."""
+        for node in self.members[key]:
+            if node.get_name() == key:
+                return node
+        return self.members[key][0]
+
+    def to_visual_graph(self, cls=None):
+        """Return the aggregated graph as a VisualGraph (or an instance of the given subclass)."""
+        cls = cls or VisualGraph
+        representatives = {key: self.get_representative(key) for key in sorted(self.members)}
+        filenames = {node.filename for node in representatives.values()}
+        colorizer = Colorizer(num_colors=len(filenames) + 1, colored=self.colored, logger=self.logger)
+
+        visual_nodes = {}
+        for key, node in representatives.items():
+            idx, fill_RGBA, text_RGB = colorizer.make_colors(node)
+            visual_nodes[key] = VisualNode(
+                id=make_safe_label(key),
+                label="%s (%d)" % (key, len(self.members[key])),
+                flavor=repr(node.flavor),
+                fill_color=fill_RGBA,
+                text_color=text_RGB,
+                group=idx,
+                name=key,
+            )
+
+        colors = {"defines": "#838b8b", "uses": "#000000"}
+        edges = [
+            VisualEdge(visual_nodes[key], visual_nodes[key2], flavor, colors[flavor], weight=weight)
+            for (key, key2, flavor), weight in sorted(self.weights.items())
+        ]
+        self.logger.info(
+            "Collapsed to %s level: %d nodes, %d edges", self.level, self.count_nodes(), self.count_edges()
+        )
+        return cls("G", "", nodes=list(visual_nodes.values()), edges=edges)
+
+
+def choose_collapse_level(visitor, max_nodes, max_edges, options=None, logger=None):
+    """Return the finest aggregation level whose graph has at most max_nodes nodes and max_edges edges.
+
+    Returns None if the graph fits without aggregation, and the coarsest level,
+    "package", if no level fits. The options are the graph options (as for
+    VisualGraph.from_visitor), which determine the edges drawn.
+    """
+    logger = logger or logging.getLogger(__name__)
+    graph = StreamingVisualGraph(visitor, options=options, logger=logger)
+    if graph.count_nodes() <= max_nodes and graph.count_edges() <= max_edges:
+        return None
+    for level in reversed(COLLAPSE_LEVELS[1:]):
+        aggregation = NodeAggregation(visitor, level, options=options, logger=logger)
+        if aggregation.count_nodes() <= max_nodes and aggregation.count_edges() <= max_edges:
+            return level
+    return COLLAPSE_LEVELS[0]
@@ -3,25 +3,96 @@
 
 """Graph markup writers."""
 
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import hashlib
 import io
+import json
 import logging
 import os
+import shutil
 import subprocess
 import sys
+import tempfile
+import threading
 
 from jinja2 import Template
 
+from .hooks import AnalysisHooks, instrumented_phase
+from .profiling import NullProfiler
+
+
+def render_html(svg, index=None, highlight_depth=None):
+    """Return an interactive HTML page showing the given SVG call graph.
+
+    index, if given, is the adjacency index of the graph (see adjacency_index()),
+    which makes highlighting the nodes linked to a clicked node fast. The
+    highlighting follows at most highlight_depth edges (by default, any number).
+    """
+    with open(os.path.join(os.path.dirname(__file__), "callgraph.html"), "r") as f:
+        template = Template(f.read())
+    return template.render(svg=svg, index=to_script_json(index), highlight_depth=to_script_json(highlight_depth))
+
+
+def to_script_json(value):
+    """Encode value as JSON that can be embedded in an HTML script element."""
+    return json.dumps(value, separators=(",", ":")).replace("</", "<\\/")
+
+
+def adjacency_index(graph):
+    """Return the adjacency index of the graph, for the HTML page: {"nodes": node ids, "edges": [s0, t0, s1, t1, ...]}.
+
+    The edges are given by the positions of their source and target in nodes,
+    in the order of graph.edges.
+    """
+    positions = {}
+
+    def add_nodes(subgraph):
+        for node in subgraph.nodes:
+            positions.setdefault(node.id, len(positions))
+        for child in subgraph.subgraphs:
+            add_nodes(child)
+
+    add_nodes(graph)
+    edges = []
+    for edge in graph.edges:
+        edges.extend((positions[edge.source.id], positions[edge.target.id]))
+    return {"nodes": list(positions), "edges": edges}
+
+
+# Writers emit their output line by line, as they walk the graph (which may be a
+# pyan.visgraph.StreamingVisualGraph); output files get a large buffer to match.
+OUTPUT_BUFFER_SIZE = 2**16
+
+
+def write_text(output, text):
+    """Write text to output: a stream, a filename, or None for stdout."""
+    if output:
+        if isinstance(output, io.StringIO):
+            output.write(text)
+        else:
+            with open(output, "w") as f:
+                f.write(text)
+    else:
+        print(text)
+
 
 class Writer(object):
-    def __init__(self, graph, output=None, logger=None, tabstop=4):
+    def __init__(self, graph, output=None, logger=None, tabstop=4, profiler=None, hooks=None):
         self.graph = graph
         self.output = output
         self.logger = logger or logging.getLogger(__name__)
+        self.profiler = profiler or NullProfiler()
+        self.hooks = hooks or AnalysisHooks()
         self.indent_level = 0
         self.tabstop = tabstop * " "
 
-    def log(self, msg):
-        self.logger.info(msg)
+    def log(self, msg, *args):
+        self.logger.info(msg, *args)
+
+    def phase(self, name):
+        """Context manager that reports the enclosed code as the named phase to the profiler and hooks."""
+        return instrumented_phase(name, self.profiler, self.hooks)
 
     def indent(self, level=1):
         self.indent_level += level
@@ -33,18 +104,19 @@ class Writer(object):
         self.outstream.write(self.tabstop * self.indent_level + line + "\n")
 
     def run(self):
-        self.log("%s running" % type(self))
+        self.log("%s running", type(self))
         try:
             if isinstance(self.output, io.StringIO):  # write to stream
                 self.outstream = self.output
             else:
-                self.outstream = open(self.output, "w")  # write to file
+                self.outstream = open(self.output, "w", buffering=OUTPUT_BUFFER_SIZE)  # write to file
         except TypeError:
             self.outstream = sys.stdout
-        self.start_graph()
-        self.write_subgraph(self.graph)
-        self.write_edges()
-        self.finish_graph()
+        with self.phase("write"):
+            self.start_graph()
+            self.write_subgraph(self.graph)
+            self.write_edges()
+            self.finish_graph()
         if self.output and not isinstance(self.output, io.StringIO):
             self.outstream.close()
 
@@ -88,14 +160,14 @@ class Writer(object):
 
 
 class TgfWriter(Writer):
-    def __init__(self, graph, output=None, logger=None):
-        Writer.__init__(self, graph, output=output, logger=logger)
+    def __init__(self, graph, output=None, logger=None, profiler=None, hooks=None):
+        Writer.__init__(self, graph, output=output, logger=logger, profiler=profiler, hooks=hooks)
         self.i = 1
         self.id_map = {}
 
     def write_node(self, node):
         self.write("%d %s" % (self.i, node.label))
-        self.id_map[node] = self.i
+        self.id_map[node.id] = self.i
         self.i += 1
 
     def start_edges(self):
@@ -103,12 +175,14 @@ class TgfWriter(Writer):
 
     def write_edge(self, edge):
         flavor = "U" if edge.flavor == "uses" else "D"
-        self.write("%s %s %s" % (self.id_map[edge.source], self.id_map[edge.target], flavor))
+        if edge.weight is not None:  # the label of a merged edge includes the number of edges
+            flavor += " %d" % edge.weight
+        self.write("%s %s %s" % (self.id_map[edge.source.id], self.id_map[edge.target.id], flavor))
 
 
 class DotWriter(Writer):
-    def __init__(self, graph, options=None, output=None, logger=None, tabstop=4):
-        Writer.__init__(self, graph, output=output, logger=logger, tabstop=tabstop)
+    def __init__(self, graph, options=None, output=None, logger=None, tabstop=4, profiler=None, hooks=None):
+        Writer.__init__(self, graph, output=output, logger=logger, tabstop=tabstop, profiler=profiler, hooks=hooks)
         options = options or []
         if graph.grouped:
             options += ['clusterrank="local"']
@@ -121,7 +195,7 @@ class DotWriter(Writer):
         self.indent()
 
     def start_subgraph(self, graph):
-        self.log("Start subgraph %s" % graph.label)
+        self.log("Start subgraph %s", graph.label)
         # Name must begin with "cluster" to be recognized as a cluster by GraphViz.
         self.write("subgraph cluster_%s {\n" % graph.id)
         self.indent()
@@ -131,84 +205,270 @@ class DotWriter(Writer):
         self.write('graph [style="filled,rounded", fillcolor="#80808018", label="%s"];' % graph.label)
 
     def finish_subgraph(self, graph):
-        self.log("Finish subgraph %s" % graph.label)
+        self.log("Finish subgraph %s", graph.label)
         # terminate previous subgraph
         self.dedent()
         self.write("}")
 
     def write_node(self, node):
-        self.log("Write node %s" % node.label)
+        self.log("Write node %s", node.label)
+        link = ', URL="%s"' % node.url if node.url else ""
         self.write(
             '%s [label="%s", style="filled", fillcolor="%s",'
-            ' fontcolor="%s", group="%s"];' % (node.id, node.label, node.fill_color, node.text_color, node.group)
+            ' fontcolor="%s", group="%s"%s];'
+            % (node.id, node.label, node.fill_color, node.text_color, node.group, link)
         )
 
     def write_edge(self, edge):
         source = edge.source
         target = edge.target
-        color = edge.color
+        attributes = 'color="%s"' % edge.color
+        if edge.weight is not None:  # a merged edge
+            attributes += ', penwidth="%.1f", label="%d"' % (edge.get_thickness(), edge.weight)
         if edge.flavor == "defines":
-            self.write('    %s -> %s [style="dashed",  color="%s"];' % (source.id, target.id, color))
+            self.write('    %s -> %s [style="dashed",  %s];' % (source.id, target.id, attributes))
         else:  # edge.flavor == 'uses':
-            self.write('    %s -> %s [style="solid",  color="%s"];' % (source.id, target.id, color))
+            self.write('    %s -> %s [style="solid",  %s];' % (source.id, target.id, attributes))
 
     def finish_graph(self):
         self.write("}")  # terminate "digraph G {"
 
 
+# Bump when the format of the cached renderings changes.
+RENDER_CACHE_VERSION = 1
+
+
+class GraphvizRenderer(object):
+    """Runs GraphViz to render dot source, streaming it through the process.
+
+    The dot source is written into the stdin of the process while it is being
+    generated, and the rendered output is streamed to the output file (or
+    copied to the output stream). No shell is involved.
+
+    engine is the GraphViz layout engine (e.g. "dot", "neato", "fdp", "sfdp").
+    timeout, if given, is the time limit in seconds for one rendering. At most
+    max_processes GraphViz processes run at a time, however many threads render
+    with this renderer (by default, one per CPU).
+
+    If cache_dir is given, renderings are cached there, keyed by a hash of the
+    dot source, engine and format, and reused when the same graph is rendered
+    again. The dot source is then generated in full before GraphViz is run.
+
+    The built-in layout engine (see pyan.layout.BuiltinRenderer) can be used
+    in its place; both render the graph of an SVGWriter with render_graph().
+    """
+
+    phase_name = "dot"
+
+    def __init__(self, engine="dot", timeout=None, max_processes=None, cache_dir=None):
+        self.engine = engine
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(max_processes or os.cpu_count() or 1)
+        self.cache_dir = cache_dir
+
+    def render_graph(self, writer, output=None, prefix="", suffix=""):
+        """Render the graph of writer (an SVGWriter) as SVG, between prefix and suffix, to output."""
+        self.render(writer.write_dot, output, format="svg", prefix=prefix, suffix=suffix)
+
+    def render(self, write_source, output=None, format="svg", prefix="", suffix=""):
+        """Render the dot source written by write_source(stream) in the given format.
+
+        The result, between prefix and suffix, goes to output: a filename, a
+        stream, or None for stdout. Raises RuntimeError if GraphViz cannot be
+        run, fails, or times out.
+        """
+        command = ["dot", "-K" + self.engine, "-T" + format]
+        if self.cache_dir is not None:
+            self.render_cached(command, write_source, output, format, prefix, suffix)
+            return
+        with self.slots:
+            if isinstance(output, (str, os.PathLike)):
+                with open(output, "w") as f:
+                    self.render_to(command, write_source, f, prefix, suffix)
+            else:
+                self.render_to(command, write_source, output if output else sys.stdout, prefix, suffix)
+
+    def render_cached(self, command, write_source, output, format, prefix, suffix):
+        with tempfile.SpooledTemporaryFile(max_size=2**22, mode="w+", encoding="utf-8") as source:
+            write_source(source)
+            digest = hashlib.sha256(("%d\0%s\0%s\0" % (RENDER_CACHE_VERSION, self.engine, format)).encode())
+            source.seek(0)
+            for chunk in iter(lambda: source.read(OUTPUT_BUFFER_SIZE), ""):
+                digest.update(chunk.encode("utf-8"))
+            cached = os.path.join(self.cache_dir, "%s.%s" % (digest.hexdigest(), format))
+
+            if not os.path.exists(cached):
+                os.makedirs(self.cache_dir, exist_ok=True)
+                # Render into a temporary file first, so that concurrent readers never see a partial rendering.
+                fd, partial_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+                try:
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        source.seek(0)
+                        with self.slots:
+                            self.run_process(command, partial(shutil.copyfileobj, source), f)
+                    os.replace(partial_name, cached)
+                except BaseException:
+                    os.unlink(partial_name)
+                    raise
+
+        with open(cached, "r", encoding="utf-8") as f:
+            copy_text(f, output, prefix=prefix, suffix=suffix)
+
+    def render_to(self, command, write_source, stream, prefix, suffix):
+        stream.write(prefix)
+        stream.flush()
+        self.run_process(command, write_source, stream)
+        if has_fileno(stream):  # the process wrote past our position
+            stream.seek(0, os.SEEK_END)
+        stream.write(suffix)
+
+    def run_process(self, command, write_source, output):
+        """Run command, feeding it from write_source, and write its stdout to output.
+
+        If output is a file with a file descriptor, the process writes into it directly.
+        """
+        to_file = has_fileno(output)
+        try:
+            process = subprocess.Popen(
+                command,
+                stdin=subprocess.PIPE,
+                stdout=output if to_file else subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+        except OSError as e:
+            raise RuntimeError("Cannot run GraphViz (%s): %s" % (" ".join(command), e))
+
+        # Kill the process once it runs out of time; this also unblocks the writing of its input.
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            process.kill()
+
+        timer = threading.Timer(self.timeout, kill) if self.timeout is not None else None
+
+        # Drain stdout and stderr concurrently, so that the process never blocks on a full pipe.
+        errors = []
+        readers = [threading.Thread(target=lambda: errors.append(process.stderr.read()))]
+        if not to_file:
+            readers.append(threading.Thread(target=copy_stream, args=(process.stdout, output)))
+        for thread in readers + ([timer] if timer else []):
+            thread.start()
+
+        try:
+            with io.TextIOWrapper(process.stdin, encoding="utf-8") as stdin:
+                write_source(stdin)
+        except BrokenPipeError:
+            pass  # the process exited early; reported below
+        finally:
+            process.wait()
+            if timer is not None:
+                timer.cancel()
+            for reader in readers:
+                reader.join()
+        if timed_out.is_set():
+            raise RuntimeError("GraphViz timed out after %s s" % self.timeout)
+        if process.returncode != 0:
+            message = b"".join(errors).decode(errors="replace").strip()
+            raise RuntimeError("GraphViz failed with exit code %d: %s" % (process.returncode, message))
+
+
+def has_fileno(stream):
+    """Return whether stream is a seekable file with a file descriptor (that a subprocess can write into)."""
+    try:
+        stream.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        return False
+    return stream.seekable()
+
+
+def copy_stream(binary_input, text_output, chunk_size=OUTPUT_BUFFER_SIZE):
+    """Copy a binary stream of UTF-8 text into a text stream."""
+    with io.TextIOWrapper(binary_input, encoding="utf-8") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            text_output.write(chunk)
+
+
+def html_template_parts(index=None, highlight_depth=None):
+    """Return the parts of the HTML page (see render_html()) before and after the SVG."""
+    marker = "@@PYAN_SVG@@"
+    head, tail = render_html(marker, index=index, highlight_depth=highlight_depth).split(marker)
+    return head, tail
+
+
 class SVGWriter(DotWriter):
+    """Writes the graph as SVG, rendered by GraphViz (see GraphvizRenderer) or the built-in layout engine."""
+
+    format = "svg"
+
+    def __init__(
+        self, graph, options=None, output=None, logger=None, tabstop=4, profiler=None, hooks=None, renderer=None
+    ):
+        DotWriter.__init__(
+            self, graph, options=options, output=output, logger=logger, tabstop=tabstop, profiler=profiler, hooks=hooks
+        )
+        self.renderer = renderer or GraphvizRenderer()
+
+    def write_dot(self, stream):
+        self.outstream = stream
+        with self.phase("write"):
+            self.start_graph()
+            self.write_subgraph(self.graph)
+            self.write_edges()
+            self.finish_graph()
+
     def run(self):
-        # write dot file
-        self.log("%s running" % type(self))
-        self.outstream = io.StringIO()
-        self.start_graph()
-        self.write_subgraph(self.graph)
-        self.write_edges()
-        self.finish_graph()
-
-        # convert to svg
-        svg = subprocess.run(
-            "dot -Tsvg", shell=True, stdout=subprocess.PIPE, input=self.outstream.getvalue().encode()
-        ).stdout.decode()
-
-        if self.output:
-            if isinstance(self.output, io.StringIO):
-                self.output.write(svg)
-            else:
-                with open(self.output, "w") as f:
-                    f.write(svg)
-        else:
-            print(svg)
+        self.log("%s running", type(self))
+        with self.phase(self.renderer.phase_name):
+            self.renderer.render_graph(self, self.output)
 
 
 class HTMLWriter(SVGWriter):
+    """Writes the graph as an interactive HTML page, with the SVG streamed into the page template.
+
+    Clicking a node highlights the nodes linked to it, up to highlight_depth
+    edges away (by default, any number).
+    """
+
+    def __init__(
+        self,
+        graph,
+        options=None,
+        output=None,
+        logger=None,
+        tabstop=4,
+        profiler=None,
+        hooks=None,
+        renderer=None,
+        highlight_depth=None,
+    ):
+        SVGWriter.__init__(
+            self,
+            graph,
+            options=options,
+            output=output,
+            logger=logger,
+            tabstop=tabstop,
+            profiler=profiler,
+            hooks=hooks,
+            renderer=renderer,
+        )
+        self.highlight_depth = highlight_depth
+
     def run(self):
-        with io.StringIO() as svg_stream:
-            # run SVGWriter with stream as output
-            output = self.output
-            self.output = svg_stream
-            super().run()
-            svg = svg_stream.getvalue()
-            self.output = output
-
-        # insert svg into html
-        with open(os.path.join(os.path.dirname(__file__), "callgraph.html"), "r") as f:
-            template = Template(f.read())
-
-        html = template.render(svg=svg)
-        if self.output:
-            if isinstance(self.output, io.StringIO):
-                self.output.write(html)
-            else:
-                with open(self.output, "w") as f:
-                    f.write(html)
-        else:
-            print(html)
+        self.log("%s running", type(self))
+        with self.phase("template"):
+            head, tail = html_template_parts(adjacency_index(self.graph), self.highlight_depth)
+        with self.phase(self.renderer.phase_name):
+            self.renderer.render_graph(self, self.output, prefix=head, suffix=tail)
 
 
 class YedWriter(Writer):
-    def __init__(self, graph, output=None, logger=None, tabstop=2):
-        Writer.__init__(self, graph, output=output, logger=logger, tabstop=tabstop)
+    def __init__(self, graph, output=None, logger=None, tabstop=2, profiler=None, hooks=None):
+        Writer.__init__(self, graph, output=output, logger=logger, tabstop=tabstop, profiler=profiler, hooks=hooks)
         self.grouped = graph.grouped
         self.indent_level = 0
         self.edge_id = 0
@@ -236,7 +496,7 @@ class YedWriter(Writer):
         self.indent()
 
     def start_subgraph(self, graph):
-        self.log("Start subgraph %s" % graph.label)
+        self.log("Start subgraph %s", graph.label)
 
         self.write('<node id="%s:" yfiles.foldertype="group">' % graph.id)
         self.indent()
@@ -265,14 +525,14 @@ class YedWriter(Writer):
         self.indent()
 
     def finish_subgraph(self, graph):
-        self.log("Finish subgraph %s" % graph.label)
+        self.log("Finish subgraph %s", graph.label)
         self.dedent()
         self.write("</graph>")
         self.dedent()
         self.write("</node>")
 
     def write_node(self, node):
-        self.log("Write node %s" % node.label)
+        self.log("Write node %s", node.label)
         width = 20 + 10 * len(node.label)
         self.write('<node id="%s">' % node.id)
         self.indent()
@@ -303,10 +563,12 @@ class YedWriter(Writer):
         self.write("<y:PolyLineEdge>")
         self.indent()
         if edge.flavor == "defines":
-            self.write('<y:LineStyle color="%s" type="dashed" width="1.0"/>' % edge.color)
+            self.write('<y:LineStyle color="%s" type="dashed" width="%.1f"/>' % (edge.color, edge.get_thickness()))
         else:
-            self.write('<y:LineStyle color="%s" type="line" width="1.0"/>' % edge.color)
+            self.write('<y:LineStyle color="%s" type="line" width="%.1f"/>' % (edge.color, edge.get_thickness()))
         self.write('<y:Arrows source="none" target="standard"/>')
+        if edge.weight is not None:
+            self.write("<y:EdgeLabel>%d</y:EdgeLabel>" % edge.weight)
         self.write('<y:BendStyle smoothed="true"/>')
         self.dedent()
         self.write("</y:PolyLineEdge>")
@@ -320,3 +582,212 @@ class YedWriter(Writer):
         self.write("  </graph>")
         self.dedent()
         self.write("</graphml>")
+
+
+class InteractiveHTMLWriter(Writer):
+    """Writes the graph as an HTML page that lays it out and draws it in the browser, without GraphViz.
+
+    The graph is embedded as compact JSON: a string table, and flat integer
+    arrays for the nodes, the namespaces (nested by dotted name) and the edges.
+    The page (see interactive.html) needs no other files. Namespaces are drawn
+    collapsed, and expand on click; only the visible items are laid out.
+    """
+
+    # Namespaces are expanded initially while at most this many items are shown.
+    initial_items = 200
+
+    def __init__(self, graph, output=None, logger=None, profiler=None, hooks=None):
+        Writer.__init__(self, graph, output=output, logger=logger, profiler=profiler, hooks=hooks)
+        self.strings = []
+        self.string_ids = {}
+        self.node_ids = {}  # VisualNode id: index
+        self.names = []
+        self.nodes = []  # label, name, flavor, fill color (string ids) per node; the group is added at the end
+        self.edges = []  # source, target, kind per edge
+        self.weights = []
+        self.kinds = {"uses": 0, "defines": 1}
+
+    def intern(self, string):
+        string_id = self.string_ids.get(string)
+        if string_id is None:
+            string_id = self.string_ids[string] = len(self.strings)
+            self.strings.append(string)
+        return string_id
+
+    def write_node(self, node):
+        self.node_ids[node.id] = len(self.names)
+        name = node.name or node.label
+        self.names.append(name)
+        self.nodes.append(
+            [
+                self.intern(node.label.replace("\\n", " ")),
+                self.intern(name),
+                self.intern(node.flavor),
+                self.intern(node.fill_color),
+            ]
+        )
+
+    def write_edge(self, edge):
+        self.edges.extend((self.node_ids[edge.source.id], self.node_ids[edge.target.id], self.kinds[edge.flavor]))
+        self.weights.append(edge.weight or 1)
+
+    def get_groups(self):
+        """Return the namespace groups (sorted names, parents first), their parents, and the group of each node.
+
+        A group is a namespace of a node; its parent is the nearest enclosing
+        group. A node whose name is that of a group (e.g. a class) belongs to it.
+        """
+        names = sorted({name.rpartition(".")[0] for name in self.names} - {""})
+        group_ids = {name: k for k, name in enumerate(names)}
+
+        def enclosing(name):
+            while "." in name:
+                name = name.rpartition(".")[0]
+                if name in group_ids:
+                    return group_ids[name]
+            return -1
+
+        parents = [enclosing(name) for name in names]
+        node_groups = [group_ids[name] if name in group_ids else enclosing(name) for name in self.names]
+        return names, parents, node_groups
+
+    def finish_graph(self):
+        names, parents, node_groups = self.get_groups()
+        nodes = []
+        for node, group in zip(self.nodes, node_groups):
+            nodes.extend(node)
+            nodes.append(group)
+        groups = []
+        for name, parent in zip(names, parents):
+            groups.extend((self.intern(name), parent))
+        data = {
+            "strings": self.strings,
+            "nodes": nodes,
+            "groups": groups,
+            "edges": self.edges,
+            "weights": self.weights if any(weight != 1 for weight in self.weights) else None,
+            "kinds": sorted(self.kinds, key=self.kinds.get),
+            "initial_items": self.initial_items,
+        }
+        head, tail = interactive_template_parts()
+        self.outstream.write(head)
+        self.outstream.write(to_script_json(data))
+        self.outstream.write(tail)
+
+
+def interactive_template_parts():
+    """Return the parts of the interactive HTML page (see InteractiveHTMLWriter) before and after the graph data."""
+    with open(os.path.join(os.path.dirname(__file__), "interactive.html"), "r") as f:
+        template = Template(f.read())
+    marker = "@@PYAN_DATA@@"
+    head, tail = template.render(title="Call graph", data=marker).split(marker)
+    return head, tail
+
+
+OUTPUT_FORMATS = ("dot", "svg", "html", "interactive", "tgf", "yed")
+
+
+def write_outputs(
+    graph,
+    outputs,
+    dot_options=None,
+    logger=None,
+    profiler=None,
+    hooks=None,
+    max_workers=None,
+    renderer=None,
+    highlight_depth=None,
+):
+    """Write one graph in several formats.
+
+    outputs is a list of (format, output) pairs, where format is one of
+    OUTPUT_FORMATS and output is as for Writer (a filename, a stream, or None
+    for stdout). dot_options are the graph options for the dot-based formats,
+    renderer the GraphvizRenderer (or pyan.layout.BuiltinRenderer) for svg and
+    html, and highlight_depth as for HTMLWriter.
+
+    The graph of the svg and html outputs is laid out and rendered only once.
+    The outputs are written concurrently by a thread pool of max_workers
+    threads (by default, one per output). The profiler is not thread-safe, so
+    it is used only when there is a single output.
+    """
+    dot_options = dot_options or []
+    renderer = renderer or GraphvizRenderer()
+    for format, _ in outputs:
+        if format not in OUTPUT_FORMATS:
+            raise ValueError("Unknown output format '%s'; expected one of %s" % (format, OUTPUT_FORMATS))
+
+    jobs = []  # functions of a profiler
+    for format, output in outputs:
+        if format == "dot":
+            jobs.append(partial(run_writer, DotWriter, graph, output, logger, hooks, options=list(dot_options)))
+        elif format == "tgf":
+            jobs.append(partial(run_writer, TgfWriter, graph, output, logger, hooks))
+        elif format == "yed":
+            jobs.append(partial(run_writer, YedWriter, graph, output, logger, hooks))
+        elif format == "interactive":
+            jobs.append(partial(run_writer, InteractiveHTMLWriter, graph, output, logger, hooks))
+
+    rendered = [(format, output) for format, output in outputs if format in ("svg", "html")]
+    if len(rendered) == 1:
+        format, output = rendered[0]
+        if format == "svg":
+            writer_class, kwargs = SVGWriter, {}
+        else:
+            writer_class, kwargs = HTMLWriter, {"highlight_depth": highlight_depth}
+        jobs.append(
+            partial(
+                run_writer,
+                writer_class,
+                graph,
+                output,
+                logger,
+                hooks,
+                options=list(dot_options),
+                renderer=renderer,
+                **kwargs,
+            )
+        )
+    elif rendered:
+
+        def render_once(profiler):
+            with tempfile.TemporaryFile("w+", encoding="utf-8") as svg_file:
+                writer = SVGWriter(
+                    graph, options=list(dot_options), logger=logger, profiler=profiler, hooks=hooks, renderer=renderer
+                )
+                renderer.render_graph(writer, svg_file)
+                head, tail = html_template_parts(adjacency_index(graph), highlight_depth)
+                for format, output in rendered:
+                    svg_file.seek(0)
+                    if format == "svg":
+                        copy_text(svg_file, output)
+                    else:
+                        copy_text(svg_file, output, prefix=head, suffix=tail)
+
+        jobs.append(render_once)
+
+    if len(jobs) == 1:
+        jobs[0](profiler)
+        return
+    with ThreadPoolExecutor(max_workers=max_workers or len(jobs)) as executor:
+        futures = [executor.submit(job, None) for job in jobs]
+        for future in futures:
+            future.result()  # re-raise any exception
+
+
+def run_writer(writer_class, graph, output, logger, hooks, profiler, **kwargs):
+    writer_class(graph, output=output, logger=logger, profiler=profiler, hooks=hooks, **kwargs).run()
+
+
+def copy_text(source, output, prefix="", suffix=""):
+    """Copy the text file source, between prefix and suffix, to output (a filename, a stream, or None for stdout)."""
+    if output and not isinstance(output, io.StringIO):
+        with open(output, "w") as f:
+            f.write(prefix)
+            shutil.copyfileobj(source, f, OUTPUT_BUFFER_SIZE)
+            f.write(suffix)
+    else:
+        stream = output if output else sys.stdout
+        stream.write(prefix)
+        shutil.copyfileobj(source, stream, OUTPUT_BUFFER_SIZE)
+        stream.write(suffix)
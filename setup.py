@@ -108,6 +108,7 @@ setup(
     #
     setup_requires=["wheel"],
     install_requires=["jinja2"],
+    extras_require={"layout": ["numpy"]},  # for the built-in layout engine
     provides=["pyan"],
     # keywords for PyPI (in case you upload your project)
     #
@@ -123,7 +124,7 @@ setup(
     #
     packages=["pyan"],
     zip_safe=True,
-    package_data={"pyan": ["callgraph.html"]},
+    package_data={"pyan": ["callgraph.html", "interactive.html"]},
     include_package_data=True,
     entry_points={
         "console_scripts": [
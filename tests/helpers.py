@@ -0,0 +1,49 @@
+"""Helpers shared by the tests."""
+
+from pyan.node import Flavor, Node
+
+
+class FakeVisitor:
+    """Just the parts of a CallGraphVisitor that VisualGraph and the simplification passes read.
+
+    names are the full names of the function Nodes to create; names without a
+    namespace are put in the module "mod". uses and defines are the edges,
+    as pairs of names.
+    """
+
+    def __init__(self, names, uses=(), defines=()):
+        self.nodes = {}
+        self.by_name = {}  # name as given: Node
+        for name in names:
+            namespace, _, short_name = name.rpartition(".")
+            node = Node(namespace or "mod", short_name, None, "mod.py", Flavor.FUNCTION)
+            node.defined = True
+            self.nodes.setdefault(short_name, []).append(node)
+            self.by_name[name] = node
+        self.uses_edges = self.make_edges(uses)
+        self.defines_edges = self.make_edges(defines)
+
+    def make_edges(self, pairs):
+        edges = {}
+        for source, target in pairs:
+            edges.setdefault(self.by_name[source], set()).add(self.by_name[target])
+        return edges
+
+    def pairs(self, edges):
+        return {(n.name, n2.name) for n, targets in edges.items() for n2 in targets}
+
+
+def edges(visitor):
+    """Return the edges between defined Nodes of a visitor, as (kind, source name, target name)."""
+    return {
+        (kind, n.get_name(), n2.get_name())
+        for kind, edge_dict in (("defines", visitor.defines_edges), ("uses", visitor.uses_edges))
+        for n, targets in edge_dict.items()
+        for n2 in targets
+        if n.defined and n2.defined
+    }
+
+
+def uses(visitor):
+    """Return the uses edges between defined Nodes of a visitor, as (source name, target name)."""
+    return {(source, target) for kind, source, target in edges(visitor) if kind == "uses"}
@@ -0,0 +1,80 @@
+import asyncio
+from glob import glob
+import logging
+import os
+import shutil
+
+import pytest
+
+from pyan import create_callgraph
+from pyan.aio import AnalysisCancelled, AsyncHooks, analyze_async
+from pyan.analyzer import CallGraphVisitor
+
+FILENAMES = os.path.join(os.path.dirname(__file__), "test_code/**/*.py")
+
+
+def test_analyze_async_reports_progress():
+    events = []
+
+    async def run():
+        session = await analyze_async(FILENAMES, logger=logging.getLogger(), on_event=events.append)
+        await asyncio.sleep(0)  # deliver the last events
+        return await session.render_async("dot")
+
+    dot = asyncio.run(run())
+    assert sorted(dot.splitlines()) == sorted(create_callgraph(FILENAMES).splitlines())
+    kinds = {event.kind for event in events}
+    assert kinds == {"file_start", "file_done", "phase", "progress"}
+    progress = [event for event in events if event.kind == "progress"]
+    assert progress[-1].done == progress[-1].total
+    assert "write" in [event.name for event in events if event.kind == "phase"]
+
+
+def test_analyze_async_cancellation():
+    files_done = []
+
+    async def run():
+        def on_event(event):
+            if event.kind == "file_done":
+                files_done.append(event.name)
+                task.cancel()
+
+        task = asyncio.ensure_future(analyze_async(FILENAMES, logger=logging.getLogger(), on_event=on_event))
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert files_done
+
+
+def test_render_async_cancellation_is_per_render():
+    async def run():
+        session = await analyze_async(FILENAMES, logger=logging.getLogger())
+        cancelled = asyncio.ensure_future(session.render_async("dot"))
+        other = asyncio.ensure_future(session.render_async("tgf"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        assert not session.hooks.cancelled.is_set()
+        return await other, await session.render_async("dot")
+
+    tgf, dot = asyncio.run(run())
+    assert "#" in tgf.splitlines()
+    assert sorted(dot.splitlines()) == sorted(create_callgraph(FILENAMES).splitlines())
+
+
+def test_cancelled_hooks_stop_analysis():
+    hooks = AsyncHooks(loop=None)
+    hooks.cancelled.set()
+    with pytest.raises(AnalysisCancelled):
+        CallGraphVisitor(glob(FILENAMES, recursive=True), logger=logging.getLogger(), hooks=hooks)
+
+
+@pytest.mark.skipif(shutil.which("dot") is None, reason="requires GraphViz")
+def test_render_async_svg():
+    async def run():
+        session = await analyze_async(FILENAMES, logger=logging.getLogger())
+        return await session.render_async("svg")
+
+    assert "<svg" in asyncio.run(run())
@@ -5,6 +5,10 @@ import os
 import pytest
 
 from pyan.analyzer import CallGraphVisitor
+from pyan.anutils import resolve_method_resolution_order
+from pyan.hooks import AnalysisHooks
+from pyan.node import Flavor, Node, SourceLocation
+from pyan.profiling import Profiler
 
 
 @pytest.fixture
@@ -62,3 +66,233 @@ def test_resolve_package_with_known_root():
     dirname_base = os.path.basename(dirname)
     defines = get_in_dict(callgraph.defines_edges, f"{dirname_base}.test_code.subpackage2.submodule_hidden1")
     get_node(defines, f"{dirname_base}.test_code.subpackage2.submodule_hidden1.test_func1")
+
+
+def test_resolve_method_resolution_order():
+    # class O; class A(O); class B(O); class C(O); class D(O); class E(O)
+    # class K1(A, B, C); class K2(D, B, E); class K3(D, A); class Z(K1, K2, K3)
+    o, a, b, c, d, e, k1, k2, k3, z = [Node("m", name, None, "m.py", Flavor.CLASS) for name in "OABCDEKKKZ"]
+    class_base_nodes = {
+        a: [o],
+        b: [o],
+        c: [o],
+        d: [o],
+        e: [o],
+        k1: [a, b, c],
+        k2: [d, b, e],
+        k3: [d, a],
+        z: [k1, k2, k3],
+    }
+    mro = resolve_method_resolution_order(class_base_nodes, logging.getLogger())
+    assert mro[z] == [z, k1, k2, k3, d, a, b, c, e, o]
+
+
+def test_selective_second_pass_matches_strict(callgraph):
+    filenames = glob(os.path.join(os.path.dirname(__file__), "test_code/**/*.py"), recursive=True)
+    strict = CallGraphVisitor(filenames, logger=logging.getLogger(), strict=True)
+
+    def edges(edge_dict):
+        return {(n.get_name(), n2.get_name()) for n, targets in edge_dict.items() for n2 in targets}
+
+    assert edges(callgraph.uses_edges) == edges(strict.uses_edges)
+    assert edges(callgraph.defines_edges) == edges(strict.defines_edges)
+
+
+def test_selective_second_pass_skips_files(tmp_path):
+    package = tmp_path / "pkg"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    # only backward references: nothing resolves differently in pass 2
+    (package / "base.py").write_text(
+        "class Base:\n    def run(self):\n        return self.step()\n\n    def step(self):\n        pass\n"
+    )
+    # a forward reference to a function, and an inherited method
+    (package / "child.py").write_text(
+        "from pkg.base import Base\n\n\ndef main():\n    return helper()\n\n\ndef helper():\n    pass\n\n\n"
+        "class Child(Base):\n    def go(self):\n        return self.run()\n"
+    )
+    filenames = sorted(str(fn) for fn in package.iterdir())
+    v = CallGraphVisitor(filenames, logger=logging.getLogger())
+    assert v.counters["files_revisited"] == 1
+    uses = {(n.get_name(), n2.get_name()) for n, targets in v.uses_edges.items() for n2 in targets if n2.defined}
+    assert ("pkg.child.main", "pkg.child.helper") in uses
+    assert ("pkg.child.Child.go", "pkg.base.Base.run") in uses
+
+    # on a realistic corpus (pyan itself), some files are skipped, with the same result as strict mode
+    filenames = sorted(glob(os.path.join(os.path.dirname(__file__), "..", "pyan", "*.py")))
+    selective = CallGraphVisitor(filenames, logger=logging.getLogger())
+    strict = CallGraphVisitor(filenames, logger=logging.getLogger(), strict=True)
+    assert 0 < selective.counters["files_revisited"] < len(filenames)
+
+    def edges(edge_dict):
+        return {(n.get_name(), n2.get_name()) for n, targets in edge_dict.items() for n2 in targets}
+
+    assert edges(selective.uses_edges) == edges(strict.uses_edges)
+    assert edges(selective.defines_edges) == edges(strict.defines_edges)
+
+
+def test_structure_level_defines_only(callgraph):
+    filenames = glob(os.path.join(os.path.dirname(__file__), "test_code/**/*.py"), recursive=True)
+    structure = CallGraphVisitor(filenames, logger=logging.getLogger(), analysis_level="structure")
+    defines = get_in_dict(structure.defines_edges, "test_code.submodule1.B")
+    get_node(defines, "test_code.submodule1.B.to_A")
+    assert not any(structure.uses_edges.values())
+
+
+def test_trace_events(caplog):
+    filenames = glob(os.path.join(os.path.dirname(__file__), "test_code/**/*.py"), recursive=True)
+    with caplog.at_level(logging.DEBUG, logger="pyan.trace"):
+        CallGraphVisitor(filenames, logger=logging.getLogger("pyan.trace"))
+    events = [record.pyan_event for record in caplog.records if hasattr(record, "pyan_event")]
+    assert {event["kind"] for event in events} == {"visit", "defines_edge", "uses_edge", "get_value", "set_value"}
+    uses = [event for event in events if event["kind"] == "uses_edge"]
+    assert any(
+        event["source"] == "test_code.submodule2" and event["target"] == "test_code.submodule1" for event in uses
+    )
+    assert all(event["file"] in filenames and isinstance(event["line"], int) for event in uses)
+
+
+def test_profiler_records_phases():
+    filenames = glob(os.path.join(os.path.dirname(__file__), "test_code/**/*.py"), recursive=True)
+    profiler = Profiler()
+    profiler.start()
+    try:
+        CallGraphVisitor(filenames, logger=logging.getLogger(), profiler=profiler)
+    finally:
+        profiler.stop()
+    assert profiler.phases[("pass 1",)]["calls"] == 1
+    assert profiler.phases[("pass 1", "parse")]["calls"] == len(filenames)
+    assert ("contract_nonexistents",) in profiler.phases
+    assert profiler.phases[("pass 1",)]["peak"] > 0
+    assert sorted(profiler.file_times) == sorted(filenames)
+    assert "slowest files" in profiler.report(top=3)
+
+
+def test_profiler_without_reset_peak(monkeypatch):
+    # Python < 3.9 has no tracemalloc.reset_peak()
+    monkeypatch.delattr("tracemalloc.reset_peak")
+    monkeypatch.setattr("pyan.profiling._HAS_RESET_PEAK", False)
+    profiler = Profiler()
+    profiler.start()
+    try:
+        with profiler.phase("outer"):
+            with profiler.phase("inner"):
+                data = [0] * 100000
+            del data
+    finally:
+        profiler.stop()
+    assert profiler.phases[("outer", "inner")]["peak"] > 0
+    assert profiler.phases[("outer",)]["peak"] >= profiler.phases[("outer", "inner")]["peak"]
+
+
+def test_hooks_and_counters():
+    class RecordingHooks(AnalysisHooks):
+        def __init__(self):
+            self.files = []
+            self.phases = []
+            self.progress = []
+
+        def on_file_done(self, filename, duration, nodes_added, edges_added):
+            self.files.append((filename, nodes_added, edges_added))
+
+        def on_phase(self, name, duration):
+            self.phases.append(name)
+
+        def on_progress(self, done, total):
+            self.progress.append((done, total))
+
+    filenames = glob(os.path.join(os.path.dirname(__file__), "test_code/**/*.py"), recursive=True)
+    hooks = RecordingHooks()
+    v = CallGraphVisitor(filenames, logger=logging.getLogger(), hooks=hooks)
+    assert v.counters["nodes_created"] >= sum(nodes for _, nodes, _ in hooks.files) > 0
+    assert v.counters["edges_added"] >= sum(edges for _, _, edges in hooks.files)
+    assert v.counters["wildcards_created"] > 0
+    assert v.counters["import_remaps"] > 0
+    assert "expand_unknowns" in hooks.phases and "cull_inherited" in hooks.phases
+    assert hooks.progress[-1][0] == hooks.progress[-1][1] == len(hooks.files)
+
+
+def test_low_memory_mode_matches_default(callgraph):
+    filenames = glob(os.path.join(os.path.dirname(__file__), "test_code/**/*.py"), recursive=True)
+    v = CallGraphVisitor(filenames, logger=logging.getLogger(), low_memory=True)
+
+    def summary(visitor):
+        names = {n.get_long_annotated_name() for nodes in visitor.nodes.values() for n in nodes if n.defined}
+        uses = {(n.get_name(), n2.get_name()) for n, targets in visitor.uses_edges.items() for n2 in targets}
+        return names, uses
+
+    assert summary(v) == summary(callgraph)
+    assert all(
+        n.ast_node is None or isinstance(n.ast_node, SourceLocation) for nodes in v.nodes.values() for n in nodes
+    )
+
+
+def test_parse_threads_match_sequential():
+    # A realistic multi-module corpus: the sources of pyan itself.
+    pyan_dir = os.path.join(os.path.dirname(__file__), "..", "pyan")
+    filenames = sorted(glob(os.path.join(pyan_dir, "*.py")))
+
+    def result(visitor):
+        nodes = {(n.namespace, n.name, n.flavor, n.defined) for items in visitor.nodes.values() for n in items}
+        edges = {
+            (kind, n.get_name(), n2.get_name())
+            for kind, edge_dict in (("defines", visitor.defines_edges), ("uses", visitor.uses_edges))
+            for n, targets in edge_dict.items()
+            for n2 in targets
+        }
+        return nodes, edges
+
+    sequential = CallGraphVisitor(filenames, logger=logging.getLogger())
+    expected = result(sequential)
+    for _ in range(2):
+        threaded = CallGraphVisitor(filenames, logger=logging.getLogger(), parse_threads=4)
+        assert result(threaded) == expected
+        assert threaded.counters == sequential.counters
+
+
+@pytest.fixture
+def budget_package(tmp_path):
+    package = tmp_path / "budgetpkg"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "good.py").write_text("def f():\n    return g()\n\n\ndef g():\n    return 1\n")
+    (package / "broken.py").write_text("def f(:\n")
+    (package / "large.py").write_text("".join("def f%d():\n    return f%d()\n\n\n" % (k, k + 1) for k in range(50)))
+    return sorted(str(path) for path in package.glob("*.py"))
+
+
+def test_file_budgets(budget_package):
+    v = CallGraphVisitor(budget_package, logger=logging.getLogger(), max_file_bytes=1000, max_ast_nodes=10)
+    assert sorted(os.path.basename(fn) for fn in v.skipped_files) == ["broken.py", "large.py"]
+    assert [os.path.basename(fn) for fn in v.degraded_files] == ["good.py"]
+    assert v.counters["files_skipped"] == 2 and v.counters["files_degraded"] == 1
+    # structure only: definitions, but no uses
+    assert {n.name for n in get_in_dict(v.defines_edges, "budgetpkg.good")} == {"f", "g"}
+    assert "budgetpkg.good.f" not in {n.get_name() for n in v.uses_edges}
+
+
+def test_file_time_limit(budget_package):
+    v = CallGraphVisitor(budget_package, logger=logging.getLogger(), file_time_limit=0)
+    assert sorted(os.path.basename(fn) for fn in v.degraded_files) == ["good.py", "large.py"]
+    assert len(get_in_dict(v.defines_edges, "budgetpkg.large")) == 50
+
+
+def test_file_time_limit_rolls_back_partial_visit(tmp_path):
+    package = tmp_path / "slowpkg"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    # the uses at module level are visited before the time limit is first checked, in f
+    (package / "slow.py").write_text(
+        "import os\n\nx = os.getcwd()\n\n\ndef f():\n    return g()\n\n\ndef g():\n    pass\n"
+    )
+    filename = str(package / "slow.py")
+
+    v = CallGraphVisitor([filename], logger=logging.getLogger(), file_time_limit=0)
+    assert list(v.degraded_files) == [filename]
+    assert not any(targets for targets in v.uses_edges.values())
+    assert {n.name for n in get_in_dict(v.defines_edges, "slowpkg.slow")} == {"f", "g"}
+    assert {n.get_name() for nodes in v.nodes.values() for n in nodes if n.defined} == {
+        "slowpkg.slow",
+        "slowpkg.slow.f",
+        "slowpkg.slow.g",
+    }
@@ -0,0 +1,49 @@
+from glob import glob
+import logging
+import os
+
+from helpers import edges
+import pytest
+
+from pyan.analyzer import CallGraphVisitor
+from pyan.demand import demand_driven_visitor, import_closure, scan_files
+
+
+@pytest.fixture
+def filenames():
+    return sorted(glob(os.path.join(os.path.dirname(__file__), "test_code/**/*.py"), recursive=True))
+
+
+def test_import_closure(filenames):
+    modules = scan_files(filenames)
+    closure = import_closure(modules, {"test_code.submodule1"})
+    # importing a module runs the __init__ of its package, which imports subpackage1
+    assert closure == {
+        "test_code",
+        "test_code.submodule1",
+        "test_code.subpackage1",
+        "test_code.subpackage1.submodule1",
+        "test_code.submodule2",
+    }
+
+
+@pytest.mark.parametrize(
+    "function, namespace",
+    [
+        ("test_code.submodule2.test_2", None),
+        ("test_code.subpackage1.submodule1.A.__init__", None),
+        (None, "test_code.subpackage1"),
+    ],
+)
+def test_demand_driven_matches_full_analysis(filenames, function, namespace):
+    def filtered(v):
+        node = None
+        if function:
+            node = v.get_node(".".join(function.split(".")[:-1]), function.split(".")[-1])
+        return edges(v.filter(node=node, namespace=namespace))
+
+    logger = logging.getLogger()
+    full = CallGraphVisitor(filenames, logger=logger)
+    demand = demand_driven_visitor(filenames, function=function, namespace=namespace, logger=logger, max_fraction=1)
+    assert len(demand.filenames) < len(filenames)
+    assert filtered(demand) == filtered(full)
@@ -0,0 +1,106 @@
+import io
+import json
+import logging
+import os
+
+from helpers import uses
+
+from pyan.analyzer import CallGraphVisitor
+from pyan.external import PackageSummaries
+from pyan.visgraph import VisualGraph
+from pyan.writers import TgfWriter
+
+# jinja2 is a dependency of pyan, so it is always installed.
+SOURCE = """\
+import jinja2
+from jinja2 import Template
+
+
+def render(text):
+    env = jinja2.Environment()
+    env.from_string(text)
+    return Template(text).render()
+
+
+class MyEnvironment(jinja2.Environment):
+    def load(self):
+        return self.get_template("x")
+"""
+
+
+def test_resolve_external(tmp_path):
+    package = tmp_path / "proj"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "use.py").write_text(SOURCE)
+    filenames = [str(package / "__init__.py"), str(package / "use.py")]
+    cache_dir = str(tmp_path / "cache")
+
+    v = CallGraphVisitor(filenames, logger=logging.getLogger(), external_summaries=PackageSummaries(cache_dir))
+    edges = uses(v)
+    assert ("proj.use.render", "jinja2.environment.Environment") in edges
+    assert ("proj.use.render", "jinja2.environment.Environment.from_string") in edges
+    assert ("proj.use.render", "jinja2.environment.Template") in edges  # re-exported by jinja2
+    # inherited from a third-party base class
+    assert ("proj.use.MyEnvironment.load", "jinja2.environment.Environment.get_template") in edges
+
+    # the summaries are cached per distribution and version
+    (cache_filename,) = os.listdir(cache_dir)
+    assert cache_filename.startswith("Jinja2-") or cache_filename.startswith("jinja2-")
+    with open(os.path.join(cache_dir, cache_filename)) as f:
+        assert "jinja2.environment" in json.load(f)["modules"]
+
+    # without summaries, the references are dropped
+    v = CallGraphVisitor(filenames, logger=logging.getLogger())
+    assert not any(n2.startswith("jinja2") for _, n2 in uses(v))
+
+
+def test_resolve_external_shared_target(tmp_path):
+    # Two references that resolve to the same third-party definition, which is also used directly.
+    package = tmp_path / "proj"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "use.py").write_text(
+        "import jinja2\n"
+        "from jinja2 import Template\n"
+        "from jinja2.environment import Template as EnvTemplate\n"
+        "\n\n"
+        "def render(text):\n"
+        "    return Template(text), EnvTemplate(text), jinja2.Template(text)\n"
+    )
+    filenames = [str(package / "__init__.py"), str(package / "use.py")]
+    summaries = PackageSummaries(str(tmp_path / "cache"))
+    v = CallGraphVisitor(filenames, logger=logging.getLogger(), external_summaries=summaries)
+    assert ("proj.use.render", "jinja2.environment.Template") in uses(v)
+    for items in v.nodes.values():
+        assert len(items) == len(set(items))
+    graph = VisualGraph.from_visitor(v, options={"draw_uses": True, "draw_defines": True})
+    stream = io.StringIO()
+    TgfWriter(graph, output=stream).run()
+    labels = stream.getvalue().split("#")[0].splitlines()
+    assert len(labels) == len({label.split(" ", 1)[1] for label in labels})
+
+
+def test_resolve_member_follows_mro(tmp_path):
+    package = tmp_path / "diamond"
+    package.mkdir()
+    (package / "__init__.py").write_text(
+        "class Base:\n"
+        "    def f(self):\n"
+        "        pass\n\n\n"
+        "class Left(Base):\n"
+        "    pass\n\n\n"
+        "class Right(Base):\n"
+        "    def f(self):\n"
+        "        pass\n\n\n"
+        "class Bottom(Left, Right):\n"
+        "    pass\n"
+    )
+    summaries = PackageSummaries(cache_dir=False)
+    # pretend that the package is installed
+    summaries.distributions = {"diamond": ("diamond", "1.0")}
+    summaries.locations = {"diamond": str(package / "__init__.py")}
+
+    assert summaries.get_mro("diamond.Bottom") == ["diamond.Bottom", "diamond.Left", "diamond.Right", "diamond.Base"]
+    definition = summaries.resolve_member("diamond.Bottom", "f")
+    assert (definition.namespace, definition.name) == ("diamond.Right", "f")  # not Base.f, as depth first would
@@ -0,0 +1,85 @@
+from glob import glob
+import io
+import logging
+import os
+import sys
+from xml.etree import ElementTree
+
+import pytest
+
+from pyan.analyzer import CallGraphVisitor
+from pyan.layout import BuiltinRenderer, ForceLayout, import_numpy
+from pyan.visgraph import VisualGraph
+from pyan.writers import HTMLWriter, SVGWriter, adjacency_index
+
+SVG = "{http://www.w3.org/2000/svg}"
+
+
+@pytest.fixture
+def graph():
+    filenames = glob(os.path.join(os.path.dirname(__file__), "test_code/**/*.py"), recursive=True)
+    visitor = CallGraphVisitor(filenames, logger=logging.getLogger())
+    options = {"draw_defines": True, "draw_uses": True, "nested_groups": True, "colored": True}
+    return VisualGraph.from_visitor(visitor, options=options)
+
+
+def test_missing_numpy(monkeypatch):
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    with pytest.raises(RuntimeError, match="NumPy"):
+        import_numpy()
+
+
+def test_clusters_stay_together():
+    np = pytest.importorskip("numpy")
+    # Two clusters of 20 nodes, each a ring, with a few edges between them.
+    sources = list(range(40)) + [0, 5, 10]
+    targets = [i + 1 if i % 20 != 19 else i - 19 for i in range(40)] + [20, 25, 30]
+    clusters = [0] * 20 + [1] * 20
+    positions = ForceLayout(spacing=50).run(40, sources, targets, node_cluster=clusters, cluster_parent=[-1, -1])
+    assert positions.shape == (40, 2)
+    assert np.isfinite(positions).all()
+    centroids = [positions[:20].mean(axis=0), positions[20:].mean(axis=0)]
+    for number, position in enumerate(positions):
+        own, other = centroids[clusters[number]], centroids[1 - clusters[number]]
+        assert np.hypot(*(position - own)) < np.hypot(*(position - other))
+
+    again = ForceLayout(spacing=50).run(40, sources, targets, node_cluster=clusters, cluster_parent=[-1, -1])
+    assert (positions == again).all()
+
+
+def test_builtin_svg(graph):
+    pytest.importorskip("numpy")
+    stream = io.StringIO()
+    SVGWriter(graph, output=stream, renderer=BuiltinRenderer()).run()
+    root = ElementTree.fromstring(stream.getvalue())
+    groups = root.find(SVG + "g").findall(SVG + "g")
+
+    def titled(kind):
+        return {group.find(SVG + "title").text: group for group in groups if group.get("class") == kind}
+
+    nodes, edges, clusters = titled("node"), titled("edge"), titled("cluster")
+    visual_nodes = {}
+
+    def collect(subgraph):
+        for node in subgraph.nodes:
+            visual_nodes[node.id] = node
+        for child in subgraph.subgraphs:
+            collect(child)
+
+    collect(graph)
+    assert set(nodes) == set(visual_nodes)
+    assert set(edges) == {"%s->%s" % (edge.source.id, edge.target.id) for edge in graph.edges}
+    assert len(clusters) > 0
+    for name, group in nodes.items():
+        ellipse = group.find(SVG + "ellipse")
+        assert ellipse.get("fill") == visual_nodes[name].fill_color[:7]  # the Colorizer's color, without the alpha
+        assert group.find(SVG + "text").text == visual_nodes[name].label
+
+
+def test_builtin_html(graph):
+    pytest.importorskip("numpy")
+    stream = io.StringIO()
+    HTMLWriter(graph, output=stream, renderer=BuiltinRenderer()).run()
+    html = stream.getvalue()
+    assert html.count('class="node"') == len(adjacency_index(graph)["nodes"])
+    assert '<script type="application/json" id="graph-index">' in html
@@ -0,0 +1,26 @@
+from glob import glob
+import os
+
+import pytest
+
+from pyan.main import main
+
+TEST_CODE = os.path.join(os.path.dirname(__file__), "test_code")
+
+
+def test_multiple_outputs(tmp_path):
+    filenames = sorted(glob(os.path.join(TEST_CODE, "*.py")))
+    formats = {"dot": "graph.dot", "tgf": "graph.tgf", "yed": "graph.graphml"}
+    main(filenames + ["--output=%s:%s" % (fmt, tmp_path / name) for fmt, name in formats.items()])
+
+    for fmt, name in formats.items():
+        single = tmp_path / ("single-" + name)
+        main(filenames + ["--" + fmt, "--file", str(single)])
+        # nodes and edges are written in a deterministic order (see pyan.visgraph.iter_sorted_edges())
+        assert (tmp_path / name).read_text() == single.read_text(), fmt
+
+
+def test_invalid_output(capsys):
+    with pytest.raises(SystemExit):
+        main([os.path.join(TEST_CODE, "__init__.py"), "--output", "png:graph.png"])
+    assert "unknown format 'png'" in capsys.readouterr().err
@@ -0,0 +1,82 @@
+from glob import glob
+import logging
+import os
+
+from helpers import edges
+import pytest
+
+from pyan.analyzer import CallGraphVisitor
+from pyan.shards import ShardError, extract_shard, merge_shards, read_shard, write_shard
+
+
+@pytest.fixture
+def filenames():
+    return sorted(glob(os.path.join(os.path.dirname(__file__), "test_code/**/*.py"), recursive=True))
+
+
+def test_merge_matches_single_analysis(filenames, tmp_path):
+    logger = logging.getLogger()
+    shard_filenames = []
+    subsets = (filenames[::2], filenames[1::2])
+    for k, subset in enumerate(subsets):
+        shard_filename = str(tmp_path / ("shard%d.json" % k))
+        write_shard(extract_shard(subset, logger=logger), shard_filename)
+        shard_filenames.append(shard_filename)
+
+    merged = merge_shards([read_shard(fn) for fn in shard_filenames], logger=logger)
+    assert edges(merged) == edges(CallGraphVisitor(subsets[0] + subsets[1], logger=logger))
+
+
+def test_merge_resolves_across_shards(tmp_path):
+    package = tmp_path / "pkg"
+    package.mkdir()
+    sources = {
+        "__init__.py": "",
+        "base.py": "class Base:\n    def __init__(self):\n        pass\n\n    def run(self):\n        pass\n",
+        "child.py": (
+            "from .base import Base\n\n\n"
+            "class Child(Base):\n"
+            "    def __init__(self):\n"
+            "        super().__init__()\n\n"
+            "    def go(self):\n"
+            "        self.run()\n"
+        ),
+        "main.py": "from pkg.child import Child\n\n\ndef main():\n    Child().go()\n",
+    }
+    for name, source in sources.items():
+        (package / name).write_text(source)
+    filenames = [str(package / name) for name in sources]
+
+    logger = logging.getLogger()
+    shards = [extract_shard(filenames[:2], logger=logger), extract_shard(filenames[2:], logger=logger)]
+    expected = edges(CallGraphVisitor(filenames, logger=logger))
+    for filename in filenames:  # the shards are self-contained
+        os.remove(filename)
+
+    merged = edges(merge_shards(shards, logger=logger))
+    assert ("uses", "pkg.child.Child", "pkg.base.Base") in merged
+    assert ("uses", "pkg.child.Child.go", "pkg.base.Base.run") in merged  # inherited
+    assert ("uses", "pkg.child.Child.__init__", "pkg.base.Base.__init__") in merged  # super()
+    assert ("uses", "pkg.main.main", "pkg.child.Child.__init__") in merged  # instantiation
+    assert merged == expected
+
+
+def test_shard_contents(filenames):
+    filename = [fn for fn in filenames if fn.endswith("subpackage1/submodule1.py")][0]
+    shard = extract_shard([filename], logger=logging.getLogger())
+    assert sorted(shard) == ["bases", "calls", "defines", "files", "nodes", "super_attributes", "uses", "version"]
+    (entry,) = shard["files"]
+    assert entry["module"] == "test_code.subpackage1.submodule1"
+    assert sorted(entry) == ["filename", "module", "sha256"]
+
+    nodes = {(namespace, name): rest for namespace, name, *rest in shard["nodes"]}
+    flavor, node_filename, defined, lineno, _, end_lineno = nodes[("test_code.subpackage1.submodule1", "A")]
+    assert (flavor, node_filename, defined) == ("class", filename, True)
+    assert lineno < end_lineno
+
+
+def test_conflicting_shards(filenames):
+    shard = extract_shard(filenames[:1], logger=logging.getLogger())
+    changed = dict(shard, files=[dict(shard["files"][0], sha256="0")])
+    with pytest.raises(ShardError):
+        merge_shards([shard, changed])
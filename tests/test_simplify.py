@@ -0,0 +1,53 @@
+import ast
+import logging
+
+from helpers import FakeVisitor
+
+from pyan.analyzer import CallGraphVisitor
+from pyan.simplify import find_redundant_edges, prune_leaf_helpers, reduce_defines_edges, simplify
+
+
+def test_transitive_reduction_of_uses():
+    # a -> b -> c -> d, with shortcuts a -> c and a -> d; c <-> e is a cycle, which b enters at both nodes
+    uses = [("a", "b"), ("b", "c"), ("c", "d"), ("a", "c"), ("a", "d"), ("c", "e"), ("e", "c"), ("b", "e")]
+    visitor = FakeVisitor("abcde", uses=uses)
+    assert simplify(visitor, ["uses"]) == {"uses": 2}
+    assert visitor.pairs(visitor.uses_edges) == {("a", "b"), ("b", "c"), ("b", "e"), ("c", "d"), ("c", "e"), ("e", "c")}
+
+
+def test_depth_limit():
+    successors = {"a": {"b", "e"}, "b": {"c"}, "c": {"d"}, "d": {"e"}}  # a -> e is implied by a path of 4 edges
+    assert find_redundant_edges(successors) == [("a", "e")]
+    assert find_redundant_edges(successors, max_depth=3) == []
+
+
+def test_defines_reduction():
+    visitor = FakeVisitor("abc", defines=[("a", "b"), ("b", "c"), ("a", "c")])
+    assert reduce_defines_edges(visitor) == 1
+    assert visitor.pairs(visitor.defines_edges) == {("a", "b"), ("b", "c")}
+
+
+def test_prune_leaf_helpers():
+    visitor = FakeVisitor(
+        ["main", "small", "big", "caller"],
+        uses=[("main", "small"), ("main", "big"), ("main", "caller"), ("caller", "small")],
+    )
+    tree = ast.parse(
+        "def small():\n    pass\n\ndef big():\n    a = 1\n    b = 2\n    c = 3\n    return a + b + c\n\ndef caller():\n    pass\n"
+    )
+    for function in tree.body:
+        visitor.by_name[function.name].ast_node = function
+    # "caller" is small, but not a leaf
+    assert prune_leaf_helpers(visitor, max_lines=3) == 2
+    assert visitor.pairs(visitor.uses_edges) == {("main", "big"), ("main", "caller")}
+
+
+def test_prune_leaf_helpers_low_memory(tmp_path):
+    # In low-memory mode, the AST nodes are replaced by SourceLocations, which must keep the size of definitions.
+    filename = tmp_path / "helpers.py"
+    filename.write_text("def small():\n    pass\n\n\ndef main():\n    small()\n    main()\n")
+    removed = []
+    for low_memory in (False, True):
+        visitor = CallGraphVisitor([str(filename)], logger=logging.getLogger(), low_memory=low_memory)
+        removed.append(prune_leaf_helpers(visitor, max_lines=3))
+    assert removed == [1, 1]
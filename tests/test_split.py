@@ -0,0 +1,71 @@
+from glob import glob
+import logging
+import os
+import re
+
+import pytest
+
+from pyan.analyzer import CallGraphVisitor
+from pyan.split import split_graph, write_shards
+
+
+@pytest.fixture
+def visitor():
+    filenames = glob(os.path.join(os.path.dirname(__file__), "test_code/**/*.py"), recursive=True)
+    return CallGraphVisitor(filenames, logger=logging.getLogger())
+
+
+def test_split_by_module(visitor):
+    shards = {shard.name: shard for shard in split_graph(visitor, "module", options={"draw_uses": True})}
+    assert "test_code.submodule1" in shards and "test_code.submodule2" in shards
+
+    # submodule2.test_2 calls submodule1.test_func1: an edge in both shards, with the other end as a stub
+    shard, shard2 = shards["test_code.submodule2"], shards["test_code.submodule1"]
+    calls = {(n.get_name(), n2.get_name()) for n, targets in shard.uses_edges.items() for n2 in targets}
+    assert ("test_code.submodule2.test_2", "test_code.submodule1.test_func1") in calls
+    assert {n.get_name(): name for n, name in shard.boundary.items()}["test_code.submodule1.test_func1"] == (
+        "test_code.submodule1"
+    )
+    assert "test_code.submodule2.test_2" in {n.get_name() for n in shard2.boundary}
+    assert all(n not in shard.members for n in shard.boundary)
+
+
+def test_write_shards(visitor, tmp_path):
+    shards = split_graph(visitor, "package", options={"draw_uses": True, "grouped": True})
+    write_shards(shards, [("dot", str(tmp_path)), ("tgf", str(tmp_path))], options={"draw_uses": True, "grouped": True})
+
+    index = (tmp_path / "index.html").read_text()
+    links = re.findall(r'href="([^"]+)"', index)
+    assert sorted(links) == sorted("%s.%s" % (shard.name, format) for shard in shards for format in ("dot", "tgf"))
+    assert all((tmp_path / link).exists() for link in links)
+
+    # the stubs link to the shard they belong to, in a format that was written
+    dot = (tmp_path / "test_code.dot").read_text()
+    assert 'URL="test_code.subpackage1.dot"' in dot
+
+
+def test_write_shards_interactive(visitor, tmp_path):
+    shards = split_graph(visitor, "package", options={"draw_uses": True})
+    write_shards(shards, [("interactive", str(tmp_path)), ("dot", str(tmp_path))], options={"draw_uses": True})
+
+    index = (tmp_path / "index.html").read_text()
+    links = re.findall(r'href="([^"]+)"', index)
+    assert "test_code.subpackage1.interactive.html" in links
+    assert all((tmp_path / link).exists() for link in links)
+    dot = (tmp_path / "test_code.dot").read_text()
+    assert 'URL="test_code.subpackage1.interactive.html"' in dot
+
+
+def test_write_shards_links_across_directories(visitor, tmp_path):
+    shards = split_graph(visitor, "package", options={"draw_uses": True})
+    tgf_dir, dot_dir = tmp_path / "tgf", tmp_path / "graphs" / "dot"
+    write_shards(shards, [("tgf", str(tgf_dir)), ("dot", str(dot_dir))], options={"draw_uses": True})
+
+    # the stubs link to the tgf files (the first format written), relative to the dot file that contains them
+    dot = (dot_dir / "test_code.dot").read_text()
+    assert 'URL="../../tgf/test_code.subpackage1.tgf"' in dot
+    assert (dot_dir / "../../tgf/test_code.subpackage1.tgf").exists()
+    # each directory has an index of its own files
+    assert re.findall(r'href="([^"]+)"', (dot_dir / "index.html").read_text()) == [
+        "%s.dot" % shard.name for shard in shards
+    ]
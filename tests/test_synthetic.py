@@ -0,0 +1,41 @@
+import json
+import logging
+import os
+
+from benchmarks.run_benchmarks import graph_digest
+from benchmarks.synthetic import SyntheticProject
+from pyan.analyzer import CallGraphVisitor
+
+GOLDEN = os.path.join(os.path.dirname(__file__), "golden", "synthetic.json")
+
+
+def make_project():
+    # Keep in sync with the golden check command in benchmarks/run_benchmarks.py.
+    return SyntheticProject(
+        modules=12,
+        modules_per_package=4,
+        classes_per_module=2,
+        functions_per_module=2,
+        methods_per_class=2,
+        name_collisions=0.2,
+        seed=0,
+    )
+
+
+def test_generator_is_deterministic(tmp_path):
+    filenames1 = make_project().write(str(tmp_path / "1"))
+    filenames2 = make_project().write(str(tmp_path / "2"))
+    assert len(filenames1) == len(filenames2)
+    for fn1, fn2 in zip(filenames1, filenames2):
+        with open(fn1) as f1, open(fn2) as f2:
+            assert f1.read() == f2.read()
+
+
+def test_golden_output(tmp_path):
+    # Optimizations of the analysis must not change the resulting graph.
+    # After an intended change, regenerate GOLDEN with benchmarks.run_benchmarks (see its docstring).
+    filenames = make_project().write(str(tmp_path))
+    v = CallGraphVisitor(filenames, logger=logging.getLogger())
+    with open(GOLDEN, "rt", encoding="utf-8") as f:
+        golden = json.load(f)
+    assert graph_digest(v) == golden
@@ -0,0 +1,89 @@
+from glob import glob
+import io
+import logging
+import os
+
+from helpers import FakeVisitor
+import pytest
+
+from pyan.analyzer import CallGraphVisitor
+from pyan.visgraph import VisualGraph, choose_collapse_level
+from pyan.writers import DotWriter, TgfWriter, YedWriter
+
+
+def tree(graph):
+    return {subgraph.label: (sorted(n.label for n in subgraph.nodes), tree(subgraph)) for subgraph in graph.subgraphs}
+
+
+def test_nested_groups_follow_namespaces():
+    # "pkg.a-b" sorts between "pkg.a" and "pkg.a.c"; pkg.a.c must still nest in pkg.a.
+    # "pkgxa" must not nest in "pkg" (dots are not wildcards).
+    visitor = FakeVisitor(["pkg.a.f", "pkg.a-b.g", "pkg.a.c.h", "pkgxa.i", "pkg.j"])
+    graph = VisualGraph.from_visitor(visitor, options={"nested_groups": True})
+    assert tree(graph) == {
+        "pkg": (
+            ["j"],
+            {
+                "pkg.a": (["f"], {"pkg.a.c": (["h"], {})}),
+                "pkg.a-b": (["g"], {}),
+            },
+        ),
+        "pkgxa": (["i"], {}),
+    }
+    assert graph.count_nodes() == 5
+
+
+def test_flat_groups():
+    visitor = FakeVisitor(["pkg.a.f", "pkg.a.c.h", "pkg.j"])
+    graph = VisualGraph.from_visitor(visitor, options={"grouped": True})
+    assert tree(graph) == {"pkg": (["j"], {}), "pkg.a": (["f"], {}), "pkg.a.c": (["h"], {})}
+
+
+@pytest.mark.parametrize("writer_class", [DotWriter, TgfWriter, YedWriter])
+def test_streaming_matches_materialized(writer_class):
+    filenames = glob(os.path.join(os.path.dirname(__file__), "test_code/**/*.py"), recursive=True)
+    visitor = CallGraphVisitor(filenames, logger=logging.getLogger())
+    options = {"draw_defines": True, "draw_uses": True, "nested_groups": True, "colored": True}
+
+    outputs = []
+    for streaming in (False, True):
+        graph = VisualGraph.from_visitor(visitor, options=options, streaming=streaming)
+        assert graph.count_nodes() > 0 and graph.count_edges() > 0
+        stream = io.StringIO()
+        writer_class(graph, output=stream).run()
+        outputs.append(stream.getvalue())
+    assert outputs[0] == outputs[1]
+
+
+@pytest.fixture
+def visitor():
+    filenames = glob(os.path.join(os.path.dirname(__file__), "test_code/**/*.py"), recursive=True)
+    return CallGraphVisitor(filenames, logger=logging.getLogger())
+
+
+def test_collapse_levels(visitor):
+    options = {"draw_uses": True}
+    full = VisualGraph.from_visitor(visitor, options=options)
+    counts = {}
+    for level in ("class", "module", "package"):
+        graph = VisualGraph.from_visitor(visitor, options=options, collapse_to=level)
+        counts[level] = graph.count_nodes()
+        labels = {node.id: node.label for node in graph.nodes}
+        edges = {(labels[e.source.id].split()[0], labels[e.target.id].split()[0]): e.weight for e in graph.edges}
+        assert all(edge.weight >= 1 and edge.source is not edge.target for edge in graph.edges)
+        if level == "module":
+            # submodule2 imports submodule1, and test_2 calls two of its functions
+            assert edges[("test_code.submodule2", "test_code.submodule1")] == 3
+    assert counts["package"] < counts["module"] < counts["class"] < full.count_nodes()
+
+    stream = io.StringIO()
+    DotWriter(VisualGraph.from_visitor(visitor, options=options, collapse_to="module"), output=stream).run()
+    assert 'penwidth="2.6", label="3"' in stream.getvalue()
+
+
+def test_choose_collapse_level(visitor):
+    options = {"draw_uses": True}
+    full = VisualGraph.from_visitor(visitor, options=options)
+    assert choose_collapse_level(visitor, full.count_nodes(), full.count_edges(), options=options) is None
+    assert choose_collapse_level(visitor, full.count_nodes() - 1, 1000, options=options) == "class"
+    assert choose_collapse_level(visitor, 1, 0, options=options) == "package"
@@ -0,0 +1,149 @@
+from glob import glob
+import io
+import json
+import logging
+import os
+import re
+import sys
+
+import pytest
+
+from pyan.analyzer import CallGraphVisitor
+from pyan.visgraph import VisualEdge, VisualGraph, VisualNode
+from pyan.writers import (
+    DotWriter,
+    GraphvizRenderer,
+    HTMLWriter,
+    InteractiveHTMLWriter,
+    SVGWriter,
+    adjacency_index,
+    render_html,
+    write_outputs,
+)
+
+# Stands in for GraphViz: reports its arguments and the size of its input, or fails or hangs on request.
+FAKE_DOT = """\
+import sys, time
+source = sys.stdin.read()
+if "hang" in sys.argv[1]:
+    time.sleep(60)
+if "fail" in sys.argv[1]:
+    sys.stderr.write("no such engine")
+    sys.exit(1)
+sys.stdout.write("<svg args='%s' size='%d'/>" % (" ".join(sys.argv[1:]), len(source)))
+"""
+
+
+@pytest.fixture
+def fake_dot(tmp_path, monkeypatch):
+    bindir = tmp_path / "bin"
+    bindir.mkdir()
+    dot = bindir / "dot"
+    dot.write_text("#!%s\n%s" % (sys.executable, FAKE_DOT))
+    dot.chmod(0o755)
+    monkeypatch.setenv("PATH", str(bindir) + os.pathsep + os.environ["PATH"])
+
+
+def make_graph():
+    filenames = glob(os.path.join(os.path.dirname(__file__), "test_code/**/*.py"), recursive=True)
+    visitor = CallGraphVisitor(filenames, logger=logging.getLogger())
+    return VisualGraph.from_visitor(visitor, options={"draw_defines": True, "draw_uses": True}, streaming=True)
+
+
+@pytest.fixture
+def graph():
+    return make_graph()
+
+
+def test_deterministic_output():
+    outputs = []
+    for _ in range(2):
+        stream = io.StringIO()
+        DotWriter(make_graph(), output=stream).run()
+        outputs.append(stream.getvalue())
+    assert outputs[0] == outputs[1]
+
+
+def test_svg_and_html_rendering(fake_dot, graph, tmp_path):
+    renderer = GraphvizRenderer(engine="neato")
+    stream = io.StringIO()
+    SVGWriter(graph, output=stream, renderer=renderer).run()
+    svg = stream.getvalue()
+    assert svg.startswith("<svg args='-Kneato -Tsvg'")
+
+    SVGWriter(graph, output=str(tmp_path / "graph.svg"), renderer=renderer).run()
+    assert (tmp_path / "graph.svg").read_text() == svg
+
+    HTMLWriter(graph, output=str(tmp_path / "graph.html"), renderer=renderer).run()
+    html = (tmp_path / "graph.html").read_text()
+    assert html == render_html(svg, index=adjacency_index(graph))
+
+    # svg and html from one rendering
+    write_outputs(graph, [("svg", str(tmp_path / "a.svg")), ("html", str(tmp_path / "a.html"))], renderer=renderer)
+    assert (tmp_path / "a.svg").read_text() == svg
+    assert (tmp_path / "a.html").read_text() == html
+
+
+def test_rendering_errors(fake_dot, graph):
+    with pytest.raises(RuntimeError, match="no such engine"):
+        SVGWriter(graph, output=io.StringIO(), renderer=GraphvizRenderer(engine="fail")).run()
+    with pytest.raises(RuntimeError, match="timed out"):
+        SVGWriter(graph, output=io.StringIO(), renderer=GraphvizRenderer(engine="hang", timeout=0.5)).run()
+
+
+def test_render_cache(fake_dot, graph, tmp_path, monkeypatch):
+    renderer = GraphvizRenderer(cache_dir=str(tmp_path / "cache"))
+    first = io.StringIO()
+    SVGWriter(graph, output=first, renderer=renderer).run()
+    assert len(os.listdir(tmp_path / "cache")) == 1
+
+    # unchanged graph: rendered from the cache, without GraphViz
+    monkeypatch.setenv("PATH", str(tmp_path / "nowhere"))
+    second = io.StringIO()
+    HTMLWriter(graph, output=second, renderer=renderer).run()
+    assert second.getvalue() == render_html(first.getvalue(), index=adjacency_index(graph))
+
+
+def read_graph_data(html):
+    return json.loads(re.search(r'<script type="application/json" id="graph-data">(.*?)</script>', html, re.S).group(1))
+
+
+def test_interactive_html(graph):
+    stream = io.StringIO()
+    InteractiveHTMLWriter(graph, output=stream).run()
+    data = read_graph_data(stream.getvalue())
+    strings, nodes, groups = data["strings"], data["nodes"], data["groups"]
+    assert len(nodes) == 5 * graph.count_nodes()
+    assert len(data["edges"]) == 3 * graph.count_edges()
+
+    # namespaces nest by dotted name, parents first
+    group_names = [strings[k] for k in groups[::2]]
+    for name, parent in zip(group_names, groups[1::2]):
+        assert parent < 0 and "." not in name or name.startswith(group_names[parent] + ".")
+    node_groups = {strings[nodes[k + 1]]: nodes[k + 4] for k in range(0, len(nodes), 5)}
+    assert group_names[node_groups["test_code.submodule1.B.__init__"]] == "test_code.submodule1.B"
+    assert group_names[node_groups["test_code.submodule1.B"]] == "test_code.submodule1.B"
+
+
+def test_interactive_html_escapes_script_end():
+    a = VisualNode("a", label="</script><b>", name="m.a")
+    b = VisualNode("b", label="b", name="m.b")
+    graph = VisualGraph("G", "", nodes=[a, b], edges=[VisualEdge(a, b, "uses", "#000000", weight=3)])
+    stream = io.StringIO()
+    InteractiveHTMLWriter(graph, output=stream).run()
+    assert "</script><b>" not in stream.getvalue()
+    data = read_graph_data(stream.getvalue())
+    assert "</script><b>" in data["strings"]
+    assert data["weights"] == [3]
+
+
+def test_adjacency_index(graph):
+    index = adjacency_index(graph)
+    edges = {(index["nodes"][s], index["nodes"][t]) for s, t in zip(index["edges"][::2], index["edges"][1::2])}
+    assert edges == {(edge.source.id, edge.target.id) for edge in graph.edges}
+    assert len(index["nodes"]) == len(set(index["nodes"]))
+
+    html = render_html("<svg/>", index=index, highlight_depth=2)
+    embedded = re.search(r'<script type="application/json" id="graph-index">(.*?)</script>', html, re.S).group(1)
+    assert json.loads(embedded) == index
+    assert "var maxDepth = 2" in html